@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Benchmark script for the wipe engine.
+Targets live on tmpfs by default so the numbers reflect Python/user-space
+overhead rather than disk speed; use --dir to benchmark a real filesystem.
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models.wipe_job import JobCheckpoint
+from services.job_scheduler import JobCheckpointStore
+from services.wipe import WipeService, WipeMethod, WipeResult
+from services.wipe_batch import BatchWipeManager
+from services.wipe_engine import PassWriter, RandomStream, RANDOM_PASS, WriterBackend, WriterConfig, open_direct
+
+GIB = 1024 * 1024 * 1024
+MIB = 1024 * 1024
+
+
+BENCH_DIR = None
+
+
+def _tmpfs_dir() -> str:
+    """Prefer /dev/shm (tmpfs) when it is available"""
+    if BENCH_DIR:
+        return BENCH_DIR
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def _make_target(size: int) -> str:
+    """Create a benchmark target file of the given size"""
+    fd, path = tempfile.mkstemp(prefix="wipe_bench_", dir=_tmpfs_dir())
+    os.ftruncate(fd, size)
+    os.close(fd)
+    return path
+
+
+def _legacy_pass(fd: int, pattern: bytes, size: int):
+    """The pre-engine loop: rebuilds `pattern * n` for every chunk"""
+    chunk_size = 1024 * 1024
+    os.lseek(fd, 0, os.SEEK_SET)
+    with os.fdopen(os.dup(fd), 'r+b') as f:
+        bytes_written = 0
+        while bytes_written < size:
+            chunk = pattern * min(chunk_size, size - bytes_written)
+            # The legacy loop overshot the target for multi-byte patterns;
+            # clip it here so both variants write the same amount of data
+            chunk = chunk[:size - bytes_written]
+            f.write(chunk)
+            bytes_written += len(chunk)
+        f.flush()
+
+
+def _engine_pass(writer: PassWriter, fd: int, pattern: bytes, size: int):
+    """The preallocated pass-writer loop"""
+    writer.write_pass(fd, pattern, size)
+
+
+def _report(name: str, size: int, passes: int, seconds: float):
+    gbps = size * passes / seconds / GIB if seconds > 0 else float('inf')
+    print(f"  {name:<24} {seconds:8.3f}s  {gbps:6.2f} GB/s")
+
+
+def benchmark_pass_writer(size: int, passes: int):
+    """Compare the legacy chunk loop with the preallocated pass writer"""
+    print(f"\n⚡ Pass writer ({size // MIB} MiB x {passes} passes, {_tmpfs_dir()})")
+    print("=" * 60)
+
+    patterns = [b'\x00', b'\x92\x49\x24']
+    path = _make_target(size)
+    fd = os.open(path, os.O_RDWR)
+    try:
+        for pattern in patterns:
+            label = pattern.hex()
+
+            start = time.perf_counter()
+            for _ in range(passes):
+                _legacy_pass(fd, pattern, size)
+            _report(f"legacy   [{label}]", size, passes, time.perf_counter() - start)
+
+            with PassWriter() as writer:
+                writer.prepare([pattern])
+                start = time.perf_counter()
+                for _ in range(passes):
+                    _engine_pass(writer, fd, pattern, size)
+                _report(f"engine   [{label}]", size, passes, time.perf_counter() - start)
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+def benchmark_random_stream(size: int):
+    """Compare the AES-CTR keystream with per-chunk os.urandom"""
+    print(f"\n🎲 Random data ({size // MIB} MiB)")
+    print("=" * 60)
+
+    chunk_size = 1024 * 1024
+
+    start = time.perf_counter()
+    for _ in range(size // chunk_size):
+        os.urandom(chunk_size)
+    _report("os.urandom per chunk", size, 1, time.perf_counter() - start)
+
+    stream = RandomStream()
+    start = time.perf_counter()
+    for offset in range(0, size, chunk_size):
+        stream.fill(offset, chunk_size)
+    _report("AES-CTR keystream", size, 1, time.perf_counter() - start)
+    stream.close()
+
+    path = _make_target(size)
+    fd = os.open(path, os.O_RDWR)
+    try:
+        with PassWriter() as writer:
+            writer.prepare([RANDOM_PASS])
+            start = time.perf_counter()
+            writer.write_pass(fd, RANDOM_PASS, size)
+            _report("random pass to tmpfs", size, 1, time.perf_counter() - start)
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+def benchmark_verification(size: int):
+    """Measure full and 1% sampled read-back verification"""
+    print(f"\n🔍 Read-back verification ({size // MIB} MiB, {_tmpfs_dir()})")
+    print("=" * 60)
+
+    path = _make_target(size)
+    fd = os.open(path, os.O_RDWR)
+    try:
+        with PassWriter() as writer:
+            for pattern in (b'\x00', RANDOM_PASS):
+                label = "random" if pattern is RANDOM_PASS else pattern.hex()
+                writer.write_pass(fd, pattern, size)
+                for fraction in (1.0, 0.01):
+                    result = writer.verify_pass(fd, pattern, size, sample_fraction=fraction)
+                    if not result.matched:
+                        raise RuntimeError(f"Verification mismatch at {result.mismatch_offset}")
+                    print(f"  {label:<6} {fraction * 100:5.0f}% of stripes    "
+                          f"{result.duration_seconds:8.3f}s  {result.bytes_per_second / GIB:6.2f} GB/s read")
+    finally:
+        os.close(fd)
+        os.remove(path)
+
+
+async def _checkpointed_drive_wipe(size: int, interval: int, store) -> WipeResult:
+    """Run a random-pass drive wipe with checkpoints"""
+    path = _make_target(size)
+    try:
+        wipe_service = WipeService(mock_mode=False, generate_certificates=False)
+        result = await wipe_service.wipe_drive(
+            path, WipeMethod.RANDOM, checkpoint_store=store, checkpoint_interval_bytes=interval
+        )
+        if not result.success:
+            raise RuntimeError(f"Drive wipe failed: {result.error_message}")
+        return result
+    finally:
+        os.remove(path)
+
+
+def benchmark_checkpoints(size: int):
+    """
+    Measure checkpoint overhead (data sync + SQLite commit) at several intervals
+
+    The overhead is the time the writer spent blocked on checkpoints, which
+    is what checkpointing adds to a disk-bound wipe.
+    """
+    print(f"\n💾 Checkpointed drive wipe ({size // MIB} MiB, {_tmpfs_dir()})")
+    print("=" * 60)
+
+    fd, db_path = tempfile.mkstemp(prefix="wipe_bench_", suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{db_path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[JobCheckpoint.__table__])
+    store = JobCheckpointStore(1, sessionmaker(bind=engine))
+    try:
+        result = asyncio.run(_checkpointed_drive_wipe(size, size, None))
+        _report("no checkpoints", size, 1, result.duration_seconds)
+        for interval in (64 * MIB, 256 * MIB, 1024 * MIB):
+            if interval >= size:
+                continue
+            result = asyncio.run(_checkpointed_drive_wipe(size, interval, store))
+            overhead = result.checkpoint_seconds / result.duration_seconds * 100
+            _report(f"every {interval // MIB} MiB", size, 1, result.duration_seconds)
+            print(f"    {result.checkpoints_written} checkpoints, writer blocked "
+                  f"{result.checkpoint_seconds * 1000:.1f} ms ({overhead:.2f}% of the wipe)")
+    finally:
+        engine.dispose()
+        os.remove(db_path)
+
+
+def _make_tree(file_count: int, files_per_dir: int = 1000, directory: str = None) -> str:
+    """Create a synthetic folder tree of small files"""
+    root = tempfile.mkdtemp(prefix="wipe_bench_tree_", dir=directory or _tmpfs_dir())
+    payload = b'x' * 4096
+    for i in range(file_count):
+        dir_path = os.path.join(root, f"d{i // files_per_dir // 10}", f"d{i // files_per_dir}")
+        if i % files_per_dir == 0:
+            os.makedirs(dir_path, exist_ok=True)
+        with open(os.path.join(dir_path, f"f{i}"), 'wb') as f:
+            f.write(payload)
+    return root
+
+
+async def _wipe_tree(
+    concurrency: int, file_count: int, small_file_threshold: int = 0, directory: str = None
+) -> WipeResult:
+    """Wipe a fresh synthetic tree and return the result"""
+    root = _make_tree(file_count, directory=directory)
+    wipe_service = WipeService(mock_mode=False, generate_certificates=False)
+    result = await wipe_service.wipe_folder(
+        root, WipeMethod.SINGLE_PASS, concurrency=concurrency, small_file_threshold=small_file_threshold
+    )
+    if not result.success or os.path.exists(root):
+        raise RuntimeError(f"Folder wipe failed: {result.error_message}")
+    return result
+
+
+def benchmark_folder_wipe(file_count: int, concurrency: int):
+    """Compare sequential and parallel folder wipes on a synthetic tree"""
+    print(f"\n📁 Folder wipe ({file_count} x 4 KiB files, {_tmpfs_dir()})")
+    print("=" * 60)
+
+    for workers in sorted({1, concurrency}):
+        elapsed = asyncio.run(_wipe_tree(workers, file_count)).duration_seconds
+        print(f"  concurrency={workers:<3}           {elapsed:8.3f}s  {file_count / elapsed:10.0f} files/s")
+
+
+def benchmark_small_files(file_count: int, concurrency: int):
+    """
+    Compare per-file fsync with grouped syncs on a tree of 4 KiB files
+
+    Runs on a real filesystem (the temp dir, or --dir): on tmpfs fsync is
+    free and there is nothing for batching to save.
+    """
+    directory = BENCH_DIR or tempfile.gettempdir()
+    print(f"\n🗃️  Small-file batching ({file_count} x 4 KiB files, {directory})")
+    print("=" * 60)
+
+    baseline = None
+    for label, workers, threshold in (
+        ("per-file fsync", 1, 0),
+        (f"per-file x{concurrency}", concurrency, 0),
+        ("batched", 1, 64 * 1024),
+        (f"batched x{concurrency}", concurrency, 64 * 1024),
+    ):
+        result = asyncio.run(_wipe_tree(workers, file_count, threshold, directory))
+        elapsed = result.duration_seconds
+        baseline = baseline or elapsed
+        print(f"  {label:<24} {elapsed:8.3f}s  {file_count / elapsed:10.0f} files/s  "
+              f"{result.sync_calls:>7} syncs  {baseline / elapsed:5.1f}x")
+
+
+def _attach_loop_devices(count: int, size: int) -> list:
+    """Back `count` loop devices with fresh image files; [] if losetup can't be used"""
+    if not shutil.which("losetup") or os.geteuid() != 0:
+        return []
+    devices = []
+    for _ in range(count):
+        image = _make_target(size)
+        try:
+            output = subprocess.run(
+                ["losetup", "-f", "--show", image], capture_output=True, text=True, timeout=10, check=True
+            )
+            devices.append((output.stdout.strip(), image))
+        except (subprocess.SubprocessError, OSError):
+            os.remove(image)
+            break
+    return devices
+
+
+async def _wipe_batch(devices: list) -> float:
+    """Wipe every device as one batch and return the elapsed time"""
+    manager = BatchWipeManager()
+    batch = manager.start(devices, WipeMethod.ZERO)
+    await manager.wait(batch.batch_id)
+    failed = [device for device in batch.devices if not device.result.success]
+    if failed:
+        raise RuntimeError(f"Batch wipe failed: {failed[0].result.error_message}")
+    return (batch.finished_at - batch.created_at).total_seconds()
+
+
+def benchmark_batch(size: int, max_devices: int):
+    """Measure how aggregate throughput scales with the number of drives in a batch"""
+    print(f"\n🗄️  Batch wipe scaling ({size // MIB} MiB per loop device, {_tmpfs_dir()})")
+    print("=" * 60)
+
+    loops = _attach_loop_devices(max_devices, size)
+    try:
+        if len(loops) < max_devices:
+            print("  skipped: needs root and losetup to attach loop devices")
+            return
+        baseline = None
+        count = 1
+        while count <= max_devices:
+            elapsed = asyncio.run(_wipe_batch([device for device, _ in loops[:count]]))
+            aggregate = size * count / elapsed
+            baseline = baseline or aggregate
+            print(f"  {count:>2} devices               {elapsed:8.3f}s  {aggregate / GIB:6.2f} GB/s  "
+                  f"({aggregate / (baseline * count):.0%} of linear)")
+            count *= 2
+    finally:
+        for device, image in loops:
+            subprocess.run(["losetup", "-d", device], capture_output=True)
+            os.remove(image)
+
+
+def _cpu_seconds() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _zero_fill_run(target: str, size: int, passes: int, kernel: bool):
+    """Write zero passes over a target; returns (wall seconds, user CPU seconds, CPU seconds, kernel bytes)"""
+    fd = os.open(target, os.O_WRONLY)
+    try:
+        with PassWriter(kernel_zero_fill=kernel) as writer:
+            writer.prepare([b'\x00'])
+            user_start = resource.getrusage(resource.RUSAGE_SELF).ru_utime
+            cpu_start = _cpu_seconds()
+            start = time.perf_counter()
+            for _ in range(passes):
+                writer.write_pass(fd, b'\x00', size)
+                os.fsync(fd)
+            elapsed = time.perf_counter() - start
+            user = resource.getrusage(resource.RUSAGE_SELF).ru_utime - user_start
+            return elapsed, user, _cpu_seconds() - cpu_start, writer.kernel_zero_bytes
+    finally:
+        os.close(fd)
+
+
+def benchmark_zero_fill(size: int, passes: int):
+    """Compare user-space zero passes with kernel zero fill (sendfile on files, BLKZEROOUT on devices)"""
+    print(f"\n0️⃣  Zero fill ({size // MIB} MiB x {passes} passes, {_tmpfs_dir()})")
+    print("=" * 60)
+
+    path = _make_target(size)
+    loops = _attach_loop_devices(1, size)
+    targets = [("file", path)] + [("loop device", device) for device, _ in loops]
+    try:
+        for label, target in targets:
+            for kernel in (False, True):
+                elapsed, user, cpu, kernel_bytes = _zero_fill_run(target, size, passes, kernel)
+                gib = size * passes / GIB
+                name = f"{'kernel' if kernel and kernel_bytes else 'user'} [{label}]"
+                print(f"  {name:<24} {elapsed:8.3f}s  {gib / elapsed:6.2f} GB/s  "
+                      f"{user / gib:6.3f}s user, {cpu / gib:6.3f}s total CPU per GiB")
+        if not loops:
+            print("  loop device: skipped (needs root and losetup)")
+    finally:
+        for device, image in loops:
+            subprocess.run(["losetup", "-d", device], capture_output=True)
+            os.remove(image)
+        os.remove(path)
+
+
+def benchmark_writer_backends(size: int, passes: int):
+    """Compare the single-stream writer with queued writes at several depths and block sizes"""
+    print(f"\n🧵 Writer backends ({size // MIB} MiB x {passes} passes, O_DIRECT loop device on {_tmpfs_dir()})")
+    print("=" * 60)
+
+    loops = _attach_loop_devices(1, size)
+    if not loops:
+        print("  skipped: needs root and losetup to attach a loop device")
+        return
+    device, image = loops[0]
+    fd = open_direct(device, 4096)
+    try:
+        if fd is None:
+            print("  skipped: the loop device doesn't accept O_DIRECT")
+            return
+        runs = [("sync 1 MiB", None, MIB)] + [
+            (f"threaded qd={depth} {block // 1024} KiB", WriterConfig(WriterBackend.THREADED, depth, block), block)
+            for block in (256 * 1024, MIB)
+            for depth in (4, 16)
+        ]
+        baseline = None
+        for label, config, block in runs:
+            with PassWriter(chunk_size=block, writer_config=config) as writer:
+                writer.prepare([b'\xFF'])
+                start = time.perf_counter()
+                for _ in range(passes):
+                    writer.write_pass(fd, b'\xFF', size)
+                elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"  {label:<24} {elapsed:8.3f}s  {size * passes / elapsed / GIB:6.2f} GB/s  {baseline / elapsed:5.2f}x")
+    finally:
+        if fd is not None:
+            os.close(fd)
+        subprocess.run(["losetup", "-d", device], capture_output=True)
+        os.remove(image)
+
+
+def main():
+    """Run the wipe benchmarks"""
+    parser = argparse.ArgumentParser(description="Benchmark the DataWipe wipe engine")
+    parser.add_argument("--size-mb", type=int, default=256, help="Target size in MiB")
+    parser.add_argument("--passes", type=int, default=3, help="Passes per measurement")
+    parser.add_argument("--files", type=int, default=100000, help="Files in the synthetic folder tree")
+    parser.add_argument("--small-files", type=int, default=50000, help="Files in the small-file batching run")
+    parser.add_argument("--concurrency", type=int, default=8, help="Workers for the parallel folder wipe")
+    parser.add_argument("--devices", type=int, default=8, help="Most loop devices in the batch scaling run")
+    parser.add_argument("--dir", help="Directory for benchmark targets (default: tmpfs)")
+    parser.add_argument("--only", choices=["pass-writer", "random", "verify", "checkpoint", "folder", "small-files", "batch", "zero-fill", "writer"], help="Run a single benchmark")
+    args = parser.parse_args()
+
+    global BENCH_DIR
+    BENCH_DIR = args.dir
+
+    print("🚀 Wipe Engine Benchmarks")
+    print("=" * 60)
+
+    if args.only in (None, "pass-writer"):
+        benchmark_pass_writer(args.size_mb * MIB, args.passes)
+    if args.only in (None, "random"):
+        benchmark_random_stream(args.size_mb * MIB)
+    if args.only in (None, "verify"):
+        benchmark_verification(args.size_mb * MIB)
+    if args.only in (None, "checkpoint"):
+        benchmark_checkpoints(args.size_mb * MIB)
+    if args.only in (None, "folder"):
+        benchmark_folder_wipe(args.files, args.concurrency)
+    if args.only in (None, "small-files"):
+        benchmark_small_files(args.small_files, args.concurrency)
+    if args.only in (None, "batch"):
+        benchmark_batch(args.size_mb * MIB, args.devices)
+    if args.only in (None, "zero-fill"):
+        benchmark_zero_fill(args.size_mb * MIB, args.passes)
+    if args.only in (None, "writer"):
+        benchmark_writer_backends(args.size_mb * MIB, args.passes)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,13 +12,19 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
 from database import engine, Base
 from routers import users, wipe_logs, storage, wipe, certificates, auth, devices, jobs, downloads
 from privilege_checker import PrivilegeChecker
+from services.job_scheduler import job_scheduler
+from services.wipe_batch import batch_manager
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Create database tables
     Base.metadata.create_all(bind=engine)
+    # Reclaim jobs orphaned by a previous run and start running queued jobs
+    await job_scheduler.start(jobs.execute_wipe_job)
     yield
+    await job_scheduler.stop()
+    await batch_manager.stop()
 
 
 app = FastAPI(
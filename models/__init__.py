@@ -2,5 +2,6 @@
 from .user import User
 from .wipe_log import WipeLog
 from .certificate import WipeCertificate
+from .wipe_job import WipeJob, JobCheckpoint
 
-__all__ = ["User", "WipeLog", "WipeCertificate"]
+__all__ = ["User", "WipeLog", "WipeCertificate", "WipeJob", "JobCheckpoint"]
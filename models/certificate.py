@@ -27,7 +27,7 @@ class WipeCertificate(Base):
     passes_completed = Column(Integer, nullable=False)
     total_passes = Column(Integer, nullable=False)
     duration_seconds = Column(Integer, nullable=False)  # Stored as integer (seconds)
-    verification_hash = Column(String(64), nullable=True)
+    verification_hash = Column(String(128), nullable=True)
     
     # File paths
     certificate_path = Column(String(500), nullable=False)
@@ -0,0 +1,75 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Boolean, BigInteger
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+from database import Base
+import enum
+
+
+class JobState(str, enum.Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class WipeJob(Base):
+    __tablename__ = "wipe_jobs"
+
+    # A job shares its id with the wipe log it produces
+    id = Column(Integer, ForeignKey("wipe_logs.id"), primary_key=True)
+    target_path = Column(String(500), nullable=False)
+    wipe_method = Column(String(50), nullable=False)
+    device_key = Column(String(500), nullable=False, index=True)
+    priority = Column(Integer, nullable=False, default=0)
+    generate_certificate = Column(Boolean, nullable=False, default=True)
+    mock_mode = Column(Boolean, nullable=False, default=False)
+    concurrency = Column(Integer, nullable=False, default=1)
+    checkpoint_interval_bytes = Column(BigInteger, nullable=True)
+    writer_backend = Column(String(20), nullable=True)  # Drive wipes: sync or threaded
+    writer_queue_depth = Column(Integer, nullable=True)
+    writer_block_size = Column(Integer, nullable=True)  # Bytes per write
+    notes = Column(Text, nullable=True)
+
+    # Scheduling state
+    state = Column(Enum(JobState), nullable=False, default=JobState.QUEUED, index=True)
+    claimed_by = Column(String(100), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    cancel_requested = Column(Boolean, nullable=False, default=False)
+
+    # Outcome
+    error_message = Column(Text, nullable=True)
+    bytes_written = Column(BigInteger, nullable=False, default=0)
+    passes_completed = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Relationships
+    wipe_log = relationship("WipeLog", back_populates="job")
+    checkpoint = relationship("JobCheckpoint", back_populates="job", uselist=False, cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<WipeJob(id={self.id}, state='{self.state}', device_key='{self.device_key}', priority={self.priority})>"
+
+
+class JobCheckpoint(Base):
+    __tablename__ = "job_checkpoints"
+
+    # Latest resume position of a job's drive wipe
+    job_id = Column(Integer, ForeignKey("wipe_jobs.id"), primary_key=True)
+    target = Column(String(500), nullable=False)
+    method = Column(String(50), nullable=False)
+    size_bytes = Column(BigInteger, nullable=False)
+    pass_index = Column(Integer, nullable=False)
+    offset = Column(BigInteger, nullable=False)
+    bytes_written = Column(BigInteger, nullable=False, default=0)
+    random_seed = Column(String(64), nullable=False)  # Hex AES key the random passes are generated from
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Relationships
+    job = relationship("WipeJob", back_populates="checkpoint")
+
+    def __repr__(self):
+        return f"<JobCheckpoint(job_id={self.job_id}, pass_index={self.pass_index}, offset={self.offset})>"
@@ -36,6 +36,7 @@ class WipeLog(Base):
     # Relationships
     user = relationship("User", back_populates="wipe_logs")
     certificate = relationship("WipeCertificate", back_populates="wipe_log", uselist=False)
+    job = relationship("WipeJob", back_populates="wipe_log", uselist=False)
 
     def __repr__(self):
         return f"<WipeLog(id={self.id}, user_id={self.user_id}, wipe_method='{self.wipe_method}', verification_status='{self.verification_status}')>"
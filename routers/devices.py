@@ -5,7 +5,7 @@ from pydantic import BaseModel, Field
 from datetime import datetime
 
 from database import get_db
-from services.storage_service import StorageDetectionService
+from services.device_inventory import device_inventory
 from models.user import User
 from services.user_service import UserService, UserUpdate
 
@@ -22,6 +22,7 @@ class DeviceInfo(BaseModel):
     serial: Optional[str]
     hpa_present: bool
     dco_present: bool
+    hpa_dco_stale: bool = False
     sector_size: int
     rotation_rate: Optional[int]
     temperature: Optional[float]
@@ -32,6 +33,7 @@ class DeviceInfo(BaseModel):
     registered_user: Optional[str]
     registered_org: Optional[str]
     detected_at: str
+    snapshot_age_seconds: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -47,6 +49,7 @@ class DeviceSummary(BaseModel):
     total_capacity: int
     total_capacity_human: str
     detected_at: str
+    snapshot_age_seconds: Optional[float] = None
 
 
 class DeviceRegistrationRequest(BaseModel):
@@ -59,6 +62,7 @@ async def list_devices(
     include_registered: bool = Query(True, description="Include registered devices"),
     include_unregistered: bool = Query(True, description="Include unregistered devices"),
     device_type: Optional[str] = Query(None, description="Filter by device type"),
+    refresh: bool = Query(False, description="Rescan instead of using the cached inventory"),
     db: Session = Depends(get_db)
 ):
     """
@@ -68,9 +72,11 @@ async def list_devices(
     to provide a comprehensive view of all devices and their ownership status.
     """
     try:
-        # Get storage devices
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
+        # Get storage devices from the shared inventory
+        storage_service = device_inventory.service
+        snapshot = await device_inventory.get(refresh=refresh)
+        devices = snapshot.devices
+        snapshot_age = round(snapshot.age_seconds, 3)
         
         # Get registered devices
         user_service = UserService(db)
@@ -107,6 +113,7 @@ async def list_devices(
                 serial=device.serial,
                 hpa_present=device.hpa_present,
                 dco_present=device.dco_present,
+                hpa_dco_stale=device.hpa_dco_stale,
                 sector_size=device.sector_size,
                 rotation_rate=device.rotation_rate,
                 temperature=device.temperature,
@@ -116,7 +123,8 @@ async def list_devices(
                 is_registered=is_registered,
                 registered_user=registered_user,
                 registered_org=registered_org,
-                detected_at=datetime.now().isoformat()
+                detected_at=snapshot.taken_at.isoformat(),
+                snapshot_age_seconds=snapshot_age
             )
             result.append(device_info)
         
@@ -130,12 +138,17 @@ async def list_devices(
 
 
 @router.get("/summary", response_model=DeviceSummary)
-async def get_device_summary(db: Session = Depends(get_db)):
+async def get_device_summary(
+    refresh: bool = Query(False, description="Rescan instead of using the cached inventory"),
+    db: Session = Depends(get_db)
+):
     """Get summary statistics of all detected devices"""
     try:
-        # Get storage devices
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
+        # Get storage devices from the shared inventory
+        storage_service = device_inventory.service
+        snapshot = await device_inventory.get(refresh=refresh)
+        devices = snapshot.devices
+        snapshot_age = round(snapshot.age_seconds, 3)
         
         # Get registered devices
         user_service = UserService(db)
@@ -180,7 +193,8 @@ async def get_device_summary(db: Session = Depends(get_db)):
             dco_devices=dco_devices,
             total_capacity=total_capacity,
             total_capacity_human=storage_service._format_size(total_capacity),
-            detected_at=datetime.now().isoformat()
+            detected_at=snapshot.taken_at.isoformat(),
+            snapshot_age_seconds=snapshot_age
         )
         
     except Exception as e:
@@ -193,13 +207,13 @@ async def get_device_summary(db: Session = Depends(get_db)):
 @router.get("/registered", response_model=List[DeviceInfo])
 async def get_registered_devices(db: Session = Depends(get_db)):
     """Get only registered devices"""
-    return await list_devices(include_registered=True, include_unregistered=False, db=db)
+    return await list_devices(include_registered=True, include_unregistered=False, device_type=None, refresh=False, db=db)
 
 
 @router.get("/unregistered", response_model=List[DeviceInfo])
 async def get_unregistered_devices(db: Session = Depends(get_db)):
     """Get only unregistered devices"""
-    return await list_devices(include_registered=False, include_unregistered=True, db=db)
+    return await list_devices(include_registered=False, include_unregistered=True, device_type=None, refresh=False, db=db)
 
 
 @router.get("/by-type/{device_type}", response_model=List[DeviceInfo])
@@ -208,7 +222,7 @@ async def get_devices_by_type(
     db: Session = Depends(get_db)
 ):
     """Get devices filtered by type"""
-    return await list_devices(device_type=device_type, db=db)
+    return await list_devices(include_registered=True, include_unregistered=True, device_type=device_type, refresh=False, db=db)
 
 
 @router.get("/{device_serial}", response_model=DeviceInfo)
@@ -216,7 +230,7 @@ async def get_device_by_serial(device_serial: str, db: Session = Depends(get_db)
     """Get specific device by serial number"""
     try:
         # Get all devices
-        devices = await list_devices(db=db)
+        devices = await list_devices(include_registered=True, include_unregistered=True, device_type=None, refresh=False, db=db)
         
         # Find device by serial
         for device in devices:
@@ -245,7 +259,7 @@ async def register_device(
     """Register a device with a user"""
     try:
         # Check if device exists
-        devices = await list_devices(db=db)
+        devices = await list_devices(include_registered=True, include_unregistered=True, device_type=None, refresh=False, db=db)
         device_found = False
         device_info = None
         
@@ -299,10 +313,13 @@ async def register_device(
 
 
 @router.get("/health", response_model=Dict[str, Any])
-async def get_device_health(db: Session = Depends(get_db)):
+async def get_device_health(
+    refresh: bool = Query(False, description="Rescan instead of using the cached inventory"),
+    db: Session = Depends(get_db)
+):
     """Get health status of all devices"""
     try:
-        devices = await list_devices(db=db)
+        devices = await list_devices(include_registered=True, include_unregistered=True, device_type=None, refresh=refresh, db=db)
         
         health_groups = {}
         warnings = []
@@ -327,6 +344,8 @@ async def get_device_health(db: Session = Depends(get_db)):
                 warnings.append(f"Device {device.device} has HPA enabled")
             if device.dco_present:
                 warnings.append(f"Device {device.device} has DCO enabled")
+            if device.hpa_dco_stale:
+                warnings.append(f"HPA/DCO state of {device.device} is stale: the last probe timed out")
             if device.temperature and device.temperature > 60:
                 warnings.append(f"Device {device.device} temperature is high: {device.temperature}°C")
         
@@ -334,7 +353,8 @@ async def get_device_health(db: Session = Depends(get_db)):
             "health_groups": health_groups,
             "warnings": warnings,
             "total_devices": len(devices),
-            "checked_at": datetime.now().isoformat()
+            "checked_at": datetime.now().isoformat(),
+            "snapshot_age_seconds": device_inventory.stats()["snapshot_age_seconds"]
         }
         
     except Exception as e:
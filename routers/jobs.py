@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
 from enum import Enum
+import asyncio
 import os
+import json
 import logging
 
 from database import get_db, SessionLocal
 from models.wipe_log import WipeLog, WipeMethod, VerificationStatus
+from models.wipe_job import WipeJob, JobState
 from models.user import User
-from services.wipe_service import WipeService, WipeMethod as WipeMethodEnum
+from services.wipe import WipeService as FileWipeService, WipeMethod as FileWipeMethod, WipeResult as FileWipeResult
+from services.wipe_engine import device_key_for, io_executor, WriterBackend, DEFAULT_QUEUE_DEPTH, MAX_QUEUE_DEPTH
 from services.certificate_service import certificate_service
 from services.certificate_db_service import CertificateDBService
 from services.user_service import UserService
+from services.wipe_progress import ProgressSnapshot, progress_registry
+from services.wipe_checkpoint import DEFAULT_CHECKPOINT_INTERVAL_BYTES
+from services.job_scheduler import ClaimedJob, job_operation_id, job_scheduler
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -26,6 +34,12 @@ class WipeJobRequest(BaseModel):
     wipe_method: str = Field(..., description="Wipe method to use (supports app values)")
     generate_certificate: bool = Field(True, description="Generate certificate after wipe")
     mock_mode: bool = Field(False, description="Run in mock mode for testing")
+    concurrency: int = Field(1, ge=1, le=64, description="Folder wipes only: number of files wiped in parallel")
+    checkpoint_interval_mb: int = Field(1024, ge=16, le=1048576, description="Drive wipes only: MiB written between resume checkpoints")
+    writer_backend: WriterBackend = Field(WriterBackend.SYNC, description="Drive wipes only: sync (one write at a time) or threaded (queue_depth writes in flight, for SSD/NVMe)")
+    queue_depth: int = Field(DEFAULT_QUEUE_DEPTH, ge=1, le=MAX_QUEUE_DEPTH, description="Drive wipes with the threaded writer: writes kept in flight")
+    block_size_kb: Optional[int] = Field(None, ge=4, le=65536, description="Drive wipes only: KiB per write (default: sized for the device)")
+    priority: int = Field(0, ge=-100, le=100, description="Higher priority jobs are started first")
     notes: Optional[str] = Field(None, max_length=500, description="Additional notes")
 
 
@@ -74,8 +88,76 @@ class JobListResponse(BaseModel):
     has_more: bool
 
 
-# Job status tracking
-job_status = {}
+# Server-sent event streams
+EVENT_POLL_SECONDS = 1.0  # How often idle streams check for disconnects
+EVENT_STATE_CHECK_SECONDS = 5.0  # How often job streams check the queue for a finished job
+EVENT_KEEPALIVE_SECONDS = 15.0
+
+
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _progress_event_data(snapshot: ProgressSnapshot) -> Dict[str, Any]:
+    """Progress payload, tagged with the job id for job operations"""
+    data = snapshot.to_dict()
+    prefix, _, job_id = snapshot.operation_id.partition("_")
+    if prefix == "job" and job_id.isdigit():
+        data["job_id"] = int(job_id)
+    return data
+
+
+def _normalize_target_path(target_path: Optional[str]) -> str:
+    """Normalize an incoming path (remove quotes/whitespace, normalize separators)"""
+    normalized_path = (target_path or "").strip().strip('"').strip("'")
+    return os.path.normpath(normalized_path) if normalized_path else normalized_path
+
+
+def _job_progress(job: Optional[WipeJob], wipe_log: WipeLog) -> Dict[str, Any]:
+    """Progress for a job that has no live progress record in this process"""
+    if job is None:
+        # Derive progress from the verification status
+        if wipe_log.verification_status == VerificationStatus.VERIFIED:
+            return {"message": "Wipe operation completed successfully", "percentage": 100}
+        if wipe_log.verification_status == VerificationStatus.FAILED:
+            return {"message": "Wipe operation failed", "percentage": 0}
+        return {"message": "Job queued for execution", "percentage": 0}
+    
+    if job.state == JobState.QUEUED:
+        return {"message": "Job queued for execution", "percentage": 0}
+    if job.state == JobState.RUNNING:
+        # Running in another worker process
+        return {"message": "Wipe operation in progress", "percentage": 0}
+    if job.state == JobState.COMPLETED:
+        return {"message": "Wipe operation completed successfully", "percentage": 100}
+    if job.state == JobState.CANCELLED:
+        return {
+            "message": job.error_message or "Job cancelled by user",
+            "percentage": 0,
+            "bytes_written": job.bytes_written,
+            "passes_completed": job.passes_completed
+        }
+    return {"message": "Wipe operation failed", "percentage": 0}
+
+
+def _finished_job_event(job_id: int) -> Optional[Dict[str, Any]]:
+    """Final "status" event payload, or None while the job is queued or running"""
+    db = SessionLocal()
+    try:
+        job = db.query(WipeJob).filter(WipeJob.id == job_id).first()
+        if job is None or job.state in (JobState.QUEUED, JobState.RUNNING):
+            return None
+        return {
+            "job_id": job_id,
+            "status": job.state.value,
+            "completed_at": job.finished_at,
+            "error_message": job.error_message,
+            "bytes_written": job.bytes_written,
+            "passes_completed": job.passes_completed
+        }
+    finally:
+        db.close()
 
 
 def _map_incoming_wipe_method(method_value: str) -> WipeMethod:
@@ -98,18 +180,51 @@ def _map_incoming_wipe_method(method_value: str) -> WipeMethod:
     }
     return mapping.get(value, WipeMethod.OVERWRITE)
 
+def _queue_wipe_job(db: Session, request: WipeJobRequest, mapped_method: WipeMethod) -> WipeLog:
+    """Create the wipe log and its queued job in one transaction"""
+    wipe_log = WipeLog(
+        user_id=request.user_id,
+        wipe_method=mapped_method,
+        verification_status=VerificationStatus.PENDING,
+        certificate_path=None
+    )
+    db.add(wipe_log)
+    db.flush()  # Assigns the id the job shares
+
+    # Queue the job; it survives restarts and is visible to every worker
+    target_path = _normalize_target_path(request.target_path)
+    job = WipeJob(
+        id=wipe_log.id,
+        target_path=target_path,
+        wipe_method=mapped_method.value,
+        device_key=device_key_for(target_path) if target_path else "",
+        priority=request.priority,
+        generate_certificate=request.generate_certificate,
+        mock_mode=request.mock_mode,
+        concurrency=request.concurrency,
+        checkpoint_interval_bytes=request.checkpoint_interval_mb * 1024 * 1024,
+        writer_backend=request.writer_backend.value,
+        writer_queue_depth=request.queue_depth,
+        writer_block_size=request.block_size_kb * 1024 if request.block_size_kb else None,
+        notes=request.notes,
+        state=JobState.QUEUED
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(wipe_log)
+    return wipe_log
 
 @router.post("/start", response_model=WipeJobResponse, status_code=status.HTTP_201_CREATED)
 async def start_wipe_job(
     request: WipeJobRequest,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
     Start a new wipe job.
     
-    This endpoint creates a wipe job record and starts the wipe operation
-    in the background. The job can be tracked using the job ID.
+    This endpoint creates a wipe job record and adds it to the durable job
+    queue. The job scheduler runs it as soon as a slot is free and no other
+    job is using the same physical disk. The job can be tracked using the job ID.
     """
     try:
         # Validate user exists
@@ -124,43 +239,9 @@ async def start_wipe_job(
         # Resolve wipe method
         mapped_method = _map_incoming_wipe_method(request.wipe_method)
 
-        # Create wipe log entry
-        wipe_log = WipeLog(
-            user_id=request.user_id,
-            wipe_method=mapped_method,
-            verification_status=VerificationStatus.PENDING,
-            certificate_path=None
-        )
-        
-        db.add(wipe_log)
-        db.commit()
-        db.refresh(wipe_log)
-        
-        # Use mapped method for execution
-        wipe_method_enum = mapped_method
-        
-        # Create wipe service instance (mock mode handled in execute)
-        wipe_service = WipeService(db)
-        
-        # Start wipe operation in background
-        background_tasks.add_task(
-            execute_wipe_job,
-            wipe_log.id,
-            request.target_path,
-            wipe_method_enum,
-            request.generate_certificate,
-            request.mock_mode,
-            request.notes
-        )
-        
-        # Update job status
-        job_status[wipe_log.id] = {
-            "status": "pending",
-            "progress": {"message": "Job queued for execution", "percentage": 0},
-            "started_at": None,
-            "completed_at": None,
-            "error_message": None
-        }
+        # The sysfs walk and the commit can block (SQLite locks), so keep them off the event loop
+        wipe_log = await io_executor.run(_queue_wipe_job, db, request, mapped_method)
+        job_scheduler.wake()
         
         return WipeJobResponse(
             job_id=wipe_log.id,
@@ -170,7 +251,7 @@ async def start_wipe_job(
             device_serial=user.device_serial,
             target_path=request.target_path,
             wipe_method=mapped_method.value,
-            status="pending",
+            status=JobState.QUEUED.value,
             verification_status=wipe_log.verification_status.value,
             certificate_path=wipe_log.certificate_path,
             notes=request.notes,
@@ -201,56 +282,45 @@ async def get_job_status(job_id: int, db: Session = Depends(get_db)):
                 detail="Job not found"
             )
         
-        # Get job status from tracking
-        status_info = job_status.get(job_id, {
-            "status": "unknown",
-            "progress": {"message": "Status unknown", "percentage": 0},
-            "started_at": None,
-            "completed_at": None,
-            "error_message": None
-        })
-        
-        # Calculate progress based on verification status
-        progress_percentage = 0
-        progress_message = "Status unknown"
-        
-        if wipe_log.verification_status == VerificationStatus.PENDING:
-            progress_percentage = 0
-            progress_message = "Job queued for execution"
-        elif wipe_log.verification_status == VerificationStatus.VERIFIED:
-            progress_percentage = 100
-            progress_message = "Wipe operation completed successfully"
-        elif wipe_log.verification_status == VerificationStatus.FAILED:
-            progress_percentage = 0
-            progress_message = "Wipe operation failed"
-        elif wipe_log.start_time and not wipe_log.end_time:
-            # Job is running
-            progress_percentage = 50
-            progress_message = "Wipe operation in progress"
-        
-        # Update progress in status_info
-        status_info["progress"] = {
-            "message": progress_message,
-            "percentage": progress_percentage
-        }
+        job = db.query(WipeJob).filter(WipeJob.id == job_id).first()
+        
+        # Prefer the live progress record published by the running wipe
+        live_progress = progress_registry.get(job_operation_id(job_id))
+        if live_progress is not None:
+            progress = live_progress.to_dict()
+            progress["message"] = f"Wipe in progress (pass {live_progress.current_pass}/{live_progress.total_passes})"
+        else:
+            progress = _job_progress(job, wipe_log)
+        
+        if job is not None:
+            job_state = job.state.value
+            started_at = job.started_at
+            completed_at = job.finished_at
+            error_message = job.error_message
+        else:
+            # Logs created before the job queue existed have no job row
+            job_state = wipe_log.verification_status.value
+            started_at = wipe_log.start_time
+            completed_at = wipe_log.end_time
+            error_message = None
         
         # Calculate duration
         duration_seconds = None
-        if wipe_log.start_time and wipe_log.end_time:
-            duration_seconds = (wipe_log.end_time - wipe_log.start_time).total_seconds()
-        elif wipe_log.start_time:
-            duration_seconds = (datetime.utcnow() - wipe_log.start_time).total_seconds()
+        if started_at and completed_at:
+            duration_seconds = (completed_at - started_at).total_seconds()
+        elif started_at:
+            duration_seconds = (datetime.utcnow() - started_at).total_seconds()
         
         return JobStatusResponse(
             job_id=job_id,
-            status=wipe_log.verification_status.value,
+            status=job_state,
             verification_status=wipe_log.verification_status.value,
-            progress=status_info.get("progress", {}),
+            progress=progress,
             created_at=wipe_log.created_at,
-            started_at=wipe_log.start_time,
-            completed_at=wipe_log.end_time,
+            started_at=started_at,
+            completed_at=completed_at,
             duration_seconds=duration_seconds,
-            error_message=status_info.get("error_message"),
+            error_message=error_message,
             certificate_id=wipe_log.certificate_path
         )
         
@@ -263,6 +333,83 @@ async def get_job_status(job_id: int, db: Session = Depends(get_db)):
         )
 
 
+@router.get("/events")
+async def stream_all_job_events(request: Request):
+    """
+    Stream progress for every running wipe as server-sent events.
+    
+    Updates are pushed by the wipe engine and coalesced per operation, so
+    a slow client only ever receives the latest state of each wipe.
+    """
+    async def event_stream():
+        with progress_registry.subscribe() as subscription:
+            for snapshot in progress_registry.snapshots():
+                yield _sse_event("progress", _progress_event_data(snapshot))
+            
+            idle_seconds = 0.0
+            while not await request.is_disconnected():
+                batch = await subscription.next_batch(EVENT_POLL_SECONDS)
+                for snapshot in batch:
+                    yield _sse_event("progress", _progress_event_data(snapshot))
+                
+                idle_seconds = 0.0 if batch else idle_seconds + EVENT_POLL_SECONDS
+                if idle_seconds >= EVENT_KEEPALIVE_SECONDS:
+                    idle_seconds = 0.0
+                    yield ": keepalive\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.get("/{job_id}/events")
+async def stream_job_events(job_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    Stream a job's progress as server-sent events.
+    
+    Sends "progress" events while the wipe runs and a final "status" event
+    once the job has finished, then closes the stream.
+    """
+    if not db.query(WipeLog.id).filter(WipeLog.id == job_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    
+    operation_id = job_operation_id(job_id)
+    
+    async def event_stream():
+        loop = asyncio.get_running_loop()
+        with progress_registry.subscribe(operation_id) as subscription:
+            snapshot = progress_registry.get(operation_id)
+            if snapshot is not None:
+                yield _sse_event("progress", _progress_event_data(snapshot))
+            
+            state_check_interval = EVENT_STATE_CHECK_SECONDS
+            next_state_check = 0.0
+            last_sent = loop.time()
+            while not await request.is_disconnected():
+                if loop.time() >= next_state_check:
+                    final_event = _finished_job_event(job_id)
+                    if final_event is not None:
+                        yield _sse_event("status", final_event)
+                        return
+                    next_state_check = loop.time() + state_check_interval
+                
+                batch = await subscription.next_batch(EVENT_POLL_SECONDS)
+                for snapshot in batch:
+                    yield _sse_event("progress", _progress_event_data(snapshot))
+                    if snapshot.status != "in_progress":
+                        # The wipe is over; the job finishes once its outcome is recorded
+                        state_check_interval = EVENT_POLL_SECONDS
+                        next_state_check = 0.0
+                
+                if batch:
+                    last_sent = loop.time()
+                elif loop.time() - last_sent >= EVENT_KEEPALIVE_SECONDS:
+                    last_sent = loop.time()
+                    yield ": keepalive\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
 @router.get("/", response_model=JobListResponse)
 async def list_jobs(
     user_id: Optional[int] = None,
@@ -338,10 +485,9 @@ async def get_user_jobs(
     """Get all jobs for a specific user"""
     return await list_jobs(user_id=user_id, page=page, limit=limit, db=db)
 
-
 @router.post("/{job_id}/cancel")
 async def cancel_job(job_id: int, db: Session = Depends(get_db)):
-    """Cancel a running wipe job"""
+    """Cancel a queued or running wipe job"""
     try:
         # Get wipe log
         wipe_log = db.query(WipeLog).filter(WipeLog.id == job_id).first()
@@ -352,25 +498,37 @@ async def cancel_job(job_id: int, db: Session = Depends(get_db)):
             )
         
         # Check if job can be cancelled
-        if wipe_log.verification_status in [VerificationStatus.VERIFIED, VerificationStatus.FAILED]:
+        job = db.query(WipeJob).filter(WipeJob.id == job_id).first()
+        finished = (
+            job.state not in (JobState.QUEUED, JobState.RUNNING) if job is not None
+            else wipe_log.verification_status != VerificationStatus.PENDING
+        )
+        if finished:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Job is already completed and cannot be cancelled"
+            )
+        
+        # Queued jobs are cancelled at once; running wipes stop within one chunk
+        state = await io_executor.run(job_scheduler.request_cancel, job_id) if job is not None else JobState.CANCELLED
+        if state == JobState.RUNNING:
+            snapshot = progress_registry.get(job_operation_id(job_id))
+            return {
+                "message": f"Cancellation requested for job {job_id}",
+                "status": "cancelling",
+                "progress": snapshot.to_dict() if snapshot else None
+            }
+        if state != JobState.CANCELLED:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Job is already completed and cannot be cancelled"
             )
         
-        # Update status
         wipe_log.verification_status = VerificationStatus.FAILED
-        wipe_log.completed_at = datetime.utcnow()
+        wipe_log.end_time = datetime.utcnow()
         db.commit()
         
-        # Update job status tracking
-        if job_id in job_status:
-            job_status[job_id]["status"] = "cancelled"
-            job_status[job_id]["progress"] = {"message": "Job cancelled by user", "percentage": 0}
-            job_status[job_id]["completed_at"] = datetime.utcnow()
-            job_status[job_id]["error_message"] = "Job cancelled by user"
-        
-        return {"message": f"Job {job_id} cancelled successfully"}
+        return {"message": f"Job {job_id} cancelled successfully", "status": "cancelled", "progress": None}
         
     except HTTPException:
         raise
@@ -422,29 +580,16 @@ async def get_job_stats(db: Session = Depends(get_db)):
             detail=f"Failed to get job stats: {str(e)}"
         )
 
-
-async def execute_wipe_job(
-    job_id: int,
-    target_path: str,
-    wipe_method: WipeMethodEnum,
-    generate_certificate: bool,
-    mock_mode: bool,
-    notes: Optional[str]
-):
-    """Execute a wipe job in the background"""
+async def execute_wipe_job(job: ClaimedJob) -> Optional[FileWipeResult]:
+    """
+    Execute a claimed wipe job (called by the job scheduler)
+    
+    Returns:
+        The wipe result, or None if the target could not be wiped at all
+    """
+    job_id = job.job_id
+    wipe_method = WipeMethod(job.wipe_method)
     try:
-        # Update job status
-        job_status[job_id] = {
-            "status": "running",
-            "progress": {"message": "Starting wipe operation", "percentage": 10},
-            "started_at": datetime.utcnow(),
-            "completed_at": None,
-            "error_message": None
-        }
-        
-        # Import the actual wipe service that handles file operations
-        from services.wipe import WipeService as FileWipeService, WipeMethod as FileWipeMethod
-        
         # Map the wipe method to the file wipe service method
         method_mapping = {
             WipeMethod.SECURE_DELETE: FileWipeMethod.DOD_5220_22_M,
@@ -457,36 +602,40 @@ async def execute_wipe_job(
         file_wipe_method = method_mapping.get(wipe_method, FileWipeMethod.SINGLE_PASS)
         
         # Create file wipe service instance
-        file_wipe_service = FileWipeService(mock_mode=mock_mode, generate_certificates=generate_certificate)
+        file_wipe_service = FileWipeService(mock_mode=job.mock_mode, generate_certificates=job.generate_certificate)
         
         # Determine what type of target we're wiping
-        import os
-        # Normalize incoming path (remove quotes/whitespace, normalize separators)
-        normalized_path = (target_path or "").strip().strip('"').strip("'")
-        normalized_path = os.path.normpath(normalized_path) if normalized_path else normalized_path
+        normalized_path = _normalize_target_path(job.target_path)
+        operation_id = job_operation_id(job_id)
         success = False
         wipe_result = None
         
         if normalized_path and normalized_path != "N/A":
             if os.path.isfile(normalized_path):
                 # Wipe a single file
-                wipe_result = await file_wipe_service.wipe_file(normalized_path, file_wipe_method)
+                wipe_result = await file_wipe_service.wipe_file(
+                    normalized_path, file_wipe_method, operation_id=operation_id
+                )
                 success = wipe_result.success
             elif os.path.isdir(normalized_path):
                 # Wipe a directory
-                wipe_result = await file_wipe_service.wipe_folder(normalized_path, file_wipe_method)
+                wipe_result = await file_wipe_service.wipe_folder(
+                    normalized_path, file_wipe_method, concurrency=job.concurrency, operation_id=operation_id
+                )
                 success = wipe_result.success
             elif normalized_path.startswith('\\\\.\\') or normalized_path.startswith('/dev/'):
-                # Wipe a drive
-                wipe_result = await file_wipe_service.wipe_drive(normalized_path, file_wipe_method)
+                # Wipe a drive, resuming from the job's last checkpoint if it has one
+                wipe_result = await file_wipe_service.wipe_drive(
+                    normalized_path, file_wipe_method, operation_id=operation_id,
+                    checkpoint_store=job.checkpoint_store(),
+                    checkpoint_interval_bytes=job.checkpoint_interval_bytes or DEFAULT_CHECKPOINT_INTERVAL_BYTES,
+                    writer_config=job.writer_config()
+                )
                 success = wipe_result.success
-            else:
-                # Invalid path provided; do not silently succeed
-                success = False
-                wipe_result = None
-        else:
-            # No path provided; fail the job
-            success = False
+        
+        if wipe_result is not None and wipe_result.cancelled:
+            # The scheduler decides whether this was a user cancel or a shutdown requeue
+            return wipe_result
         
         # Update database
         db = SessionLocal()
@@ -499,87 +648,53 @@ async def execute_wipe_job(
                     wipe_log.end_time = datetime.utcnow()
                     wipe_log.verification_status = VerificationStatus.VERIFIED
                     db.commit()
-                elif success:
-                    wipe_log.verification_status = VerificationStatus.VERIFIED
-                    db.commit()
                 else:
                     wipe_log.verification_status = VerificationStatus.FAILED
-                    # If we have a result with an error message, persist a brief message in notes
-                    if wipe_result and wipe_result.error_message:
-                        # Append error to notes for quick visibility
-                        existing = (wipe_log.notes or "")
-                        snippet = f"Wipe error: {wipe_result.error_message}"
-                        wipe_log.notes = (existing + "\n" + snippet).strip() if existing else snippet
+                    wipe_log.end_time = datetime.utcnow()
+                    # The error message itself is recorded on the job
                     db.commit()
                 
                 # Generate certificate if requested and succeeded
-                if success and generate_certificate:
+                if success and job.generate_certificate:
                     user = await UserService(db).get_user(wipe_log.user_id)
                     if user:
                         try:
-                            # Use actual wipe result data if available
-                            if wipe_result:
-                                cert = await certificate_service.generate_certificate(
-                                    user_id=user.id,
-                                    user_name=user.name,
-                                    user_org=user.org,
-                                    device_serial=user.device_serial,
-                                    device_model="Unknown",
-                                    device_type="Unknown",
-                                    wipe_method=wipe_method.value,
-                                    wipe_status="verified",
-                                    target_path=target_path,
-                                    size_bytes=wipe_result.size_bytes,
-                                    passes_completed=wipe_result.passes_completed,
-                                    total_passes=wipe_result.total_passes,
-                                    duration_seconds=wipe_result.duration_seconds,
-                                    verification_hash=wipe_result.verification_hash,
-                                )
-                                
-                                # Save certificate to database
-                                from services.certificate_db_service import CertificateDBService
-                                cert_db_service = CertificateDBService(db)
-                                await cert_db_service.create_certificate(cert, wipe_log.id)
-                                
-                                # Update wipe log with certificate path
-                                wipe_log.certificate_path = cert.certificate_path
-                                db.commit()
-                                
-                                logger.info(f"Certificate generated and saved: {cert.certificate_id}")
-                            else:
-                                # No certificate without an actual successful wipe result
-                                logger.warning("No wipe result available for certificate generation")
+                            cert = await certificate_service.generate_certificate(
+                                user_id=user.id,
+                                user_name=user.name,
+                                user_org=user.org,
+                                device_serial=user.device_serial,
+                                device_model="Unknown",
+                                device_type="Unknown",
+                                wipe_method=wipe_method.value,
+                                wipe_status="verified",
+                                target_path=job.target_path,
+                                size_bytes=wipe_result.size_bytes,
+                                passes_completed=wipe_result.passes_completed,
+                                total_passes=wipe_result.total_passes,
+                                duration_seconds=wipe_result.duration_seconds,
+                                verification_hash=wipe_result.verification_hash,
+                            )
+                            
+                            # Save certificate to database
+                            cert_db_service = CertificateDBService(db)
+                            await cert_db_service.create_certificate(cert, wipe_log.id)
+                            
+                            # Update wipe log with certificate path
+                            wipe_log.certificate_path = cert.certificate_path
+                            db.commit()
+                            
+                            logger.info(f"Certificate generated and saved: {cert.certificate_id}")
                         except Exception as e:
                             logger.error(f"Failed to generate certificate: {e}")
                             # Continue without certificate - don't fail the entire job
-
-                # Update job status cache from DB
-                job_status[job_id] = {
-                    "status": "completed" if success else "failed",
-                    "progress": {
-                        "message": "Wipe operation completed" if success else "Wipe operation failed",
-                        "percentage": 100 if success else 0
-                    },
-                    "started_at": wipe_log.start_time,
-                    "completed_at": wipe_log.end_time,
-                    "error_message": None if success else (wipe_result.error_message if wipe_result and wipe_result.error_message else "Wipe failed"),
-                }
         finally:
             db.close()
         
-        # Mock mode is handled per operation
+        return wipe_result
             
-    except Exception as e:
-        # Update job status with error
-        job_status[job_id] = {
-            "status": "failed",
-            "progress": {"message": "Wipe operation failed", "percentage": 0},
-            "started_at": datetime.utcnow(),
-            "completed_at": datetime.utcnow(),
-            "error_message": str(e)
-        }
-        
-        # Update database
+    except Exception:
+        # Update database; the scheduler records the error on the job
         db = SessionLocal()
         try:
             wipe_log = db.query(WipeLog).filter(WipeLog.id == job_id).first()
@@ -589,3 +704,4 @@ async def execute_wipe_job(
                 db.commit()
         finally:
             db.close()
+        raise
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel
@@ -6,6 +6,7 @@ from datetime import datetime
 
 from database import get_db
 from services.storage_service import StorageDetectionService, StorageDevice
+from services.device_inventory import device_inventory, InventorySnapshot
 
 router = APIRouter()
 
@@ -21,6 +22,7 @@ class StorageDeviceResponse(BaseModel):
     serial: Optional[str]
     hpa_present: bool
     dco_present: bool
+    hpa_dco_stale: bool = False
     sector_size: int
     rotation_rate: Optional[int]
     temperature: Optional[float]
@@ -28,6 +30,7 @@ class StorageDeviceResponse(BaseModel):
     raw_capacity: int
     raw_capacity_human: str
     detected_at: str
+    snapshot_age_seconds: Optional[float] = None
 
     class Config:
         from_attributes = True
@@ -41,10 +44,26 @@ class StorageSummaryResponse(BaseModel):
     hpa_devices: int
     dco_devices: int
     detected_at: str
+    snapshot_age_seconds: Optional[float] = None
+
+
+REFRESH_QUERY = Query(False, description="Rescan instead of using the cached inventory")
+
+
+def _device_response(storage_service: StorageDetectionService, device: StorageDevice,
+                     snapshot: Optional[InventorySnapshot]) -> Dict[str, Any]:
+    """Response for a device from a snapshot (None: probed just now)"""
+    if snapshot is None:
+        response = storage_service.to_dict(device)
+        response['snapshot_age_seconds'] = 0.0
+        return response
+    response = storage_service.to_dict(device, detected_at=snapshot.detected_at(device))
+    response['snapshot_age_seconds'] = round(snapshot.device_age_seconds(device), 3)
+    return response
 
 
 @router.get("/devices", response_model=List[StorageDeviceResponse])
-async def get_storage_devices(db: Session = Depends(get_db)):
+async def get_storage_devices(refresh: bool = REFRESH_QUERY, db: Session = Depends(get_db)):
     """
     Get information about all connected storage devices.
     
@@ -56,10 +75,11 @@ async def get_storage_devices(db: Session = Depends(get_db)):
     - Serial numbers and sector sizes
     """
     try:
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
+        storage_service = device_inventory.service
+        snapshot = await device_inventory.get(refresh=refresh)
+        devices = snapshot.devices
         
-        return [storage_service.to_dict(device) for device in devices]
+        return [_device_response(storage_service, device, snapshot) for device in devices]
         
     except Exception as e:
         raise HTTPException(
@@ -69,23 +89,24 @@ async def get_storage_devices(db: Session = Depends(get_db)):
 
 
 @router.get("/devices/{device_path:path}", response_model=StorageDeviceResponse)
-async def get_storage_device(device_path: str, db: Session = Depends(get_db)):
+async def get_storage_device(device_path: str, refresh: bool = REFRESH_QUERY, db: Session = Depends(get_db)):
     """
     Get information about a specific storage device.
     
     Args:
-        device_path: Path to the device (e.g., /dev/sda, \\\\.\\PhysicalDrive0)
+        device_path: Path to the device (e.g., /dev/sda, \\\\.\\PhysicalDrive0), a
+            partition of it or a symlink to either
+        refresh: Re-probe just this device instead of using the cached inventory
     """
     try:
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
-        
-        # Find the specific device
-        device = None
-        for d in devices:
-            if d.device == device_path or device_path in d.device:
-                device = d
-                break
+        storage_service = device_inventory.service
+        if refresh:
+            # Re-probe just this device, merging it into the shared inventory
+            device = await device_inventory.refresh_device(device_path)
+            snapshot = None
+        else:
+            snapshot = await device_inventory.get()
+            device = snapshot.find(device_path)
         
         if not device:
             raise HTTPException(
@@ -93,7 +114,7 @@ async def get_storage_device(device_path: str, db: Session = Depends(get_db)):
                 detail=f"Storage device '{device_path}' not found"
             )
         
-        return storage_service.to_dict(device)
+        return _device_response(storage_service, device, snapshot)
         
     except HTTPException:
         raise
@@ -105,7 +126,7 @@ async def get_storage_device(device_path: str, db: Session = Depends(get_db)):
 
 
 @router.get("/summary", response_model=StorageSummaryResponse)
-async def get_storage_summary(db: Session = Depends(get_db)):
+async def get_storage_summary(refresh: bool = REFRESH_QUERY, db: Session = Depends(get_db)):
     """
     Get a summary of all connected storage devices.
     
@@ -116,8 +137,9 @@ async def get_storage_summary(db: Session = Depends(get_db)):
     - Number of devices with HPA/DCO
     """
     try:
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
+        storage_service = device_inventory.service
+        snapshot = await device_inventory.get(refresh=refresh)
+        devices = snapshot.devices
         
         total_devices = len(devices)
         total_capacity = sum(device.size for device in devices)
@@ -144,7 +166,8 @@ async def get_storage_summary(db: Session = Depends(get_db)):
             device_types=device_types,
             hpa_devices=hpa_devices,
             dco_devices=dco_devices,
-            detected_at=datetime.now().isoformat()
+            detected_at=snapshot.taken_at.isoformat(),
+            snapshot_age_seconds=round(snapshot.age_seconds, 3)
         )
         
     except Exception as e:
@@ -155,7 +178,7 @@ async def get_storage_summary(db: Session = Depends(get_db)):
 
 
 @router.get("/devices/by-type/{device_type}", response_model=List[StorageDeviceResponse])
-async def get_devices_by_type(device_type: str, db: Session = Depends(get_db)):
+async def get_devices_by_type(device_type: str, refresh: bool = REFRESH_QUERY, db: Session = Depends(get_db)):
     """
     Get storage devices filtered by type.
     
@@ -163,15 +186,16 @@ async def get_devices_by_type(device_type: str, db: Session = Depends(get_db)):
         device_type: Type of device to filter by (HDD, SSD, USB, NVMe, etc.)
     """
     try:
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
+        storage_service = device_inventory.service
+        snapshot = await device_inventory.get(refresh=refresh)
+        devices = snapshot.devices
         
         filtered_devices = [
             device for device in devices 
             if device.device_type.lower() == device_type.lower()
         ]
         
-        return [storage_service.to_dict(device) for device in filtered_devices]
+        return [_device_response(storage_service, device, snapshot) for device in filtered_devices]
         
     except Exception as e:
         raise HTTPException(
@@ -181,15 +205,16 @@ async def get_devices_by_type(device_type: str, db: Session = Depends(get_db)):
 
 
 @router.get("/devices/with-hpa", response_model=List[StorageDeviceResponse])
-async def get_devices_with_hpa(db: Session = Depends(get_db)):
+async def get_devices_with_hpa(refresh: bool = REFRESH_QUERY, db: Session = Depends(get_db)):
     """Get all storage devices that have HPA (Host Protected Area) enabled."""
     try:
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
+        storage_service = device_inventory.service
+        snapshot = await device_inventory.get(refresh=refresh)
+        devices = snapshot.devices
         
         hpa_devices = [device for device in devices if device.hpa_present]
         
-        return [storage_service.to_dict(device) for device in hpa_devices]
+        return [_device_response(storage_service, device, snapshot) for device in hpa_devices]
         
     except Exception as e:
         raise HTTPException(
@@ -199,15 +224,16 @@ async def get_devices_with_hpa(db: Session = Depends(get_db)):
 
 
 @router.get("/devices/with-dco", response_model=List[StorageDeviceResponse])
-async def get_devices_with_dco(db: Session = Depends(get_db)):
+async def get_devices_with_dco(refresh: bool = REFRESH_QUERY, db: Session = Depends(get_db)):
     """Get all storage devices that have DCO (Device Configuration Overlay) enabled."""
     try:
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
+        storage_service = device_inventory.service
+        snapshot = await device_inventory.get(refresh=refresh)
+        devices = snapshot.devices
         
         dco_devices = [device for device in devices if device.dco_present]
         
-        return [storage_service.to_dict(device) for device in dco_devices]
+        return [_device_response(storage_service, device, snapshot) for device in dco_devices]
         
     except Exception as e:
         raise HTTPException(
@@ -217,15 +243,15 @@ async def get_devices_with_dco(db: Session = Depends(get_db)):
 
 
 @router.get("/health", response_model=Dict[str, Any])
-async def get_storage_health(db: Session = Depends(get_db)):
+async def get_storage_health(refresh: bool = REFRESH_QUERY, db: Session = Depends(get_db)):
     """
     Get health status of all storage devices.
     
     Returns devices grouped by health status and any warnings.
     """
     try:
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
+        snapshot = await device_inventory.get(refresh=refresh)
+        devices = snapshot.devices
         
         health_groups = {}
         warnings = []
@@ -247,6 +273,8 @@ async def get_storage_health(db: Session = Depends(get_db)):
                 warnings.append(f"Device {device.device} has HPA enabled")
             if device.dco_present:
                 warnings.append(f"Device {device.device} has DCO enabled")
+            if device.hpa_dco_stale:
+                warnings.append(f"HPA/DCO state of {device.device} is stale: the last probe timed out")
             if device.temperature and device.temperature > 60:
                 warnings.append(f"Device {device.device} temperature is high: {device.temperature}°C")
         
@@ -254,7 +282,9 @@ async def get_storage_health(db: Session = Depends(get_db)):
             'health_groups': health_groups,
             'warnings': warnings,
             'total_devices': len(devices),
-            'checked_at': datetime.now().isoformat()
+            'checked_at': datetime.now().isoformat(),
+            'snapshot_taken_at': snapshot.taken_at.isoformat(),
+            'snapshot_age_seconds': round(snapshot.age_seconds, 3)
         }
         
     except Exception as e:
@@ -269,19 +299,14 @@ async def refresh_device_info(device_path: str, db: Session = Depends(get_db)):
     """
     Refresh information for a specific storage device.
     
-    This endpoint can be used to get updated information about a device
-    without refreshing all devices.
+    Only this device is probed again (including its HPA/DCO state); the
+    result replaces it in the shared inventory, so the other devices
+    aren't rescanned.
     """
     try:
-        storage_service = StorageDetectionService()
-        devices = await storage_service.get_all_storage_devices()
-        
-        # Find the specific device
-        device = None
-        for d in devices:
-            if d.device == device_path or device_path in d.device:
-                device = d
-                break
+        storage_service = device_inventory.service
+        # Probes just this device and merges it into the shared inventory
+        device = await device_inventory.refresh_device(device_path)
         
         if not device:
             raise HTTPException(
@@ -289,7 +314,7 @@ async def refresh_device_info(device_path: str, db: Session = Depends(get_db)):
                 detail=f"Storage device '{device_path}' not found"
             )
         
-        return storage_service.to_dict(device)
+        return _device_response(storage_service, device, None)
         
     except HTTPException:
         raise
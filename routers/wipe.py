@@ -4,10 +4,16 @@ from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 from pathlib import Path
+import dataclasses
 import logging
 
-from database import get_db
-from services.wipe import WipeService, WipeMethod, WipeStatus, WipeResult
+from database import get_db, SessionLocal
+from services.wipe import WipeService, WipeMethod, WipeStatus, WipeResult, VerificationMode
+from services.wipe_batch import batch_manager, BatchDevice, WipeBatch, MAX_BATCH_DEVICES
+from services.wipe_planner import wipe_planner
+from services.discard import DiscardStage
+from services.device_geometry import DeviceGeometryError
+from services.wipe_engine import io_executor, WriterBackend, WriterConfig, DEFAULT_QUEUE_DEPTH, MAX_QUEUE_DEPTH
 from services.certificate_service import certificate_service
 from services.certificate_db_service import CertificateDBService
 from services.user_service import UserService
@@ -22,6 +28,17 @@ class WipeRequest(BaseModel):
     path: str = Field(..., description="Path to file, folder, or device to wipe")
     method: WipeMethod = Field(..., description="Wipe method to use")
     mock_mode: bool = Field(False, description="Enable mock mode for testing")
+    direct_io: bool = Field(False, description="Drive wipes only: bypass the page cache with O_DIRECT|O_SYNC writes")
+    concurrency: int = Field(1, ge=1, le=64, description="Folder wipes only: number of files wiped in parallel")
+    verification: VerificationMode = Field(VerificationMode.NONE, description="File and drive wipes: read the final pass back and hash it, or hash it while writing (fused)")
+    verify_sample_percent: float = Field(1.0, gt=0, le=100, description="Percentage of stripes read back in sampled and fused verification")
+    extent_aware: bool = Field(False, description="File wipes only: overwrite only allocated extents, leaving the holes of sparse files unallocated")
+    small_file_threshold_kb: int = Field(0, ge=0, le=1024 * 1024, description="Folder wipes only: overwrite files up to this size (KiB) in groups, with one filesystem sync per group and pass (0 disables)")
+    discard: DiscardStage = Field(DiscardStage.NONE, description="Drive wipes: discard (TRIM) the device before the first pass or after the final one; file wipes: punch holes over the file after the final pass")
+    writer_backend: WriterBackend = Field(WriterBackend.SYNC, description="Drive wipes only: sync (one write at a time) or threaded (queue_depth writes in flight, for SSD/NVMe)")
+    queue_depth: int = Field(DEFAULT_QUEUE_DEPTH, ge=1, le=MAX_QUEUE_DEPTH, description="Drive wipes with the threaded writer: writes kept in flight")
+    block_size_kb: Optional[int] = Field(None, ge=4, le=65536, description="Drive wipes only: KiB per write (default: sized for the device)")
+    optimize_passes: bool = Field(False, description="Drive wipes only: run the planned passes (see POST /plan), collapsing multi-pass methods to one pass plus verification on flash media")
 
 
 class WipeResponse(BaseModel):
@@ -30,11 +47,20 @@ class WipeResponse(BaseModel):
     target: str
     size_bytes: int
     size_human: str
+    allocated_bytes: Optional[int] = None  # Extent-aware file wipes: bytes actually allocated
+    files_wiped: Optional[int] = None  # Folder wipes
+    sync_calls: Optional[int] = None
+    discard_method: Optional[str] = None  # blkdiscard, blkzeroout or punch_hole
+    discarded_bytes: int = 0
+    discard_seconds: float = 0.0
+    discard_error: Optional[str] = None  # Why discarding failed or fell back
     passes_completed: int
     total_passes: int
     duration_seconds: float
     error_message: Optional[str] = None
     verification_hash: Optional[str] = None
+    verified_bytes: int = 0
+    verification_bytes_per_second: Optional[float] = None
     mock_mode: bool
     completed_at: str
     certificate_id: Optional[str] = None
@@ -46,12 +72,61 @@ class WipeResponse(BaseModel):
         from_attributes = True
 
 
+class BatchWipeRequest(BaseModel):
+    devices: List[str] = Field(..., min_length=1, max_length=MAX_BATCH_DEVICES, description="Devices to wipe concurrently, one per physical drive")
+    method: WipeMethod = Field(..., description="Wipe method used for every device")
+    mock_mode: bool = Field(False, description="Enable mock mode for testing")
+    direct_io: bool = Field(False, description="Bypass the page cache with O_DIRECT|O_SYNC writes")
+    verification: VerificationMode = Field(VerificationMode.NONE, description="Read the final pass back and hash it, or hash it while writing (fused)")
+    verify_sample_percent: float = Field(1.0, gt=0, le=100, description="Percentage of stripes read back in sampled and fused verification")
+    bandwidth_limit_mb: Optional[float] = Field(None, gt=0, description="Cap on the combined write rate of the batch, in MiB/s")
+
+
+class BatchDeviceResponse(BaseModel):
+    device: str
+    operation_id: str
+    status: str
+    throughput_bytes_per_second: float
+    progress: Optional[Dict[str, Any]] = None
+    result: Optional[WipeResponse] = None
+
+
+class BatchResponse(BaseModel):
+    batch_id: str
+    status: str
+    method: str
+    mock_mode: bool
+    created_at: str
+    finished_at: Optional[str] = None
+    bandwidth_limit_bytes_per_second: Optional[int] = None
+    aggregate_throughput_bytes_per_second: float
+    devices_total: int
+    devices_succeeded: int
+    devices_failed: int
+    devices: List[BatchDeviceResponse]
+
+
+class WipePlanRequest(BaseModel):
+    path: str = Field(..., description="Device or file to plan the wipe of")
+    method: WipeMethod = Field(..., description="Wipe method requested")
+    verification: VerificationMode = Field(VerificationMode.FULL, description="Verification of the final pass (none to skip it)")
+    verify_sample_percent: float = Field(1.0, gt=0, le=100, description="Percentage of stripes read back in sampled and fused verification")
+    collapse_on_flash: bool = Field(True, description="Collapse multi-pass methods to a single pass on flash media")
+    discard: Optional[bool] = Field(None, description="Force the discard step on or off (default: when supported on non-rotational media)")
+    rotational: Optional[bool] = Field(None, description="Override the probed rotational flag")
+    transport: Optional[str] = Field(None, description="Override the probed transport (nvme, sata, usb, mmc, ...)")
+    discard_supported: Optional[bool] = Field(None, description="Override the probed discard support")
+    write_mb_per_second: Optional[float] = Field(None, gt=0, description="Write rate used for the estimate, in MB/s (default: by media class)")
+    read_mb_per_second: Optional[float] = Field(None, gt=0, description="Read rate used for the estimate, in MB/s (default: by media class)")
+
+
 class WipeStatusResponse(BaseModel):
     operation_id: str
     status: str
     target: str
     method: str
     started_at: str
+    progress: Optional[Dict[str, Any]] = None
 
 
 class WipeSummaryResponse(BaseModel):
@@ -135,6 +210,83 @@ async def generate_certificate_for_wipe(
         return None, "failed"
 
 
+def _wipe_response(
+    result: WipeResult,
+    certificate_status: str = "not_required",
+    download_urls: Optional[Dict[str, str]] = None
+) -> WipeResponse:
+    """Response for a finished file, folder, drive or batch device wipe"""
+    return WipeResponse(
+        success=result.success,
+        method=result.method.value,
+        target=result.target,
+        size_bytes=result.size_bytes,
+        size_human=_format_size(result.size_bytes),
+        allocated_bytes=result.allocated_bytes,
+        files_wiped=result.files_wiped,
+        sync_calls=result.sync_calls,
+        discard_method=result.discard_method,
+        discarded_bytes=result.discarded_bytes,
+        discard_seconds=result.discard_seconds,
+        discard_error=result.discard_error,
+        passes_completed=result.passes_completed,
+        total_passes=result.total_passes,
+        duration_seconds=result.duration_seconds,
+        error_message=result.error_message,
+        verification_hash=result.verification_hash,
+        verified_bytes=result.verified_bytes,
+        verification_bytes_per_second=result.verification_bytes_per_second,
+        mock_mode=result.mock_mode,
+        completed_at=datetime.now().isoformat(),
+        certificate_id=result.certificate_id,
+        certificate_path=result.certificate_path,
+        certificate_status=certificate_status,
+        download_urls=download_urls
+    )
+
+
+def _batch_response(batch: WipeBatch) -> BatchResponse:
+    devices = []
+    for device in batch.devices:
+        if device.finished:
+            if device.result.success:
+                device_status = WipeStatus.COMPLETED.value
+            elif device.result.cancelled:
+                device_status = WipeStatus.CANCELLED.value
+            else:
+                device_status = WipeStatus.FAILED.value
+            snapshot = None
+        else:
+            snapshot = device.progress()
+            device_status = snapshot.status if snapshot else WipeStatus.PENDING.value
+        devices.append(BatchDeviceResponse(
+            device=device.device,
+            operation_id=device.operation_id,
+            status=device_status,
+            throughput_bytes_per_second=device.throughput_bytes_per_second,
+            progress=snapshot.to_dict() if snapshot else None,
+            result=_wipe_response(device.result, device.certificate_status, device.download_urls)
+            if device.finished else None
+        ))
+
+    finished = [device for device in batch.devices if device.finished]
+    succeeded = sum(1 for device in finished if device.result.success)
+    return BatchResponse(
+        batch_id=batch.batch_id,
+        status=batch.status.value,
+        method=batch.method.value,
+        mock_mode=batch.mock_mode,
+        created_at=batch.created_at.isoformat(),
+        finished_at=batch.finished_at.isoformat() if batch.finished_at else None,
+        bandwidth_limit_bytes_per_second=batch.bandwidth_limit_bytes_per_second,
+        aggregate_throughput_bytes_per_second=batch.aggregate_throughput_bytes_per_second,
+        devices_total=len(batch.devices),
+        devices_succeeded=succeeded,
+        devices_failed=len(finished) - succeeded,
+        devices=devices
+    )
+
+
 @router.post("/file", response_model=WipeResponse)
 async def wipe_file(
     request: WipeRequest,
@@ -158,7 +310,14 @@ async def wipe_file(
         if request.mock_mode:
             wipe_service.set_mock_mode(True)
         
-        result = await wipe_service.wipe_file(request.path, request.method)
+        result = await wipe_service.wipe_file(
+            request.path,
+            request.method,
+            verification=request.verification,
+            verify_sample_percent=request.verify_sample_percent,
+            extent_aware=request.extent_aware,
+            discard=request.discard
+        )
         
         # Reset mock mode
         if request.mock_mode:
@@ -170,24 +329,7 @@ async def wipe_file(
         if result.success:
             download_urls, certificate_status = await generate_certificate_for_wipe(result, user_id, db)
         
-        return WipeResponse(
-            success=result.success,
-            method=result.method.value,
-            target=result.target,
-            size_bytes=result.size_bytes,
-            size_human=_format_size(result.size_bytes),
-            passes_completed=result.passes_completed,
-            total_passes=result.total_passes,
-            duration_seconds=result.duration_seconds,
-            error_message=result.error_message,
-            verification_hash=result.verification_hash,
-            mock_mode=result.mock_mode,
-            completed_at=datetime.now().isoformat(),
-            certificate_id=result.certificate_id,
-            certificate_path=result.certificate_path,
-            certificate_status=certificate_status,
-            download_urls=download_urls
-        )
+        return _wipe_response(result, certificate_status, download_urls)
         
     except Exception as e:
         raise HTTPException(
@@ -214,7 +356,12 @@ async def wipe_folder(
         if request.mock_mode:
             wipe_service.set_mock_mode(True)
         
-        result = await wipe_service.wipe_folder(request.path, request.method)
+        result = await wipe_service.wipe_folder(
+            request.path,
+            request.method,
+            concurrency=request.concurrency,
+            small_file_threshold=request.small_file_threshold_kb * 1024
+        )
         
         # Reset mock mode
         if request.mock_mode:
@@ -226,24 +373,7 @@ async def wipe_folder(
         if result.success:
             download_urls, certificate_status = await generate_certificate_for_wipe(result, user_id, db)
         
-        return WipeResponse(
-            success=result.success,
-            method=result.method.value,
-            target=result.target,
-            size_bytes=result.size_bytes,
-            size_human=_format_size(result.size_bytes),
-            passes_completed=result.passes_completed,
-            total_passes=result.total_passes,
-            duration_seconds=result.duration_seconds,
-            error_message=result.error_message,
-            verification_hash=result.verification_hash,
-            mock_mode=result.mock_mode,
-            completed_at=datetime.now().isoformat(),
-            certificate_id=result.certificate_id,
-            certificate_path=result.certificate_path,
-            certificate_status=certificate_status,
-            download_urls=download_urls
-        )
+        return _wipe_response(result, certificate_status, download_urls)
         
     except Exception as e:
         raise HTTPException(
@@ -274,7 +404,39 @@ async def wipe_drive(
         if request.mock_mode:
             wipe_service.set_mock_mode(True)
         
-        result = await wipe_service.wipe_drive(request.path, request.method)
+        passes = None
+        verification = request.verification
+        discard = request.discard
+        if request.optimize_passes:
+            # Plans always end with a verification pass; sampled unless one was requested
+            if verification == VerificationMode.NONE:
+                verification = VerificationMode.SAMPLED
+            plan = await wipe_planner.plan_target(
+                request.path,
+                request.method,
+                verification=verification,
+                verify_sample_percent=request.verify_sample_percent
+            )
+            passes = plan.patterns
+            if plan.discard and discard == DiscardStage.NONE:
+                discard = DiscardStage.AFTER
+            for note in plan.notes:
+                logger.info(f"Wipe plan for {request.path}: {note}")
+        
+        result = await wipe_service.wipe_drive(
+            request.path,
+            request.method,
+            direct_io=request.direct_io,
+            verification=verification,
+            verify_sample_percent=request.verify_sample_percent,
+            passes=passes,
+            discard=discard,
+            writer_config=WriterConfig(
+                backend=request.writer_backend,
+                queue_depth=request.queue_depth,
+                block_size=request.block_size_kb * 1024 if request.block_size_kb else None
+            )
+        )
         
         # Reset mock mode
         if request.mock_mode:
@@ -286,24 +448,7 @@ async def wipe_drive(
         if result.success:
             download_urls, certificate_status = await generate_certificate_for_wipe(result, user_id, db)
         
-        return WipeResponse(
-            success=result.success,
-            method=result.method.value,
-            target=result.target,
-            size_bytes=result.size_bytes,
-            size_human=_format_size(result.size_bytes),
-            passes_completed=result.passes_completed,
-            total_passes=result.total_passes,
-            duration_seconds=result.duration_seconds,
-            error_message=result.error_message,
-            verification_hash=result.verification_hash,
-            mock_mode=result.mock_mode,
-            completed_at=datetime.now().isoformat(),
-            certificate_id=result.certificate_id,
-            certificate_path=result.certificate_path,
-            certificate_status=certificate_status,
-            download_urls=download_urls
-        )
+        return _wipe_response(result, certificate_status, download_urls)
         
     except Exception as e:
         raise HTTPException(
@@ -312,6 +457,117 @@ async def wipe_drive(
         )
 
 
+@router.post("/batch", response_model=BatchResponse, status_code=status.HTTP_202_ACCEPTED)
+async def start_batch_wipe(
+    request: BatchWipeRequest,
+    user_id: int = Query(1, description="User ID for certificate generation")
+):
+    """
+    Wipe several drives at once (station mode).
+    
+    Every device gets its own writer and fails independently of the others.
+    Returns at once with a batch ID; poll GET /batch/{batch_id} for live
+    per-device throughput, and for each device's result and certificate.
+    
+    WARNING: This will permanently destroy all data on every listed drive.
+    """
+    async def issue_certificate(batch: WipeBatch, device: BatchDevice):
+        if not device.result.success:
+            return
+        device.certificate_status = "generating"
+        db = SessionLocal()
+        try:
+            device.download_urls, device.certificate_status = await generate_certificate_for_wipe(
+                device.result, user_id, db
+            )
+        finally:
+            db.close()
+
+    bandwidth_limit = None
+    if request.bandwidth_limit_mb:
+        bandwidth_limit = int(request.bandwidth_limit_mb * 1024 * 1024)
+    try:
+        batch = await batch_manager.start(
+            request.devices,
+            request.method,
+            direct_io=request.direct_io,
+            verification=request.verification,
+            verify_sample_percent=request.verify_sample_percent,
+            bandwidth_limit_bytes_per_second=bandwidth_limit,
+            mock_mode=request.mock_mode,
+            on_device_done=issue_certificate
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return _batch_response(batch)
+
+
+@router.get("/batch", response_model=List[BatchResponse])
+async def list_batch_wipes():
+    """List running and recently finished batches"""
+    return [_batch_response(batch) for batch in batch_manager.batches()]
+
+
+@router.get("/batch/{batch_id}", response_model=BatchResponse)
+async def get_batch_wipe(batch_id: str):
+    """Get a batch's live per-device progress, or its per-device results once finished"""
+    batch = batch_manager.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found")
+    return _batch_response(batch)
+
+
+@router.post("/batch/{batch_id}/cancel", response_model=BatchResponse)
+async def cancel_batch_wipe(batch_id: str):
+    """Cancel every unfinished device of a batch; finished devices keep their results"""
+    batch = batch_manager.cancel(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Batch not found")
+    return _batch_response(batch)
+
+
+@router.post("/plan", response_model=Dict[str, Any])
+async def plan_wipe(request: WipePlanRequest):
+    """
+    Dry run: show the passes, verification and discard a wipe would run.
+    
+    The target's media is probed (rotational, transport, discard support)
+    and multi-pass methods are collapsed to a single pass on flash, where
+    extra passes add wear but reach no additional data. Nothing is written;
+    the response lists every step with its bytes and estimated duration.
+    Probed media properties can be overridden to plan for other hardware.
+    """
+    try:
+        media = await io_executor.run(wipe_planner.probe, request.path)
+    except DeviceGeometryError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    overrides = {
+        name: value
+        for name, value in (
+            ("rotational", request.rotational),
+            ("transport", request.transport),
+            ("discard_supported", request.discard_supported),
+        )
+        if value is not None
+    }
+    if overrides:
+        media = dataclasses.replace(media, **overrides)
+    
+    plan = wipe_planner.plan(
+        request.method,
+        media,
+        verification=request.verification,
+        verify_sample_percent=request.verify_sample_percent,
+        collapse_on_flash=request.collapse_on_flash,
+        discard=request.discard,
+        write_bytes_per_second=request.write_mb_per_second * 1000 * 1000 if request.write_mb_per_second else None,
+        read_bytes_per_second=request.read_mb_per_second * 1000 * 1000 if request.read_mb_per_second else None
+    )
+    return plan.to_dict()
+
+
 @router.get("/methods", response_model=List[Dict[str, Any]])
 async def get_wipe_methods():
     """Get information about all supported wipe methods"""
@@ -385,17 +641,16 @@ async def get_wipe_status():
 
 @router.get("/operations", response_model=List[WipeStatusResponse])
 async def get_active_operations():
-    """Get list of currently active wipe operations"""
-    active_ops = wipe_service.get_active_operations()
-    
+    """Get list of currently active wipe operations with live progress"""
     operations = []
-    for op_id, status in active_ops.items():
+    for snapshot in wipe_service.list_progress():
         operations.append(WipeStatusResponse(
-            operation_id=op_id,
-            status=status.value,
-            target="Unknown",  # Would need to track this in real implementation
-            method="Unknown",  # Would need to track this in real implementation
-            started_at=datetime.now().isoformat()
+            operation_id=snapshot.operation_id,
+            status=snapshot.status,
+            target=snapshot.target,
+            method=snapshot.method,
+            started_at=snapshot.started_at,
+            progress=snapshot.to_dict()
         ))
     
     return operations
@@ -403,7 +658,12 @@ async def get_active_operations():
 
 @router.post("/operations/{operation_id}/cancel")
 async def cancel_operation(operation_id: str):
-    """Cancel an active wipe operation"""
+    """
+    Cancel an active wipe operation.
+    
+    The wipe stops within one chunk and finishes with a partial result;
+    the response carries the operation's progress at the time of the request.
+    """
     success = wipe_service.cancel_operation(operation_id)
     
     if not success:
@@ -412,7 +672,12 @@ async def cancel_operation(operation_id: str):
             detail="Operation not found or already completed"
         )
     
-    return {"message": f"Operation {operation_id} cancelled successfully"}
+    snapshot = wipe_service.get_progress(operation_id)
+    return {
+        "message": f"Cancellation requested for operation {operation_id}",
+        "status": WipeStatus.CANCELLED.value,
+        "progress": snapshot.to_dict() if snapshot else None
+    }
 
 
 @router.post("/mock-mode")
@@ -466,24 +731,7 @@ async def test_wipe_operation(
         if not mock_mode and os.path.exists(temp_path):
             os.unlink(temp_path)
         
-        return WipeResponse(
-            success=result.success,
-            method=result.method.value,
-            target=result.target,
-            size_bytes=result.size_bytes,
-            size_human=_format_size(result.size_bytes),
-            passes_completed=result.passes_completed,
-            total_passes=result.total_passes,
-            duration_seconds=result.duration_seconds,
-            error_message=result.error_message,
-            verification_hash=result.verification_hash,
-            mock_mode=result.mock_mode,
-            completed_at=datetime.now().isoformat(),
-            certificate_id=result.certificate_id,
-            certificate_path=result.certificate_path,
-            certificate_status=certificate_status,
-            download_urls=download_urls
-        )
+        return _wipe_response(result, certificate_status, download_urls)
         
     except Exception as e:
         raise HTTPException(
@@ -0,0 +1,457 @@
+"""
+Native view of Linux block devices, read from sysfs and procfs.
+
+Everything lsblk reports for inventory purposes is a small file under
+/sys/block or a line of /proc/partitions, so reading them directly takes
+milliseconds, spawns no processes and works in minimal images without
+util-linux:
+
+- /proc/partitions: every disk and partition with its size;
+- /sys/block/<disk>/{size,removable,ro,queue/*}: size, flags, sector sizes,
+  rotational and discard support;
+- /sys/block/<disk>/device/{model,serial,state}: identity and state
+  (virtio disks keep their serial in /sys/block/<disk>/serial);
+- the resolved /sys/block/<disk> path: the bus the disk hangs off.
+
+BlockTopology indexes how nodes stack (partitions, LVM, dm-crypt, RAID)
+from /sys/class/block, mapping each node to its physical disks and telling
+whether anything on a disk is mounted or in use.
+"""
+
+import logging
+import os
+import re
+import stat
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SYS_BLOCK = "/sys/block"
+SYS_CLASS_BLOCK = "/sys/class/block"
+PROC_PARTITIONS = "/proc/partitions"
+SYSFS_SECTOR_SIZE = 512  # /sys/block/*/size is always in 512-byte units
+
+# RAM-backed devices are never wipe or inventory targets
+IGNORED_PREFIXES = ("ram", "zram")
+
+# Path fragments of resolved /sys/block entries, in match order
+TRANSPORT_MARKERS = [
+    ("/usb", "usb"),
+    ("/nvme", "nvme"),
+    ("/mmc", "mmc"),
+    ("/virtio", "virtio"),
+    ("/ata", "sata"),
+    ("/virtual/block/loop", "loop"),
+    ("/virtual/block/", "virtual"),
+]
+
+
+class DeviceInUseError(Exception):
+    """Raised when a device can't be wiped because something on it is mounted or in use"""
+
+
+def read_sysfs(path: str) -> Optional[str]:
+    """Content of a sysfs attribute, stripped; None if it's missing or unreadable"""
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _read_sysfs_int(path: str) -> Optional[int]:
+    value = read_sysfs(path)
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def sysfs_transport(sysfs_path: str) -> str:
+    """Bus of a device from its resolved sysfs path: nvme, sata, usb, mmc, virtio, loop, virtual or scsi"""
+    for marker, name in TRANSPORT_MARKERS:
+        if marker in sysfs_path:
+            return name
+    return "scsi"
+
+
+def read_proc_partitions(path: str = PROC_PARTITIONS) -> Dict[str, Tuple[int, int, int]]:
+    """Map every block node name in /proc/partitions to (major, minor, size in bytes)"""
+    entries: Dict[str, Tuple[int, int, int]] = {}
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return entries
+    for line in lines[1:]:
+        fields = line.split()
+        if len(fields) != 4:
+            continue
+        try:
+            major, minor, blocks = int(fields[0]), int(fields[1]), int(fields[2])
+        except ValueError:
+            continue
+        entries[fields[3]] = (major, minor, blocks * 1024)  # Sizes are in 1 KiB blocks
+    return entries
+
+
+@dataclass
+class BlockPartition:
+    """A partition of a block device"""
+    name: str
+    path: str
+    number: Optional[int]
+    size_bytes: int
+
+
+@dataclass
+class BlockDevice:
+    """A whole block device as sysfs describes it"""
+    name: str
+    path: str  # /dev/<name>
+    sysfs_path: str  # Resolved /sys/block/<name>
+    size_bytes: int
+    logical_sector_size: int
+    physical_sector_size: int
+    rotational: Optional[bool]
+    removable: bool
+    read_only: bool
+    discard_supported: bool
+    transport: str
+    model: Optional[str] = None
+    serial: Optional[str] = None
+    state: Optional[str] = None
+    partitions: List[BlockPartition] = field(default_factory=list)
+
+
+def probe_block_device(name: str, proc_partitions: Optional[Dict[str, Tuple[int, int, int]]] = None,
+                       sys_block: str = SYS_BLOCK) -> Optional[BlockDevice]:
+    """
+    Describe one whole device (e.g. "sda") from sysfs
+
+    Args:
+        name: Name of the device under /sys/block
+        proc_partitions: Parsed /proc/partitions (read when omitted)
+        sys_block: sysfs block directory
+
+    Returns:
+        BlockDevice, or None if the device doesn't exist
+    """
+    node = os.path.join(sys_block, name)
+    if not os.path.isdir(node):
+        return None
+    if proc_partitions is None:
+        proc_partitions = read_proc_partitions()
+
+    sectors = _read_sysfs_int(os.path.join(node, "size")) or 0
+    queue = os.path.join(node, "queue")
+    logical = _read_sysfs_int(os.path.join(queue, "logical_block_size")) or SYSFS_SECTOR_SIZE
+    physical = _read_sysfs_int(os.path.join(queue, "physical_block_size")) or logical
+    flag = read_sysfs(os.path.join(queue, "rotational"))
+    device_dir = os.path.join(node, "device")
+    sysfs_path = os.path.realpath(node)
+
+    partitions = []
+    try:
+        children = sorted(os.listdir(node))
+    except OSError:
+        children = []
+    for child in children:
+        part_dir = os.path.join(node, child)
+        if not os.path.exists(os.path.join(part_dir, "partition")):
+            continue
+        size = proc_partitions[child][2] if child in proc_partitions else \
+            (_read_sysfs_int(os.path.join(part_dir, "size")) or 0) * SYSFS_SECTOR_SIZE
+        partitions.append(BlockPartition(
+            name=child,
+            path=f"/dev/{child}",
+            number=_read_sysfs_int(os.path.join(part_dir, "partition")),
+            size_bytes=size
+        ))
+    partitions.sort(key=lambda p: (p.number is None, p.number or 0, p.name))
+
+    return BlockDevice(
+        name=name,
+        path=f"/dev/{name}",
+        sysfs_path=sysfs_path,
+        size_bytes=sectors * SYSFS_SECTOR_SIZE,
+        logical_sector_size=logical,
+        physical_sector_size=physical,
+        rotational=flag == "1" if flag in ("0", "1") else None,
+        removable=read_sysfs(os.path.join(node, "removable")) == "1",
+        read_only=read_sysfs(os.path.join(node, "ro")) == "1",
+        discard_supported=(read_sysfs(os.path.join(queue, "discard_max_bytes")) or "0") not in ("", "0"),
+        transport=sysfs_transport(sysfs_path),
+        # MMC cards call their model "name"
+        model=read_sysfs(os.path.join(device_dir, "model")) or read_sysfs(os.path.join(device_dir, "name")) or None,
+        serial=read_sysfs(os.path.join(device_dir, "serial")) or read_sysfs(os.path.join(node, "serial")) or None,
+        state=read_sysfs(os.path.join(device_dir, "state")) or None,
+        partitions=partitions
+    )
+
+
+def scan_block_devices(include_empty: bool = False, sys_block: str = SYS_BLOCK) -> List[BlockDevice]:
+    """
+    Describe every whole block device (blocking, but only reads small files)
+
+    Args:
+        include_empty: Keep zero-sized devices (unattached loop devices, empty card readers)
+        sys_block: sysfs block directory
+
+    Returns:
+        Devices sorted by name; empty where sysfs isn't available
+    """
+    try:
+        names = sorted(os.listdir(sys_block))
+    except OSError as e:
+        logger.debug(f"Cannot list {sys_block}: {e}")
+        return []
+
+    proc_partitions = read_proc_partitions()
+    devices = []
+    for name in names:
+        if name.startswith(IGNORED_PREFIXES):
+            continue
+        device = probe_block_device(name, proc_partitions, sys_block)
+        if device is None or (device.size_bytes == 0 and not include_empty):
+            continue
+        devices.append(device)
+    return devices
+
+
+@dataclass
+class BlockNode:
+    """One node of /sys/class/block and its links to the others"""
+    name: str
+    dev: str  # "major:minor"
+    parent: Optional[str]  # Disk holding a partition
+    slaves: List[str]  # Nodes a dm/md device is built on
+    holders: List[str]  # dm/md devices built on this node
+    dm_name: Optional[str] = None
+
+    @property
+    def path(self) -> str:
+        """Device node, under the /dev/mapper name for device-mapper volumes"""
+        return f"/dev/mapper/{self.dm_name}" if self.dm_name else f"/dev/{self.name}"
+
+
+def _list_dir(path: str) -> List[str]:
+    try:
+        return sorted(os.listdir(path))
+    except OSError:
+        return []
+
+
+def _unescape(field: str) -> str:
+    """Undo the octal escapes (\\040 for space) of /proc/self/mountinfo and /proc/swaps"""
+    return re.sub(r'\\([0-7]{3})', lambda m: chr(int(m.group(1), 8)), field)
+
+
+class BlockTopology:
+    """
+    Index of how block nodes stack on each other
+
+    Built from /sys/class/block in one pass: a partition points at its disk
+    through its sysfs parent, and device-mapper (LVM, dm-crypt, multipath)
+    and md RAID devices list the nodes they're built on under slaves/ and
+    the nodes built on them under holders/. Every node is resolved to the
+    physical disks beneath it, so grouping and "is this disk in use?"
+    checks are dictionary lookups.
+    """
+
+    def __init__(self, nodes: Dict[str, BlockNode]):
+        self.nodes = nodes
+        self._by_dev = {node.dev: name for name, node in nodes.items()}
+        self._children: Dict[str, List[str]] = {name: list(node.holders) for name, node in nodes.items()}
+        for name, node in nodes.items():
+            if node.parent in self._children:
+                self._children[node.parent].append(name)
+        self._physical: Dict[str, Tuple[str, ...]] = {}
+        for name in nodes:
+            self._resolve(name, set())
+
+    def _resolve(self, name: str, visiting: set) -> Tuple[str, ...]:
+        if name in self._physical:
+            return self._physical[name]
+        node = self.nodes.get(name)
+        if node is None or name in visiting:
+            return (name,)
+        visiting.add(name)
+        if node.parent:
+            disks = self._resolve(node.parent, visiting)
+        elif node.slaves:
+            disks = tuple(sorted({disk for slave in node.slaves for disk in self._resolve(slave, visiting)}))
+        else:
+            disks = (name,)
+        self._physical[name] = disks
+        return disks
+
+    def node_name(self, path: str) -> Optional[str]:
+        """
+        Node a path refers to: device nodes by device number (so symlinks
+        like /dev/mapper/* and /dev/disk/by-id/* work), bare names as they are
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            name = os.path.basename(path)
+            return name if name in self.nodes else None
+        if not stat.S_ISBLK(st.st_mode):
+            return None
+        return self._by_dev.get(f"{os.major(st.st_rdev)}:{os.minor(st.st_rdev)}")
+
+    def physical_disks(self, path: str) -> List[str]:
+        """Paths of the physical disks a node lives on (several for RAID and spanned volumes)"""
+        name = self.node_name(path)
+        if name is None:
+            return []
+        return [f"/dev/{disk}" for disk in self._physical.get(name, (name,))]
+
+    def disks_holding(self, path: str) -> List[str]:
+        """
+        Paths of the physical disks a wipe target lives on: a device node's
+        own disks, or those beneath the filesystem holding a file or folder
+
+        Returns an empty list for character devices, paths that don't exist
+        and filesystems with no block device (tmpfs, network mounts).
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return []
+        if stat.S_ISBLK(st.st_mode):
+            return self.physical_disks(path)
+        if stat.S_ISCHR(st.st_mode):
+            return []
+        name = self._by_dev.get(f"{os.major(st.st_dev)}:{os.minor(st.st_dev)}")
+        if name is None:
+            # btrfs and friends report an anonymous device number; go by the mount's source
+            name = self._mounted_node(path)
+        if name is None:
+            return []
+        return [f"/dev/{disk}" for disk in self._physical.get(name, (name,))]
+
+    def _mounted_node(self, path: str) -> Optional[str]:
+        """Node mounted on the filesystem holding a path, if it is a block device"""
+        mountpoint = os.path.realpath(path)
+        while not os.path.ismount(mountpoint):
+            parent = os.path.dirname(mountpoint)
+            if parent == mountpoint:
+                break
+            mountpoint = parent
+        for name, mountpoints in self.read_mounts().items():
+            if mountpoint in mountpoints:
+                return name
+        return None
+
+    def stacked_on(self, name: str) -> List[str]:
+        """A node and everything on it: partitions, and dm/md devices built on those, transitively"""
+        found = [name]
+        seen = {name}
+        for current in found:
+            for child in self._children.get(current, []):
+                if child not in seen:
+                    seen.add(child)
+                    found.append(child)
+        return found
+
+    def in_use(
+        self,
+        path: str,
+        mounts: Optional[Dict[str, List[str]]] = None,
+        swaps: Optional[List[str]] = None
+    ) -> List[str]:
+        """
+        Why a node can't be wiped: filesystems mounted, swap active or
+        volumes built on it or anything on it
+
+        Args:
+            path: Device node (or name)
+            mounts: Mounted nodes (default: read_mounts())
+            swaps: Nodes used as swap (default: read_swaps())
+
+        Returns:
+            Human-readable reasons; empty if the node is unused (or unknown)
+        """
+        name = self.node_name(path)
+        if name is None:
+            return []
+        if mounts is None:
+            mounts = self.read_mounts()
+        if swaps is None:
+            swaps = self.read_swaps()
+
+        reasons = []
+        stacked = self.stacked_on(name)
+        for node_name in stacked:
+            node = self.nodes.get(node_name)
+            node_path = node.path if node else f"/dev/{node_name}"
+            for mountpoint in mounts.get(node_name, []):
+                reasons.append(f"{node_path} is mounted on {mountpoint}")
+            if node_name in swaps:
+                reasons.append(f"{node_path} is in use as swap")
+        if not reasons:
+            # Volumes held open by the kernel even when nothing is mounted (LVM, dm-crypt, RAID)
+            for node_name in stacked[1:]:
+                node = self.nodes.get(node_name)
+                if node is not None and node.parent is None:
+                    reasons.append(f"{node.path} is built on it")
+        return reasons
+
+    def read_mounts(self, mountinfo: str = "/proc/self/mountinfo") -> Dict[str, List[str]]:
+        """Mountpoints by node name"""
+        mounts: Dict[str, List[str]] = {}
+        try:
+            with open(mountinfo) as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return mounts
+        for line in lines:
+            fields = line.split()
+            if len(fields) < 5 or '-' not in fields:
+                continue
+            separator = fields.index('-')
+            # Filesystems like btrfs report an anonymous device number; fall back to the source
+            name = self._by_dev.get(fields[2])
+            if name is None and len(fields) > separator + 2:
+                name = self.node_name(_unescape(fields[separator + 2]))
+            if name is not None:
+                mounts.setdefault(name, []).append(_unescape(fields[4]))
+        return mounts
+
+    def read_swaps(self, swaps: str = "/proc/swaps") -> List[str]:
+        """Names of nodes used as swap (swap files don't count)"""
+        try:
+            with open(swaps) as f:
+                lines = f.read().splitlines()[1:]
+        except OSError:
+            return []
+        names = []
+        for line in lines:
+            fields = line.split()
+            if fields and fields[1:2] == ["partition"]:
+                name = self.node_name(_unescape(fields[0]))
+                if name is not None:
+                    names.append(name)
+        return names
+
+
+def build_topology(sys_class_block: str = SYS_CLASS_BLOCK) -> BlockTopology:
+    """Index every block node (blocking, but only lists directories and reads small files)"""
+    nodes: Dict[str, BlockNode] = {}
+    for name in _list_dir(sys_class_block):
+        entry = os.path.join(sys_class_block, name)
+        sysfs_path = os.path.realpath(entry)
+        parent = None
+        if os.path.exists(os.path.join(sysfs_path, "partition")):
+            parent = os.path.basename(os.path.dirname(sysfs_path))
+        nodes[name] = BlockNode(
+            name=name,
+            dev=read_sysfs(os.path.join(entry, "dev")) or "",
+            parent=parent,
+            slaves=_list_dir(os.path.join(entry, "slaves")),
+            holders=_list_dir(os.path.join(entry, "holders")),
+            dm_name=read_sysfs(os.path.join(entry, "dm", "name")) or None
+        )
+    return BlockTopology(nodes)
@@ -0,0 +1,273 @@
+"""
+Size and sector geometry of wipe targets.
+
+`os.stat().st_size` is 0 for block devices, so the size and sector layout
+of a device are read with the block-device ioctls first, then from
+/sys/block, and finally by seeking to the end of the device. Regular files
+(disk images) report their size from stat. Results for block devices are
+cached per device node and the medium behind it: the kernel's disk
+sequence number (bumped whenever a disk is attached or its media changes,
+Linux 5.15+), or the serial number on older kernels, together with the
+size. A drive swapped into a hot-swap bay, or a loop device attached to
+another image, reuses the node and device number but not these, so it is
+probed again.
+"""
+
+import logging
+import math
+import os
+import stat
+import struct
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Linux block-device ioctls (linux/fs.h)
+BLKGETSIZE64 = 0x80081272  # u64: size in bytes
+BLKSSZGET = 0x1268         # int: logical sector size
+BLKPBSZGET = 0x127b        # unsigned int: physical sector size
+BLKIOOPT = 0x1279          # unsigned int: optimal I/O size (0 if unknown)
+
+DEFAULT_SECTOR_SIZE = 512
+SYSFS_SECTOR_SIZE = 512  # /sys/block/*/size is always in 512-byte units
+MAX_IO_UNIT = 64 * 1024 * 1024  # Ignore optimal I/O sizes that would force huge chunks
+
+
+class DeviceGeometryError(Exception):
+    """Raised when the size of a wipe target cannot be determined"""
+
+
+@dataclass(frozen=True)
+class DeviceGeometry:
+    """Size and sector layout of a wipe target"""
+    path: str
+    size_bytes: int
+    logical_sector_size: int
+    physical_sector_size: int
+    optimal_io_size: int  # 0 when the device doesn't report one
+    is_block_device: bool
+    source: str  # ioctl, sysfs, seek or stat
+
+    def io_chunk_size(self, base: int) -> int:
+        """Round a chunk size up so every chunk covers whole physical sectors and optimal I/O units"""
+        unit = self.physical_sector_size
+        if self.optimal_io_size > 0:
+            with_optimal = unit * self.optimal_io_size // math.gcd(unit, self.optimal_io_size)
+            if with_optimal <= MAX_IO_UNIT:
+                unit = with_optimal
+        return max(unit, (base + unit - 1) // unit * unit)
+
+
+def _ioctl_geometry(fd: int) -> Optional[Tuple[int, int, int, int]]:
+    """Read (size, logical, physical, optimal) with the block-device ioctls"""
+    if fcntl is None:
+        return None
+    try:
+        size = struct.unpack('Q', fcntl.ioctl(fd, BLKGETSIZE64, b'\0' * 8))[0]
+        logical = struct.unpack('i', fcntl.ioctl(fd, BLKSSZGET, b'\0' * 4))[0]
+    except OSError as e:
+        logger.debug(f"Block-device ioctls not available: {e}")
+        return None
+
+    # Older kernels may lack these; fall back to the logical sector size
+    try:
+        physical = struct.unpack('I', fcntl.ioctl(fd, BLKPBSZGET, b'\0' * 4))[0]
+    except OSError:
+        physical = logical
+    try:
+        optimal = struct.unpack('I', fcntl.ioctl(fd, BLKIOOPT, b'\0' * 4))[0]
+    except OSError:
+        optimal = 0
+    return size, logical, physical, optimal
+
+
+def _read_sysfs_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def _sysfs_geometry(st: os.stat_result) -> Optional[Tuple[int, int, int, int]]:
+    """Read (size, logical, physical, optimal) from /sys/dev/block/MAJ:MIN"""
+    node = f"/sys/dev/block/{os.major(st.st_rdev)}:{os.minor(st.st_rdev)}"
+    sectors = _read_sysfs_int(os.path.join(node, "size"))
+    if sectors is None:
+        return None
+
+    # Partitions share the queue limits of their parent disk
+    queue = os.path.join(node, "queue")
+    if not os.path.isdir(queue):
+        queue = os.path.join(os.path.realpath(node), "..", "queue")
+    logical = _read_sysfs_int(os.path.join(queue, "logical_block_size")) or DEFAULT_SECTOR_SIZE
+    physical = _read_sysfs_int(os.path.join(queue, "physical_block_size")) or logical
+    optimal = _read_sysfs_int(os.path.join(queue, "optimal_io_size")) or 0
+    return sectors * SYSFS_SECTOR_SIZE, logical, physical, optimal
+
+
+def _read_sysfs_str(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _media_identity(st: os.stat_result) -> Optional[Tuple[str, Optional[int]]]:
+    """
+    (medium, size in sectors) of the device behind a node, from sysfs
+
+    Returns None when neither the disk sequence number nor a serial is
+    available (no sysfs), in which case the geometry can't be cached safely.
+    """
+    if not hasattr(os, 'major'):
+        return None
+    node = f"/sys/dev/block/{os.major(st.st_rdev)}:{os.minor(st.st_rdev)}"
+    # Partitions take the identity of their disk
+    disk = node if not os.path.exists(os.path.join(node, "partition")) else os.path.join(os.path.realpath(node), "..")
+    diskseq = _read_sysfs_str(os.path.join(disk, "diskseq"))
+    medium = f"diskseq:{diskseq}" if diskseq else None
+    if medium is None:
+        for name in ("device/wwid", "device/serial", "serial"):
+            serial = _read_sysfs_str(os.path.join(disk, name))
+            if serial:
+                medium = f"serial:{serial}"
+                break
+    if medium is None:
+        return None
+    return medium, _read_sysfs_int(os.path.join(node, "size"))
+
+
+def probe_geometry(path: str) -> DeviceGeometry:
+    """
+    Determine the geometry of a device or file (uncached)
+
+    Raises:
+        DeviceGeometryError: The target doesn't exist or its size can't be read
+    """
+    try:
+        st = os.stat(path)
+    except OSError as e:
+        raise DeviceGeometryError(f"Cannot access {path}: {e}")
+
+    if stat.S_ISREG(st.st_mode):
+        block_size = getattr(st, 'st_blksize', 0) or 0
+        return DeviceGeometry(
+            path=path,
+            size_bytes=st.st_size,
+            logical_sector_size=DEFAULT_SECTOR_SIZE,
+            physical_sector_size=DEFAULT_SECTOR_SIZE,
+            optimal_io_size=block_size,
+            is_block_device=False,
+            source="stat"
+        )
+
+    is_block = stat.S_ISBLK(st.st_mode)
+    values, source = None, None
+    fd = None
+    try:
+        try:
+            fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        except OSError as e:
+            # sysfs can still describe a block device we aren't allowed to open
+            if not is_block:
+                raise DeviceGeometryError(f"Cannot open {path}: {e}")
+            logger.debug(f"Cannot open {path} for probing: {e}")
+
+        if is_block and fd is not None:
+            values, source = _ioctl_geometry(fd), "ioctl"
+        if is_block and values is None and hasattr(os, 'major'):
+            values, source = _sysfs_geometry(st), "sysfs"
+        if values is None and fd is not None:
+            # Last resort: works for most devices, but reports no sector sizes
+            size = os.lseek(fd, 0, os.SEEK_END)
+            values, source = (size, DEFAULT_SECTOR_SIZE, DEFAULT_SECTOR_SIZE, 0), "seek"
+    except OSError as e:
+        raise DeviceGeometryError(f"Cannot determine the size of {path}: {e}")
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+    if values is None:
+        raise DeviceGeometryError(f"Cannot determine the size of {path}")
+
+    size, logical, physical, optimal = values
+    return DeviceGeometry(
+        path=path,
+        size_bytes=size,
+        logical_sector_size=logical or DEFAULT_SECTOR_SIZE,
+        physical_sector_size=max(physical or 0, logical or DEFAULT_SECTOR_SIZE),
+        optimal_io_size=optimal,
+        is_block_device=is_block,
+        source=source
+    )
+
+
+class DeviceGeometryCache:
+    """Per-device cache of block-device geometry"""
+
+    def __init__(self):
+        # (path, device number) -> ((medium, size), geometry): one entry per node, so
+        # hot swaps and loop re-attaches replace entries instead of piling them up
+        self._cache: Dict[Tuple[str, int], Tuple[Tuple[str, Optional[int]], DeviceGeometry]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str, refresh: bool = False) -> DeviceGeometry:
+        """
+        Get the geometry of a device or file
+
+        Block devices are cached by path, device number and medium, so a
+        node that now points at a different device or drive is probed
+        again; devices whose medium can't be identified are always probed,
+        as are regular files, since their size changes.
+
+        Args:
+            path: Device or file
+            refresh: Probe even if a cached result exists
+
+        Raises:
+            DeviceGeometryError: The target doesn't exist or its size can't be read
+        """
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            raise DeviceGeometryError(f"Cannot access {path}: {e}")
+        if not stat.S_ISBLK(st.st_mode):
+            return probe_geometry(path)
+        identity = _media_identity(st)
+        if identity is None:
+            return probe_geometry(path)
+
+        key = (os.path.realpath(path), st.st_rdev)
+        if not refresh:
+            with self._lock:
+                cached = self._cache.get(key)
+            if cached is not None and cached[0] == identity:
+                return cached[1]
+
+        geometry = probe_geometry(path)
+        with self._lock:
+            self._cache[key] = (identity, geometry)
+        return geometry
+
+    def invalidate(self, path: Optional[str] = None):
+        """Forget cached geometry for one device, or all of them"""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                real_path = os.path.realpath(path)
+                for key in [key for key in self._cache if key[0] == real_path]:
+                    del self._cache[key]
+
+
+# Global geometry cache shared by every WipeService instance
+device_geometry = DeviceGeometryCache()
@@ -0,0 +1,286 @@
+"""
+Process-wide cache of the storage device inventory.
+
+A full scan stats every mounted filesystem and can run lsblk and a couple
+of hdparm calls per disk, so it may take seconds and spawn dozens of
+processes. Every storage and device endpoint reads the inventory from this
+cache instead:
+
+- snapshots are reused for a configurable TTL;
+- concurrent callers that miss the cache share one in-flight scan
+  (single flight), so a dashboard refresh costs one scan, not one per tile;
+- a snapshot is dropped as soon as the block-device layout changes: the
+  /sys/block listing, /proc/partitions (which also reflects resizes and
+  repartitioning) and the mount table are fingerprinted on every lookup,
+  which costs a few small reads.
+
+Snapshots record when they were taken, so responses can report their age.
+They index their devices by canonical path (partitions and symlinks lead
+to their disk) and by serial number, so single-device lookups are
+dictionary lookups, and a single device can be re-probed and merged into
+the current snapshot without rescanning the others.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from services.storage_service import StorageDetectionService, StorageDevice
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 30.0
+
+# Files whose content changes whenever a disk or partition appears, goes or
+# is resized, or a filesystem is (un)mounted
+FINGERPRINT_FILES = ["/proc/partitions", "/proc/self/mounts"]
+SYS_BLOCK = "/sys/block"
+
+
+def inventory_fingerprint() -> Optional[str]:
+    """
+    Digest of the kernel's view of block devices and mounts
+
+    Returns None where none of the sources exist (non-Linux), in which case
+    only the TTL expires snapshots.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    found = False
+    for path in FINGERPRINT_FILES:
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+            found = True
+        except OSError:
+            pass
+        digest.update(b'\0')
+    try:
+        # Directory mtimes aren't maintained by sysfs, so hash the listing
+        digest.update("\n".join(sorted(os.listdir(SYS_BLOCK))).encode())
+        found = True
+    except OSError:
+        pass
+    return digest.hexdigest() if found else None
+
+
+def canonical_device_path(path: str) -> str:
+    """
+    Path a device is indexed under: symlinks (/dev/disk/by-id/*, /dev/mapper/*)
+    resolved, and bare or relative names ("sda", "dev/sda") placed under /dev
+    """
+    if os.sep != '/' or path.startswith('\\'):
+        return path  # Windows device paths are used as they are
+    if not path.startswith('/'):
+        path = '/' + path if path.startswith('dev/') else '/dev/' + path
+    return os.path.realpath(path)
+
+
+def _path_keys(device: StorageDevice) -> Set[str]:
+    paths = {device.device} | {partition.device for partition in device.partitions}
+    return paths | {canonical_device_path(path) for path in paths}
+
+
+@dataclass
+class InventorySnapshot:
+    """Devices found by one scan; shared between callers, so treat as read-only"""
+    devices: List[StorageDevice]
+    taken_at: datetime
+    scan_seconds: float
+    fingerprint: Optional[str]
+    monotonic: float = field(default_factory=time.monotonic, repr=False)
+
+    def __post_init__(self):
+        self._probed: Dict[str, Tuple[datetime, float]] = {}  # Devices re-probed since the scan
+        self._reindex()
+
+    @property
+    def age_seconds(self) -> float:
+        return max(0.0, time.monotonic() - self.monotonic)
+
+    def find(self, path: str) -> Optional[StorageDevice]:
+        """The device at a path, or holding the partition at it"""
+        position = self._by_path.get(path)
+        if position is None:
+            position = self._by_path.get(canonical_device_path(path))
+        return self.devices[position] if position is not None else None
+
+    def find_by_serial(self, serial: str) -> Optional[StorageDevice]:
+        position = self._by_serial.get(serial)
+        return self.devices[position] if position is not None else None
+
+    def detected_at(self, device: StorageDevice) -> datetime:
+        """When a device was last probed (the scan time unless it was re-probed since)"""
+        probed = self._probed.get(device.device)
+        return probed[0] if probed else self.taken_at
+
+    def device_age_seconds(self, device: StorageDevice) -> float:
+        probed = self._probed.get(device.device)
+        return max(0.0, time.monotonic() - probed[1]) if probed else self.age_seconds
+
+    def merge(self, device: StorageDevice):
+        """Replace (or add) one device with a fresh probe of it"""
+        position = self._by_path.get(canonical_device_path(device.device))
+        if position is None:
+            position = len(self.devices)
+            self.devices.append(device)
+        else:
+            self._unindex(position)
+            self.devices[position] = device
+        self._index(position, device)
+        self._probed[device.device] = (datetime.now(), time.monotonic())
+
+    def remove(self, path: str) -> Optional[StorageDevice]:
+        """Drop a device that has gone away"""
+        device = self.find(path)
+        if device is None:
+            return None
+        self.devices.remove(device)
+        self._probed.pop(device.device, None)
+        self._reindex()  # Positions shifted; removals are rare
+        return device
+
+    def _reindex(self):
+        self._by_path: Dict[str, int] = {}  # Canonical device or partition path -> position
+        self._by_serial: Dict[str, int] = {}
+        for position, device in enumerate(self.devices):
+            self._index(position, device)
+
+    def _index(self, position: int, device: StorageDevice):
+        for key in _path_keys(device):
+            self._by_path[key] = position
+        if device.serial:
+            self._by_serial[device.serial] = position
+
+    def _unindex(self, position: int):
+        device = self.devices[position]
+        for key in _path_keys(device):
+            if self._by_path.get(key) == position:
+                del self._by_path[key]
+        if device.serial and self._by_serial.get(device.serial) == position:
+            del self._by_serial[device.serial]
+
+
+class DeviceInventoryCache:
+    """TTL cache of the device inventory with single-flight refresh"""
+
+    def __init__(
+        self,
+        service: Optional[StorageDetectionService] = None,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        fingerprint: Callable[[], Optional[str]] = inventory_fingerprint
+    ):
+        """
+        Args:
+            service: Detection service that performs the scans
+            ttl_seconds: Maximum age of a snapshot (0 scans on every lookup,
+                still sharing concurrent scans)
+            fingerprint: Returns a value that changes with the device layout
+        """
+        if ttl_seconds < 0:
+            raise ValueError("ttl_seconds must not be negative")
+        self.service = service or StorageDetectionService()
+        self.ttl_seconds = ttl_seconds
+        self._fingerprint = fingerprint
+        self._snapshot: Optional[InventorySnapshot] = None
+        self._inflight: Optional[asyncio.Task] = None
+        self._generation = 0
+        self.hits = 0
+        self.scans = 0
+        self.joined = 0  # Lookups that waited for another caller's scan
+
+    def peek(self) -> Optional[InventorySnapshot]:
+        """The current snapshot, however old, without scanning"""
+        return self._snapshot
+
+    def is_fresh(self, snapshot: InventorySnapshot, max_age: Optional[float] = None) -> bool:
+        """Whether a snapshot is within its TTL and the device layout hasn't changed since"""
+        ttl = self.ttl_seconds if max_age is None else min(max_age, self.ttl_seconds)
+        if snapshot.age_seconds > ttl:
+            return False
+        return snapshot.fingerprint == self._fingerprint()
+
+    async def get(self, refresh: bool = False, max_age: Optional[float] = None) -> InventorySnapshot:
+        """
+        Get the device inventory, scanning only when the cached one is stale
+
+        Args:
+            refresh: Ignore the cached snapshot (joins a scan already in flight)
+            max_age: Tighter TTL for this lookup, in seconds
+        """
+        snapshot = self._snapshot
+        if not refresh and snapshot is not None and self.is_fresh(snapshot, max_age):
+            self.hits += 1
+            return snapshot
+
+        loop = asyncio.get_running_loop()
+        task = self._inflight
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = loop.create_task(self._scan())
+            self._inflight = task
+        else:
+            self.joined += 1
+        # A caller going away mustn't cancel the scan the others are waiting for
+        return await asyncio.shield(task)
+
+    async def refresh_device(self, path: str) -> Optional[StorageDevice]:
+        """
+        Re-probe one device (and its HPA/DCO state) and merge it into the current snapshot
+
+        Returns:
+            The fresh device, or None if it doesn't exist (it is then dropped
+            from the snapshot)
+        
+        Raises:
+            Errors probing a device that exists; its cached entry is kept
+        """
+        device = await self.service.probe_device(path)
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if device is not None:
+                snapshot.merge(device)
+            else:
+                snapshot.remove(path)
+        return device
+
+    def invalidate(self):
+        """Drop the cached snapshot; a scan in flight still answers its callers but isn't kept"""
+        self._generation += 1
+        self._snapshot = None
+
+    def stats(self) -> Dict[str, object]:
+        snapshot = self._snapshot
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "scans": self.scans,
+            "joined": self.joined,
+            "snapshot_age_seconds": round(snapshot.age_seconds, 3) if snapshot else None,
+            "scan_in_flight": self._inflight is not None and not self._inflight.done(),
+        }
+
+    async def _scan(self) -> InventorySnapshot:
+        generation = self._generation
+        # Taken before scanning, so a change during the scan expires the result
+        fingerprint = self._fingerprint()
+        self.scans += 1
+        start = time.perf_counter()
+        devices = await self.service.get_all_storage_devices()
+        snapshot = InventorySnapshot(
+            devices=devices,
+            taken_at=datetime.now(),
+            scan_seconds=time.perf_counter() - start,
+            fingerprint=fingerprint
+        )
+        logger.debug(f"Inventory scan found {len(devices)} device(s) in {snapshot.scan_seconds:.2f}s")
+        if generation == self._generation:
+            self._snapshot = snapshot
+        return snapshot
+
+
+# Global inventory shared by the storage and device endpoints
+device_inventory = DeviceInventoryCache()
@@ -0,0 +1,158 @@
+"""
+Discard stage: telling the storage that a range no longer holds data.
+
+On SSDs and thin-provisioned volumes a discard (TRIM/UNMAP) is far cheaper
+than writing: the controller drops the mapping and erases the blocks in the
+background, and thin pools get the space back. Block devices are discarded
+with the BLKDISCARD ioctl, falling back to BLKZEROOUT (which the kernel
+turns into WRITE ZEROES or UNMAP where the device offers them). Files get
+their blocks released with fallocate(FALLOC_FL_PUNCH_HOLE), which keeps the
+file size and lets the filesystem pass the discard down.
+
+A discard doesn't replace the overwrite passes: whether discarded blocks
+read back as zeros, and whether they are erased at once, is up to the
+device. Discarding is best-effort, so failures are reported, not raised.
+"""
+
+import ctypes
+import errno
+import logging
+import os
+import struct
+import sys
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# linux/fs.h, linux/falloc.h
+BLKDISCARD = 0x1277
+BLKZEROOUT = 0x127F
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+RANGE = struct.Struct('=QQ')  # uint64_t range[2]: offset, length
+
+DISCARD_CHUNK_SIZE = 1024 * 1024 * 1024  # Bytes per call, so one call never holds the device for long
+
+
+class DiscardStage(str, Enum):
+    """When a wipe discards its target"""
+    NONE = "none"
+    BEFORE = "before"  # Drive wipes: discard the whole device before the first pass
+    AFTER = "after"  # After the final pass (and its verification)
+
+
+@dataclass(frozen=True)
+class DiscardResult:
+    """Outcome of discarding a range"""
+    method: Optional[str]  # blkdiscard, blkzeroout or punch_hole; None if nothing worked
+    bytes_discarded: int
+    seconds: float
+    error: Optional[str] = None  # Why a method was unavailable, even if a fallback succeeded
+
+    @property
+    def succeeded(self) -> bool:
+        return self.method is not None
+
+
+def _load_fallocate() -> Optional[Callable[[int, int, int, int], int]]:
+    """Look up fallocate(2) in the C library (Linux only; os.posix_fallocate can't punch holes)"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        fallocate = ctypes.CDLL(None, use_errno=True).fallocate
+    except (OSError, AttributeError):
+        return None
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+
+_fallocate = _load_fallocate()
+
+
+def punch_hole(fd: int, offset: int, length: int):
+    """Release the blocks of a file range, keeping the file size"""
+    if _fallocate is None:
+        raise OSError(errno.EOPNOTSUPP, "fallocate is not available on this platform")
+    if _fallocate(fd, FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE, offset, length) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+
+
+def _block_ioctl(request: int) -> Callable[[int, int, int], None]:
+    def run(fd: int, offset: int, length: int):
+        if fcntl is None:
+            raise OSError(errno.EOPNOTSUPP, "block device ioctls are not available on this platform")
+        fcntl.ioctl(fd, request, RANGE.pack(offset, length))
+    return run
+
+
+def discard_range(
+    fd: int,
+    offset: int,
+    length: int,
+    is_block_device: bool,
+    zero_fallback: bool = True,
+    chunk_size: int = DISCARD_CHUNK_SIZE
+) -> DiscardResult:
+    """
+    Discard a range of a block device or file (blocking)
+
+    Methods are tried in order, each picking up where the previous one
+    failed: BLKDISCARD then BLKZEROOUT for block devices, punch-hole for
+    files.
+
+    Args:
+        fd: Writable descriptor of the target
+        offset: Start of the range (sector-aligned for block devices)
+        length: Length of the range (sector-aligned for block devices)
+        is_block_device: Whether fd is a block device
+        zero_fallback: Fall back to BLKZEROOUT when the device can't discard
+        chunk_size: Bytes per ioctl/fallocate call
+
+    Returns:
+        DiscardResult; method is None if no method worked
+    """
+    methods: List[Tuple[str, Callable[[int, int, int], None]]]
+    if is_block_device:
+        methods = [("blkdiscard", _block_ioctl(BLKDISCARD))]
+        if zero_fallback:
+            methods.append(("blkzeroout", _block_ioctl(BLKZEROOUT)))
+    else:
+        methods = [("punch_hole", punch_hole)]
+
+    start = time.perf_counter()
+    position = offset
+    end = offset + length
+    errors: List[str] = []
+    for name, method in methods:
+        try:
+            while position < end:
+                step = min(chunk_size, end - position)
+                method(fd, position, step)
+                position += step
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL, errno.ENOSYS, errno.EPERM):
+                logger.warning(f"{name} failed at offset {position}: {e}")
+            errors.append(f"{name}: {e.strerror or e}")
+            continue
+        return DiscardResult(
+            method=name,
+            bytes_discarded=position - offset,
+            seconds=time.perf_counter() - start,
+            error="; ".join(errors) or None
+        )
+    return DiscardResult(
+        method=None,
+        bytes_discarded=position - offset,
+        seconds=time.perf_counter() - start,
+        error="; ".join(errors)
+    )
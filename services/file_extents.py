@@ -0,0 +1,142 @@
+"""
+Allocated extents of files.
+
+Sparse files (VM images, database files) can have a logical size far above
+the space they occupy. Overwriting the holes would allocate them, which
+wastes time and can fill the filesystem while destroying nothing, so
+extent-aware wipes only overwrite the ranges that are backed by storage.
+
+Extents come from the FIEMAP ioctl where the filesystem supports it, since
+it also reports preallocated (unwritten) extents whose blocks may still
+hold old data. Otherwise SEEK_DATA/SEEK_HOLE is used, and as a last resort
+the whole file is treated as allocated.
+"""
+
+import errno
+import logging
+import os
+import struct
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# linux/fs.h, linux/fiemap.h
+FS_IOC_FIEMAP = 0xC020660B
+FIEMAP_FLAG_SYNC = 0x1  # Flush delayed allocations so they show up as extents
+FIEMAP_EXTENT_LAST = 0x1
+FIEMAP_HEADER = struct.Struct('=QQIIII')  # fm_start, fm_length, fm_flags, fm_mapped_extents, fm_extent_count, fm_reserved
+FIEMAP_EXTENT = struct.Struct('=QQQQQIIII')  # fe_logical, fe_physical, fe_length, 2 x reserved, fe_flags, 3 x reserved
+FIEMAP_BATCH = 512  # Extents fetched per ioctl
+
+Extent = Tuple[int, int]  # (offset, length)
+
+
+@dataclass(frozen=True)
+class ExtentMap:
+    """Ranges of a file that are backed by storage"""
+    extents: Tuple[Extent, ...]
+    logical_size: int
+    source: str  # fiemap, seek or full
+
+    @property
+    def allocated_bytes(self) -> int:
+        return sum(length for _, length in self.extents)
+
+    @property
+    def is_sparse(self) -> bool:
+        return self.allocated_bytes < self.logical_size
+
+
+def _merge(extents: List[Extent], size: int) -> Tuple[Extent, ...]:
+    """Sort, clip to the file size and coalesce touching extents"""
+    merged: List[List[int]] = []
+    for offset, length in sorted(extents):
+        end = min(offset + length, size)
+        if end <= offset:
+            continue
+        if merged and offset <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([offset, end])
+    return tuple((start, end - start) for start, end in merged)
+
+
+def _fiemap_extents(fd: int, size: int) -> Optional[List[Extent]]:
+    """Enumerate extents with FIEMAP; None if the filesystem doesn't support it"""
+    if fcntl is None:
+        return None
+    extents: List[Extent] = []
+    start = 0
+    while start < size:
+        request = bytearray(FIEMAP_HEADER.size + FIEMAP_BATCH * FIEMAP_EXTENT.size)
+        FIEMAP_HEADER.pack_into(request, 0, start, size - start, FIEMAP_FLAG_SYNC, 0, FIEMAP_BATCH, 0)
+        try:
+            fcntl.ioctl(fd, FS_IOC_FIEMAP, request, True)
+        except OSError as e:
+            if e.errno in (errno.ENOTTY, errno.EOPNOTSUPP, errno.EINVAL):
+                return None
+            raise
+        mapped = FIEMAP_HEADER.unpack_from(request, 0)[3]
+        if mapped == 0:
+            break
+        last = False
+        for index in range(mapped):
+            fields = FIEMAP_EXTENT.unpack_from(request, FIEMAP_HEADER.size + index * FIEMAP_EXTENT.size)
+            logical, length, flags = fields[0], fields[2], fields[5]
+            extents.append((logical, length))
+            start = logical + length
+            last = bool(flags & FIEMAP_EXTENT_LAST)
+        if last:
+            break
+    return extents
+
+
+def _seek_extents(fd: int, size: int) -> Optional[List[Extent]]:
+    """Enumerate data ranges with SEEK_DATA/SEEK_HOLE; None if unsupported"""
+    seek_data = getattr(os, 'SEEK_DATA', None)
+    seek_hole = getattr(os, 'SEEK_HOLE', None)
+    if seek_data is None or seek_hole is None:
+        return None
+    extents: List[Extent] = []
+    offset = 0
+    while offset < size:
+        try:
+            data = os.lseek(fd, offset, seek_data)
+        except OSError as e:
+            if e.errno == errno.ENXIO:  # No data past offset
+                break
+            if e.errno == errno.EINVAL and offset == 0:
+                return None
+            raise
+        hole = os.lseek(fd, data, seek_hole)
+        extents.append((data, hole - data))
+        offset = hole
+    return extents
+
+
+def map_extents(fd: int, size: int) -> ExtentMap:
+    """
+    Find the allocated ranges of an open file
+
+    Args:
+        fd: Descriptor of the file
+        size: Logical size of the file; extents past it are dropped
+
+    Returns:
+        ExtentMap with sorted, non-overlapping extents
+    """
+    for source, probe in (("fiemap", _fiemap_extents), ("seek", _seek_extents)):
+        try:
+            extents = probe(fd, size)
+        except OSError as e:
+            logger.debug(f"Extent mapping with {source} failed: {e}")
+            extents = None
+        if extents is not None:
+            return ExtentMap(extents=_merge(extents, size), logical_size=size, source=source)
+    return ExtentMap(extents=((0, size),) if size > 0 else (), logical_size=size, source="full")
@@ -0,0 +1,218 @@
+"""
+Concurrent, timeout-bounded HPA/DCO probing with hdparm.
+
+A Host Protected Area (HPA) or Device Configuration Overlay (DCO) hides
+sectors at the end of an ATA disk, so a wipe has to know about them. Asking
+for them is slow: hdparm talks to the drive, which may have to spin up, and
+a failing drive can take tens of seconds to answer or never answer at all.
+The scheduler therefore:
+
+- probes devices concurrently, bounded by a semaphore;
+- gives every hdparm call a timeout, killing it when it runs out;
+- caches results per serial number, since HPA and DCO only change when the
+  drive is reconfigured;
+- marks results stale instead of waiting when a probe times out or fails,
+  reusing the last known values when there are any; stale results are
+  probed again on the next lookup.
+"""
+
+import asyncio
+import logging
+import re
+import shutil
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 4
+DEFAULT_TIMEOUT_SECONDS = 8.0  # Long enough for a spin-up, short enough not to stall an inventory
+ATA_SECTOR_SIZE = 512  # HPA and DCO limits are LBAs of the ATA command set
+
+# hdparm -N: " max sectors   = 1953523055/1953525168, HPA is enabled"
+HPA_PATTERN = re.compile(r'max sectors\s*=\s*(\d+)/(\d+)')
+# hdparm --dco-identify: "        Real max sectors: 1953525168"
+DCO_PATTERN = re.compile(r'Real max sectors:\s*(\d+)')
+
+
+class ProbeTimeout(Exception):
+    """Raised when an hdparm call runs out of time"""
+
+
+@dataclass(frozen=True)
+class HPAProbeResult:
+    """HPA/DCO state of one device"""
+    device: str
+    serial: Optional[str]
+    hpa_present: bool
+    dco_present: bool
+    raw_capacity: int  # Bytes up to the native (or DCO) maximum; 0 if unknown
+    probed_at: datetime
+    stale: bool = False  # The last probe didn't finish or failed; values are the last known ones (or unknown)
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            'hpa_present': self.hpa_present,
+            'dco_present': self.dco_present,
+            'raw_capacity': self.raw_capacity,
+            'stale': self.stale,
+            'error': self.error,
+        }
+
+
+def parse_hpa(output: str) -> Optional[Tuple[int, int]]:
+    """(visible, native) max sectors from `hdparm -N`; None if it didn't report them"""
+    match = HPA_PATTERN.search(output)
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def parse_dco(output: str) -> Optional[int]:
+    """Real max sectors from `hdparm --dco-identify`; None if the drive has no DCO"""
+    match = DCO_PATTERN.search(output)
+    return int(match.group(1)) if match else None
+
+
+class HPAProbeScheduler:
+    """Runs hdparm HPA/DCO probes concurrently and caches the results per serial"""
+
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        timeout_seconds: float = DEFAULT_TIMEOUT_SECONDS,
+        hdparm: str = "hdparm"
+    ):
+        """
+        Args:
+            concurrency: Maximum devices probed at once
+            timeout_seconds: Time allowed for each hdparm call
+            hdparm: hdparm executable (name on PATH or path)
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        self.concurrency = concurrency
+        self.timeout_seconds = timeout_seconds
+        self.hdparm = hdparm
+        self._cache: Dict[str, HPAProbeResult] = {}
+
+    @property
+    def available(self) -> bool:
+        return shutil.which(self.hdparm) is not None
+
+    def cached(self, serial: Optional[str]) -> Optional[HPAProbeResult]:
+        return self._cache.get(serial) if serial else None
+
+    def invalidate(self, serial: Optional[str] = None):
+        """Forget the results for one serial, or all of them (after reconfiguring a drive)"""
+        if serial is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(serial, None)
+
+    async def probe_all(
+        self,
+        devices: Dict[str, Optional[str]],
+        refresh: bool = False
+    ) -> Dict[str, HPAProbeResult]:
+        """
+        Probe devices concurrently
+
+        Args:
+            devices: Device path -> serial number (None if unknown; such
+                devices are probed every time)
+            refresh: Probe even devices with a cached result
+
+        Returns:
+            Device path -> result; empty when hdparm isn't installed
+        """
+        if not devices or not self.available:
+            return {}
+        # Created per batch: semaphores bind to the event loop that first waits on them
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def probe_one(path: str, serial: Optional[str]) -> HPAProbeResult:
+            cached = self.cached(serial)
+            if cached is not None and not cached.stale and not refresh:
+                return replace(cached, device=path)
+            async with semaphore:
+                return await self.probe(path, serial)
+
+        results = await asyncio.gather(*[probe_one(path, serial) for path, serial in devices.items()])
+        return {result.device: result for result in results}
+
+    async def probe(self, path: str, serial: Optional[str] = None) -> HPAProbeResult:
+        """Probe one device now, ignoring the cache (but updating it)"""
+        try:
+            hpa_output = await self._run([self.hdparm, "-N", path])
+            dco_output = await self._run([self.hdparm, "--dco-identify", path])
+        except ProbeTimeout as e:
+            logger.warning(f"HPA/DCO probe of {path} timed out: {e}")
+            return self._stale(path, serial, str(e))
+        except OSError as e:
+            logger.warning(f"HPA/DCO probe of {path} could not run hdparm: {e}")
+            return self._stale(path, serial, f"Could not run hdparm: {e}")
+
+        hpa = parse_hpa(hpa_output)
+        if hpa is None:
+            # Permission or SG_IO errors; probed again next time rather than trusted
+            return self._stale(path, serial, "hdparm did not report max sectors")
+        dco_max = parse_dco(dco_output)
+        visible, native = hpa
+        hpa_present = visible < native
+        # A DCO only hides sectors when its real maximum is beyond the native one
+        dco_present = dco_max is not None and native > 0 and dco_max > native
+        result = HPAProbeResult(
+            device=path,
+            serial=serial,
+            hpa_present=hpa_present,
+            dco_present=dco_present,
+            raw_capacity=max(native, dco_max or 0) * ATA_SECTOR_SIZE,
+            probed_at=datetime.now()
+        )
+        if serial:
+            self._cache[serial] = result
+        return result
+
+    def _stale(self, path: str, serial: Optional[str], error: str) -> HPAProbeResult:
+        """Result for a probe that didn't finish or failed: the last known values, marked stale"""
+        cached = self.cached(serial)
+        if cached is not None:
+            result = replace(cached, device=path, stale=True, error=error)
+        else:
+            result = HPAProbeResult(
+                device=path,
+                serial=serial,
+                hpa_present=False,
+                dco_present=False,
+                raw_capacity=0,
+                probed_at=datetime.now(),
+                stale=True,
+                error=error
+            )
+        if serial:
+            self._cache[serial] = result
+        return result
+
+    async def _run(self, argv: List[str]) -> str:
+        """Run a command and return its output, killing it when it runs out of time"""
+        process = await asyncio.create_subprocess_exec(
+            *argv,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        try:
+            stdout, _ = await asyncio.wait_for(process.communicate(), self.timeout_seconds)
+        except asyncio.TimeoutError:
+            process.kill()
+            try:
+                # A process stuck in the kernel can't die until the device answers; don't wait for it
+                await asyncio.wait_for(process.wait(), 1.0)
+            except asyncio.TimeoutError:
+                pass
+            raise ProbeTimeout(f"{' '.join(argv)} took longer than {self.timeout_seconds:g}s")
+        return stdout.decode('utf-8', errors='ignore')
+
+
+# Global scheduler, so cached results outlive individual detection services
+hpa_probe_scheduler = HPAProbeScheduler()
@@ -0,0 +1,466 @@
+"""
+Durable wipe job queue backed by the application database.
+
+Jobs are rows in the wipe_jobs table, so queued work survives restarts and
+every API worker process sees the same state. Each process runs a
+JobScheduler that claims queued jobs with a conditional UPDATE (SQLite
+serializes writers, so only one process can win a claim), runs up to N of
+them at once, never runs two jobs on the same physical disk, and keeps a
+heartbeat on the jobs it owns. Jobs whose owner stopped heartbeating are
+put back in the queue (or failed after too many attempts).
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.orm import aliased
+
+from database import SessionLocal
+from models.wipe_job import WipeJob, JobState, JobCheckpoint
+from models.wipe_log import WipeLog, VerificationStatus
+from services.wipe import WipeResult
+from services.wipe_checkpoint import CheckpointStore, WipeCheckpoint
+from services.wipe_engine import (
+    WriterBackend, WriterConfig, DEFAULT_QUEUE_DEPTH, DEVICE_KEY_SEPARATOR, device_key_disks,
+    io_executor
+)
+from services.wipe_progress import progress_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT_JOBS = 4
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_HEARTBEAT_INTERVAL = 5.0
+DEFAULT_HEARTBEAT_TIMEOUT = 30.0
+DEFAULT_MAX_ATTEMPTS = 3
+CLAIM_BATCH_SIZE = 50
+
+
+def job_operation_id(job_id: int) -> str:
+    """Operation id a job's wipe publishes its progress under"""
+    return f"job_{job_id}"
+
+
+@dataclass
+class ClaimedJob:
+    """Parameters of a job this process has claimed"""
+    job_id: int
+    target_path: str
+    wipe_method: str
+    device_key: str
+    priority: int
+    generate_certificate: bool
+    mock_mode: bool
+    concurrency: int
+    notes: Optional[str]
+    attempts: int
+    checkpoint_interval_bytes: Optional[int] = None
+    writer_backend: Optional[str] = None
+    writer_queue_depth: Optional[int] = None
+    writer_block_size: Optional[int] = None
+
+    def writer_config(self) -> Optional[WriterConfig]:
+        """Writer backend chosen for this job's drive wipe (None for the default)"""
+        if not self.writer_backend:
+            return None
+        return WriterConfig(
+            backend=WriterBackend(self.writer_backend),
+            queue_depth=self.writer_queue_depth or DEFAULT_QUEUE_DEPTH,
+            block_size=self.writer_block_size
+        )
+
+    def checkpoint_store(self, session_factory: Callable = SessionLocal) -> "JobCheckpointStore":
+        """Store that lets this job's drive wipe resume after a crash or restart"""
+        return JobCheckpointStore(self.job_id, session_factory)
+
+
+class JobCheckpointStore(CheckpointStore):
+    """Keeps a job's drive wipe checkpoint in the job_checkpoints table"""
+
+    def __init__(self, job_id: int, session_factory: Callable = SessionLocal):
+        self.job_id = job_id
+        self.session_factory = session_factory
+
+    def load(self) -> Optional[WipeCheckpoint]:
+        db = self.session_factory()
+        try:
+            row = db.query(JobCheckpoint).filter(JobCheckpoint.job_id == self.job_id).first()
+            if row is None:
+                return None
+            return WipeCheckpoint(
+                target=row.target,
+                method=row.method,
+                size_bytes=row.size_bytes,
+                pass_index=row.pass_index,
+                offset=row.offset,
+                bytes_written=row.bytes_written,
+                random_seed=bytes.fromhex(row.random_seed),
+                updated_at=row.updated_at
+            )
+        finally:
+            db.close()
+
+    def save(self, checkpoint: WipeCheckpoint):
+        db = self.session_factory()
+        try:
+            db.merge(JobCheckpoint(
+                job_id=self.job_id,
+                target=checkpoint.target,
+                method=checkpoint.method,
+                size_bytes=checkpoint.size_bytes,
+                pass_index=checkpoint.pass_index,
+                offset=checkpoint.offset,
+                bytes_written=checkpoint.bytes_written,
+                random_seed=checkpoint.random_seed.hex(),
+                updated_at=checkpoint.updated_at
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def clear(self):
+        db = self.session_factory()
+        try:
+            db.query(JobCheckpoint).filter(JobCheckpoint.job_id == self.job_id).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+# Runs one claimed job and returns its WipeResult (None if no wipe could be attempted)
+JobRunner = Callable[[ClaimedJob], Awaitable[Optional[WipeResult]]]
+
+
+def _shares_disk(column, device_key: str):
+    """SQL condition: a device key column covers one of the disks of `device_key`"""
+    conditions = []
+    for disk in device_key_disks(device_key):
+        conditions += [
+            column == disk,
+            column.startswith(disk + DEVICE_KEY_SEPARATOR, autoescape=True),
+            column.endswith(DEVICE_KEY_SEPARATOR + disk, autoescape=True),
+            column.contains(DEVICE_KEY_SEPARATOR + disk + DEVICE_KEY_SEPARATOR, autoescape=True),
+        ]
+    return or_(*conditions)
+
+
+class JobScheduler:
+    """Claims and runs queued wipe jobs for this process"""
+
+    def __init__(
+        self,
+        max_concurrent_jobs: int = DEFAULT_MAX_CONCURRENT_JOBS,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        heartbeat_interval: float = DEFAULT_HEARTBEAT_INTERVAL,
+        heartbeat_timeout: float = DEFAULT_HEARTBEAT_TIMEOUT,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        session_factory: Callable = SessionLocal
+    ):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.session_factory = session_factory
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        self._runner: Optional[JobRunner] = None
+        self._running: Dict[int, asyncio.Task] = {}
+        self._loop_task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._last_heartbeat = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._loop_task is not None and not self._loop_task.done()
+
+    async def start(self, runner: JobRunner):
+        """Reclaim orphaned jobs and start dispatching"""
+        if self.is_running:
+            return
+        self._runner = runner
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        await io_executor.run(self.reclaim_orphans)
+        self._loop_task = asyncio.create_task(self._run())
+        logger.info(f"Job scheduler {self.worker_id} started ({self.max_concurrent_jobs} concurrent jobs)")
+
+    async def stop(self, timeout: float = 30.0):
+        """
+        Stop dispatching and hand running jobs back to the queue
+
+        Running wipes are cancelled (they stop within one chunk) and their
+        jobs are requeued, so another worker or the next start picks them up.
+        """
+        if self._loop_task is None:
+            return
+        self._stopping = True
+        self.wake()
+        # Let an in-flight claim finish so every job it claimed is in _running
+        await asyncio.wait([self._loop_task], timeout=timeout)
+        self._loop_task.cancel()
+        try:
+            await self._loop_task
+        except asyncio.CancelledError:
+            pass
+        self._loop_task = None
+
+        for job_id in list(self._running):
+            progress_registry.cancel(job_operation_id(job_id))
+        if self._running:
+            await asyncio.wait(list(self._running.values()), timeout=timeout)
+        logger.info(f"Job scheduler {self.worker_id} stopped")
+
+    def wake(self):
+        """Dispatch now instead of waiting for the next poll"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def request_cancel(self, job_id: int) -> Optional[JobState]:
+        """
+        Cancel a job
+
+        Queued jobs are cancelled immediately. Running jobs are flagged; the
+        owning process signals the wipe (at once if that is this process,
+        otherwise on its next heartbeat).
+
+        Returns:
+            The job's state after the request, or None if the job doesn't exist
+        """
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            cancelled = db.query(WipeJob).filter(
+                WipeJob.id == job_id, WipeJob.state == JobState.QUEUED
+            ).update({
+                WipeJob.state: JobState.CANCELLED,
+                WipeJob.finished_at: now,
+                WipeJob.error_message: "Job cancelled by user"
+            }, synchronize_session=False)
+            if not cancelled:
+                db.query(WipeJob).filter(
+                    WipeJob.id == job_id, WipeJob.state == JobState.RUNNING
+                ).update({WipeJob.cancel_requested: True}, synchronize_session=False)
+            db.commit()
+            job = db.query(WipeJob).filter(WipeJob.id == job_id).first()
+            state = job.state if job else None
+        finally:
+            db.close()
+
+        if state == JobState.RUNNING:
+            progress_registry.cancel(job_operation_id(job_id))
+        return state
+
+    def reclaim_orphans(self) -> int:
+        """Requeue running jobs whose owner stopped heartbeating"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.heartbeat_timeout)
+        orphaned = and_(WipeJob.state == JobState.RUNNING, WipeJob.heartbeat_at < cutoff)
+        db = self.session_factory()
+        try:
+            requeued = db.query(WipeJob).filter(orphaned, WipeJob.attempts < self.max_attempts).update({
+                WipeJob.state: JobState.QUEUED,
+                WipeJob.claimed_by: None
+            }, synchronize_session=False)
+            failed = db.query(WipeJob).filter(orphaned, WipeJob.attempts >= self.max_attempts).update({
+                WipeJob.state: JobState.FAILED,
+                WipeJob.claimed_by: None,
+                WipeJob.finished_at: datetime.utcnow(),
+                WipeJob.error_message: "Worker stopped responding too many times"
+            }, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+        if requeued or failed:
+            logger.warning(f"Reclaimed orphaned jobs: {requeued} requeued, {failed} failed")
+        return requeued + failed
+
+    async def _run(self):
+        # Database work runs on the I/O executor: SQLite lock waits must not stall the event loop
+        loop = asyncio.get_running_loop()
+        while not self._stopping:
+            try:
+                if loop.time() - self._last_heartbeat >= self.heartbeat_interval:
+                    self._last_heartbeat = loop.time()
+                    if self._running:
+                        await io_executor.run(self._heartbeat)
+                    await io_executor.run(self.reclaim_orphans)
+                await self._dispatch()
+            except Exception as e:
+                logger.error(f"Job scheduler iteration failed: {e}")
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    def _heartbeat(self):
+        """Refresh our claims and forward cancellations made by other processes"""
+        db = self.session_factory()
+        try:
+            owned = db.query(WipeJob).filter(
+                WipeJob.claimed_by == self.worker_id, WipeJob.state == JobState.RUNNING
+            )
+            owned.update({WipeJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+            cancel_ids = [row.id for row in owned.filter(WipeJob.cancel_requested.is_(True)).with_entities(WipeJob.id)]
+            db.commit()
+        finally:
+            db.close()
+
+        for job_id in cancel_ids:
+            progress_registry.cancel(job_operation_id(job_id))
+
+    async def _dispatch(self):
+        """Claim queued jobs up to the concurrency limit and start running them"""
+        free = self.max_concurrent_jobs - len(self._running)
+        if free <= 0 or self._stopping:
+            return
+        for claimed in await io_executor.run(self._claim_jobs, free):
+            self._running[claimed.job_id] = asyncio.create_task(self._execute(claimed))
+
+    def _claim_jobs(self, free: int) -> List[ClaimedJob]:
+        """Claim up to `free` queued jobs, highest priority first"""
+        claimed_jobs = []
+        db = self.session_factory()
+        try:
+            busy_devices = {
+                disk for row in
+                db.query(WipeJob.device_key).filter(WipeJob.state == JobState.RUNNING)
+                for disk in device_key_disks(row.device_key)
+            }
+            candidates = db.query(WipeJob).filter(
+                WipeJob.state == JobState.QUEUED
+            ).order_by(WipeJob.priority.desc(), WipeJob.id.asc()).limit(CLAIM_BATCH_SIZE).all()
+
+            for job in candidates:
+                if free <= 0:
+                    break
+                disks = device_key_disks(job.device_key)
+                if busy_devices.intersection(disks):
+                    continue
+                claimed = self._claim(db, job)
+                busy_devices.update(disks)
+                if claimed is None:
+                    continue
+                free -= 1
+                claimed_jobs.append(claimed)
+        finally:
+            db.close()
+        return claimed_jobs
+
+    def _claim(self, db, job: WipeJob) -> Optional[ClaimedJob]:
+        """Atomically move a job from queued to running under our worker id"""
+        running_on_device = aliased(WipeJob)
+        now = datetime.utcnow()
+        claimed = db.query(WipeJob).filter(
+            WipeJob.id == job.id,
+            WipeJob.state == JobState.QUEUED,
+            # Re-checked inside the UPDATE so two processes can't claim jobs on the same disk
+            ~exists().where(and_(
+                _shares_disk(running_on_device.device_key, job.device_key),
+                running_on_device.state == JobState.RUNNING
+            ))
+        ).update({
+            WipeJob.state: JobState.RUNNING,
+            WipeJob.claimed_by: self.worker_id,
+            WipeJob.heartbeat_at: now,
+            WipeJob.started_at: now,
+            WipeJob.attempts: WipeJob.attempts + 1
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return None
+        # The commit expired the instance, so these attributes are reloaded post-claim
+
+        return ClaimedJob(
+            job_id=job.id,
+            target_path=job.target_path,
+            wipe_method=job.wipe_method,
+            device_key=job.device_key,
+            priority=job.priority,
+            generate_certificate=job.generate_certificate,
+            mock_mode=job.mock_mode,
+            concurrency=job.concurrency,
+            notes=job.notes,
+            attempts=job.attempts,
+            checkpoint_interval_bytes=job.checkpoint_interval_bytes,
+            writer_backend=job.writer_backend,
+            writer_queue_depth=job.writer_queue_depth,
+            writer_block_size=job.writer_block_size
+        )
+
+    async def _execute(self, job: ClaimedJob):
+        """Run a claimed job and record its outcome"""
+        result = None
+        error = None
+        try:
+            logger.info(f"Running job {job.job_id} on {job.device_key} (attempt {job.attempts})")
+            result = await self._runner(job)
+        except Exception as e:
+            logger.error(f"Job {job.job_id} failed: {e}")
+            error = str(e)
+        finally:
+            try:
+                await io_executor.run(self._finish, job, result, error)
+            except Exception as e:
+                logger.error(f"Could not record the outcome of job {job.job_id}: {e}")
+            self._running.pop(job.job_id, None)
+            self.wake()
+
+    def _finish(self, job: ClaimedJob, result: Optional[WipeResult], error: Optional[str]):
+        db = self.session_factory()
+        try:
+            row = db.query(WipeJob).filter(WipeJob.id == job.job_id).first()
+            if row is None or row.claimed_by != self.worker_id:
+                # Our claim was reclaimed while we ran; the new owner records the outcome
+                return
+
+            if result is not None and result.cancelled and self._stopping and not row.cancel_requested:
+                # Interrupted by shutdown rather than by a user: hand it back to the queue
+                row.state = JobState.QUEUED
+                row.claimed_by = None
+                db.commit()
+                logger.info(f"Job {job.job_id} requeued for shutdown")
+                return
+
+            if result is None:
+                row.state = JobState.FAILED
+                row.error_message = error or "No wipe could be performed for this target"
+            elif result.cancelled:
+                row.state = JobState.CANCELLED
+                row.error_message = result.error_message
+                # The runner leaves the log alone for cancels; close it as the queued-cancel path does
+                wipe_log = db.query(WipeLog).filter(WipeLog.id == job.job_id).first()
+                if wipe_log is not None:
+                    wipe_log.verification_status = VerificationStatus.FAILED
+                    wipe_log.end_time = datetime.utcnow()
+            elif result.success:
+                row.state = JobState.COMPLETED
+                row.error_message = None
+            else:
+                row.state = JobState.FAILED
+                row.error_message = result.error_message
+
+            if result is not None:
+                row.bytes_written = result.bytes_written
+                row.passes_completed = result.passes_completed
+            # The job won't run again, so its resume point is no longer needed
+            row.checkpoint = None
+            row.claimed_by = None
+            row.finished_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+
+
+# Global scheduler instance, started by the application lifespan
+job_scheduler = JobScheduler()
@@ -2,13 +2,30 @@ import psutil
 import subprocess
 import platform
 import json
-import re
+import shlex
+import shutil
 from typing import List, Dict, Optional, Any
 from dataclasses import dataclass
 from datetime import datetime
+from enum import Enum
 import asyncio
 import os
 
+from services.block_devices import (
+    BlockDevice, BlockTopology, IGNORED_PREFIXES, SYS_BLOCK, build_topology, probe_block_device, scan_block_devices
+)
+from services.hpa_probe import HPAProbeScheduler, hpa_probe_scheduler
+
+
+class ProbeBackend(str, Enum):
+    """How devices are discovered on Linux"""
+    NATIVE = "native"  # sysfs and /proc/partitions; lsblk only fills in missing fields
+    LSBLK = "lsblk"  # lsblk, grouping the mounted partitions
+
+
+# Buses where ATA features like HPA and DCO can exist; hdparm is pointless elsewhere
+HDPARM_TRANSPORTS = {"sata", "scsi", "usb"}
+
 
 @dataclass
 class PartitionInfo:
@@ -37,13 +54,31 @@ class StorageDevice:
     temperature: Optional[float]  # Celsius
     health_status: Optional[str]
     raw_capacity: int  # Raw capacity before HPA/DCO adjustments
+    hpa_dco_stale: bool = False  # The HPA/DCO probe timed out; values are the last known ones
 
 
 class StorageDetectionService:
     """Service for detecting and analyzing storage devices"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        probe_backend: ProbeBackend = ProbeBackend.NATIVE,
+        lsblk_enrichment: bool = True,
+        hpa_prober: Optional[HPAProbeScheduler] = None
+    ):
+        """
+        Args:
+            probe_backend: How devices are discovered on Linux (native falls
+                back to lsblk where sysfs isn't mounted)
+            lsblk_enrichment: Let the native backend ask lsblk for models and
+                serials sysfs doesn't have (only runs when some are missing)
+            hpa_prober: hdparm scheduler (default: the shared one, whose
+                per-serial cache outlives this service)
+        """
         self.system = platform.system().lower()
+        self.probe_backend = ProbeBackend(probe_backend)
+        self.lsblk_enrichment = lsblk_enrichment
+        self.hpa_prober = hpa_prober or hpa_probe_scheduler
     
     async def get_all_storage_devices(self) -> List[StorageDevice]:
         """Get information about all connected storage devices"""
@@ -58,7 +93,10 @@ class StorageDetectionService:
             if self.system == "windows":
                 devices = await self._detect_windows_devices(disk_partitions, disk_usage)
             elif self.system == "linux":
-                devices = await self._detect_linux_devices(disk_partitions, disk_usage)
+                if self.probe_backend == ProbeBackend.NATIVE and os.path.isdir(SYS_BLOCK):
+                    devices = await self._detect_linux_devices_native(disk_partitions, disk_usage)
+                else:
+                    devices = await self._detect_linux_devices(disk_partitions, disk_usage)
             else:
                 devices = await self._detect_generic_devices(disk_partitions, disk_usage)
                 
@@ -67,6 +105,57 @@ class StorageDetectionService:
             
         return devices
     
+    async def probe_device(self, path: str, refresh_hpa: bool = True) -> Optional[StorageDevice]:
+        """
+        Probe a single device: its sysfs entry and partitions, its lsblk row and hdparm
+        
+        A partition, volume or symlink (/dev/disk/by-id/*, /dev/mapper/*)
+        probes the physical disk beneath it (the first one for volumes
+        spanning several). Platforms without the native backend fall back to
+        a full scan.
+        
+        Args:
+            path: Device node, partition or symlink to one
+            refresh_hpa: Run hdparm even if the drive's HPA/DCO state is cached
+        
+        Returns:
+            The device, or None if there is no such device
+        
+        Raises:
+            Whatever stopped an existing device from being probed (e.g. an
+            unreadable mount), so callers don't mistake it for a missing one
+        """
+        if not (self.system == "linux" and self.probe_backend == ProbeBackend.NATIVE and os.path.isdir(SYS_BLOCK)):
+            devices = await self.get_all_storage_devices()
+            return next((d for d in devices if d.device == path), None)
+        
+        topology = build_topology()
+        disks = topology.physical_disks(path)
+        name = os.path.basename(disks[0]) if disks else None
+        block = probe_block_device(name) if name and not name.startswith(IGNORED_PREFIXES) else None
+        if block is None or block.size_bytes == 0:  # Detached loop devices, empty card readers
+            return None
+        
+        # Usage only for the filesystems on this device
+        mounts = self._mounts_by_node(psutil.disk_partitions())
+        nodes = {f"/dev/{node}" for node in topology.stacked_on(name)}
+        disk_usage = {
+            mount.mountpoint: psutil.disk_usage(mount.mountpoint)
+            for node, mount in mounts.items() if node in nodes
+        }
+        
+        lsblk_data = {}
+        if self._needs_lsblk(block):
+            lsblk_data = (await self._get_lsblk_info(block.path)).get(block.path, {})
+        
+        hdparm_data = {}
+        if block.transport in HDPARM_TRANSPORTS:
+            serial = block.serial or lsblk_data.get('serial')
+            hdparm_info = await self._get_hdparm_info({block.path: serial}, refresh=refresh_hpa)
+            hdparm_data = hdparm_info.get(block.path, {})
+        
+        return self._device_from_block(block, mounts, disk_usage, lsblk_data, hdparm_data, topology)
+    
     async def _detect_windows_devices(self, disk_partitions: List, disk_usage: Dict) -> List[StorageDevice]:
         """Detect storage devices on Windows using PowerShell"""
         devices = []
@@ -168,16 +257,17 @@ class StorageDetectionService:
             # Get HPA/DCO information using hdparm
             hdparm_info = await self._get_hdparm_info()
             
-            # Group partitions by physical disk
-            disk_groups = {}
+            # Every disk lsblk lists, mounted or not
+            disk_groups = {
+                device_path: [] for device_path, data in lsblk_info.items()
+                if data.get('size') and not os.path.basename(device_path).startswith(IGNORED_PREFIXES)
+            }
+            
+            # Group partitions by the physical disks beneath them (partition parents, LVM, RAID)
+            topology = build_topology()
             for partition in disk_partitions:
-                # Extract device name (e.g., /dev/sda1 -> /dev/sda)
                 device_path = partition.device
                 if '/dev/' in device_path:
-                    base_device = re.sub(r'\d+$', '', device_path)  # Remove partition number
-                    if base_device not in disk_groups:
-                        disk_groups[base_device] = []
-                    
                     partition_info = PartitionInfo(
                         device=partition.device,
                         mountpoint=partition.mountpoint,
@@ -186,7 +276,8 @@ class StorageDetectionService:
                         used=disk_usage.get(partition.mountpoint, (0, 0, 0))[1],
                         free=disk_usage.get(partition.mountpoint, (0, 0, 0))[0]
                     )
-                    disk_groups[base_device].append(partition_info)
+                    for base_device in topology.physical_disks(device_path) or [device_path]:
+                        disk_groups.setdefault(base_device, []).append(partition_info)
             
             # Create StorageDevice objects
             for device_path, partitions in disk_groups.items():
@@ -206,7 +297,8 @@ class StorageDetectionService:
                     rotation_rate=lsblk_data.get('rotation_rate', None),
                     temperature=lsblk_data.get('temperature', None),
                     health_status=lsblk_data.get('health_status', None),
-                    raw_capacity=hdparm_data.get('raw_capacity', lsblk_data.get('size', 0))
+                    raw_capacity=hdparm_data.get('raw_capacity') or lsblk_data.get('size', 0),
+                    hpa_dco_stale=hdparm_data.get('stale', False)
                 )
                 devices.append(device)
                 
@@ -215,6 +307,107 @@ class StorageDetectionService:
             
         return devices
     
+    async def _detect_linux_devices_native(self, disk_partitions: List, disk_usage: Dict) -> List[StorageDevice]:
+        """Detect storage devices on Linux from sysfs and /proc/partitions, without subprocesses"""
+        devices = []
+        
+        try:
+            # Reads a handful of small sysfs files per device: milliseconds, no processes
+            topology = build_topology()
+            # dm/md volumes are listed under the physical disks they're built on
+            block_devices = [d for d in scan_block_devices() if not self._is_stacked(topology, d.name)]
+            
+            mounts = self._mounts_by_node(disk_partitions)
+            
+            lsblk_info = {}
+            if any(self._needs_lsblk(d) for d in block_devices):
+                lsblk_info = await self._get_lsblk_info()
+            
+            hdparm_targets = {
+                d.path: d.serial or lsblk_info.get(d.path, {}).get('serial')
+                for d in block_devices if d.transport in HDPARM_TRANSPORTS
+            }
+            hdparm_info = await self._get_hdparm_info(hdparm_targets) if hdparm_targets else {}
+            
+            for block in block_devices:
+                devices.append(self._device_from_block(
+                    block, mounts, disk_usage,
+                    lsblk_info.get(block.path, {}), hdparm_info.get(block.path, {}), topology
+                ))
+                
+        except Exception as e:
+            print(f"Error in native Linux device detection: {e}")
+            
+        return devices
+    
+    def _mounts_by_node(self, disk_partitions: List) -> Dict[str, Any]:
+        """Mounted filesystems by the node they live on (/dev/mapper/* resolve to /dev/dm-*)"""
+        mounts = {}
+        for partition in disk_partitions:
+            if partition.device.startswith('/dev/'):
+                mounts.setdefault(os.path.realpath(partition.device), partition)
+        return mounts
+    
+    def _needs_lsblk(self, block: BlockDevice) -> bool:
+        """Whether lsblk could fill in what sysfs doesn't say about a physical device"""
+        return (self.lsblk_enrichment and not (block.model and block.serial)
+                and block.transport not in ('loop', 'virtual') and shutil.which('lsblk') is not None)
+    
+    def _is_stacked(self, topology: BlockTopology, name: str) -> bool:
+        node = topology.nodes.get(name)
+        return node is not None and bool(node.slaves)
+    
+    def _device_from_block(self, block: BlockDevice, mounts: Dict, disk_usage: Dict,
+                           lsblk_data: Dict, hdparm_data: Dict,
+                           topology: Optional[BlockTopology] = None) -> StorageDevice:
+        """Build a StorageDevice from its sysfs description, mounts and optional lsblk/hdparm data"""
+        def partition_info(device_path: str, size: int, display_path: Optional[str] = None) -> PartitionInfo:
+            mount = mounts.get(device_path)
+            usage = disk_usage.get(mount.mountpoint) if mount else None
+            return PartitionInfo(
+                device=display_path or device_path,
+                mountpoint=mount.mountpoint if mount else "",
+                fstype=(mount.fstype if mount else None) or "unknown",
+                size=usage.total if usage else size,
+                used=usage.used if usage else 0,
+                free=usage.free if usage else 0
+            )
+        
+        # A filesystem directly on the disk shows up as its only "partition"
+        partitions = [partition_info(block.path, block.size_bytes)] if block.path in mounts else []
+        partitions.extend(partition_info(p.path, p.size_bytes) for p in block.partitions)
+        if topology is not None:
+            # Mounted volumes built on this disk (LVM, dm-crypt, RAID), under their /dev/mapper names
+            own = {block.name} | {p.name for p in block.partitions}
+            for name in topology.stacked_on(block.name):
+                if name not in own and f"/dev/{name}" in mounts:
+                    partitions.append(partition_info(f"/dev/{name}", 0, topology.nodes[name].path))
+        
+        model = block.model or lsblk_data.get('model') or 'Unknown'
+        device_type = self._determine_device_type(model, lsblk_data.get('tran') or block.transport)
+        if device_type == 'Unknown':
+            if block.transport in ('loop', 'virtual'):
+                device_type = 'Virtual'
+            elif block.rotational is not None:
+                device_type = 'HDD' if block.rotational else 'SSD'
+        
+        return StorageDevice(
+            device=block.path,
+            model=model,
+            size=block.size_bytes,
+            partitions=partitions,
+            device_type=device_type,
+            serial=block.serial or lsblk_data.get('serial'),
+            hpa_present=hdparm_data.get('hpa_present', False),
+            dco_present=hdparm_data.get('dco_present', False),
+            sector_size=block.physical_sector_size,
+            rotation_rate=None,  # sysfs only knows rotational or not, not the RPM
+            temperature=None,
+            health_status=block.state or lsblk_data.get('health_status'),
+            raw_capacity=hdparm_data.get('raw_capacity') or block.size_bytes,
+            hpa_dco_stale=hdparm_data.get('stale', False)
+        )
+    
     async def _detect_generic_devices(self, disk_partitions: List, disk_usage: Dict) -> List[StorageDevice]:
         """Generic device detection for unsupported platforms"""
         devices = []
@@ -328,23 +521,26 @@ class StorageDetectionService:
             
         return diskpart_info
     
-    async def _get_lsblk_info(self) -> Dict[str, Dict]:
-        """Get block device information using lsblk on Linux"""
+    async def _get_lsblk_info(self, device_path: Optional[str] = None) -> Dict[str, Dict]:
+        """Get block device information using lsblk on Linux (for every device, or just device_path)"""
         lsblk_info = {}
         
         try:
             # Get detailed block device information
-            result = await self._run_command("lsblk -J -o NAME,MODEL,SIZE,SERIAL,TRAN,ROTA,PHY-SEC,STATE")
+            command = "lsblk -J -o NAME,MODEL,SIZE,SERIAL,TRAN,ROTA,PHY-SEC,STATE"
+            if device_path:
+                command += f" -d {shlex.quote(device_path)}"
+            result = await self._run_command(command)
             
             if result.returncode == 0:
                 data = json.loads(result.stdout)
                 for device in data.get('blockdevices', []):
                     device_path = f"/dev/{device['name']}"
                     lsblk_info[device_path] = {
-                        'model': device.get('model', 'Unknown'),
-                        'size': self._parse_size(device.get('size', '0')),
-                        'serial': device.get('serial', None),
-                        'tran': device.get('tran', ''),
+                        'model': device.get('model') or 'Unknown',
+                        'size': self._parse_size(device.get('size') or '0'),
+                        'serial': device.get('serial') or None,
+                        'tran': device.get('tran') or '',
                         'rotation_rate': int(device.get('rota', 0)) if device.get('rota') else None,
                         'sector_size': int(device.get('phy-sec', 512)),
                         'health_status': device.get('state', 'unknown')
@@ -354,43 +550,36 @@ class StorageDetectionService:
             
         return lsblk_info
     
-    async def _get_hdparm_info(self) -> Dict[str, Dict]:
-        """Get HPA/DCO information using hdparm on Linux"""
+    async def _get_hdparm_info(self, devices: Optional[Dict[str, Optional[str]]] = None,
+                               refresh: bool = False) -> Dict[str, Dict]:
+        """
+        Get HPA/DCO information using hdparm on Linux
+        
+        Args:
+            devices: Device path -> serial to probe (default: every disk lsblk lists)
+            refresh: Probe even drives with a cached result
+        """
         hdparm_info = {}
         
+        if not self.hpa_prober.available:
+            return hdparm_info
+        
         try:
-            # Get list of block devices
-            result = await self._run_command("lsblk -d -n -o NAME")
+            if devices is None:
+                # Get list of block devices
+                result = await self._run_command("lsblk -d -n -o NAME,SERIAL")
+                if result.returncode != 0:
+                    return hdparm_info
+                devices = {}
+                for line in result.stdout.strip().split('\n'):
+                    fields = line.split(None, 1)
+                    if fields:
+                        devices[f"/dev/{fields[0]}"] = fields[1].strip() if len(fields) > 1 else None
             
-            if result.returncode == 0:
-                devices = result.stdout.strip().split('\n')
+            # Concurrent and timeout-bounded; unresponsive drives come back marked stale
+            results = await self.hpa_prober.probe_all(devices, refresh=refresh)
+            hdparm_info = {path: result.to_dict() for path, result in results.items()}
                 
-                for device_name in devices:
-                    if device_name.strip():
-                        device_path = f"/dev/{device_name.strip()}"
-                        
-                        # Check for HPA
-                        hpa_result = await self._run_command(f"hdparm -N {device_path}")
-                        hpa_present = "HPA is enabled" in hpa_result.stdout
-                        
-                        # Check for DCO
-                        dco_result = await self._run_command(f"hdparm -d {device_path}")
-                        dco_present = "DCO" in dco_result.stdout
-                        
-                        # Get raw capacity
-                        raw_capacity = 0
-                        if hpa_present:
-                            # Extract HPA capacity
-                            hpa_match = re.search(r'max sectors = (\d+)', hpa_result.stdout)
-                            if hpa_match:
-                                raw_capacity = int(hpa_match.group(1)) * 512  # Assuming 512-byte sectors
-                        
-                        hdparm_info[device_path] = {
-                            'hpa_present': hpa_present,
-                            'dco_present': dco_present,
-                            'raw_capacity': raw_capacity
-                        }
-                        
         except Exception as e:
             print(f"Error getting hdparm info: {e}")
             
@@ -465,8 +654,8 @@ class StorageDetectionService:
                 stderr=str(e)
             )
     
-    def to_dict(self, device: StorageDevice) -> Dict[str, Any]:
-        """Convert StorageDevice to dictionary for JSON serialization"""
+    def to_dict(self, device: StorageDevice, detected_at: Optional[datetime] = None) -> Dict[str, Any]:
+        """Convert StorageDevice to dictionary for JSON serialization (detected_at defaults to now)"""
         return {
             'device': device.device,
             'model': device.model,
@@ -490,13 +679,14 @@ class StorageDetectionService:
             'serial': device.serial,
             'hpa_present': device.hpa_present,
             'dco_present': device.dco_present,
+            'hpa_dco_stale': device.hpa_dco_stale,
             'sector_size': device.sector_size,
             'rotation_rate': device.rotation_rate,
             'temperature': device.temperature,
             'health_status': device.health_status,
             'raw_capacity': device.raw_capacity,
             'raw_capacity_human': self._format_size(device.raw_capacity),
-            'detected_at': datetime.now().isoformat()
+            'detected_at': (detected_at or datetime.now()).isoformat()
         }
     
     def _format_size(self, size_bytes: int) -> str:
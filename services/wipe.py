@@ -1,28 +1,64 @@
 import os
 import shutil
 import asyncio
+import errno
 import hashlib
+import math
 import random
 import struct
 import sys
-from typing import Dict, List, Optional, Union, Any
-from dataclasses import dataclass
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple, Union, Any
+from dataclasses import dataclass, field
 from enum import Enum
 from datetime import datetime
 import logging
 from pathlib import Path
 
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
 # Add utils directory to path for privilege checker
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'utils'))
 
 from services.certificate_service import certificate_service
 from services.certificate_db_service import CertificateDBService
+from services.wipe_progress import ProgressSnapshot, WipeProgress, progress_registry
+from services.wipe_checkpoint import CheckpointStore, Checkpointer, DEFAULT_CHECKPOINT_INTERVAL_BYTES
+from services.device_geometry import DeviceGeometry, DeviceGeometryError, device_geometry
+from services.block_devices import DeviceInUseError, build_topology
+from services.file_extents import map_extents
+from services.discard import DiscardResult, DiscardStage, discard_range
+from services.wipe_engine import (
+    CancellationToken,
+    PassWriter,
+    TokenBucket,
+    WriterConfig,
+    RANDOM_PASS,
+    VerificationResult,
+    WipeCancelled,
+    format_fused_hash,
+    WipeIOExecutor,
+    io_executor,
+    device_key_for,
+    open_direct,
+    sync_filesystem,
+    DEFAULT_CHUNK_SIZE,
+    DIRECT_IO_CHUNK_SIZE,
+    BUFFER_ALIGNMENT,
+    RANDOM_SEED_SIZE,
+)
 from privilege_checker import PrivilegeChecker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SMALL_FILE_GROUP_FILES = 256  # Most files overwritten between two syncs
+SMALL_FILE_GROUP_BYTES = 64 * 1024 * 1024  # Most dirty data per group and pass
+
 
 class WipeMethod(str, Enum):
     """Supported wipe methods"""
@@ -43,6 +79,15 @@ class WipeStatus(str, Enum):
     CANCELLED = "cancelled"
 
 
+class VerificationMode(str, Enum):
+    """Read-back verification after the final pass"""
+    NONE = "none"
+    FULL = "full"
+    SAMPLED = "sampled"
+    # Hash the final pass while writing it, then spot-check a sample
+    FUSED = "fused"
+
+
 @dataclass
 class WipeResult:
     """Result of a wipe operation"""
@@ -58,14 +103,54 @@ class WipeResult:
     mock_mode: bool = False
     certificate_id: Optional[str] = None
     certificate_path: Optional[str] = None
+    verified_bytes: int = 0
+    verification_bytes_per_second: Optional[float] = None
+    bytes_written: int = 0
+    cancelled: bool = False
+    resumed: bool = False
+    checkpoints_written: int = 0
+    checkpoint_seconds: float = 0.0
+    allocated_bytes: Optional[int] = None  # Extent-aware file wipes: bytes in allocated extents
+    files_wiped: int = 0  # Folder wipes
+    sync_calls: int = 0  # fsync/fdatasync/syncfs calls made
+    discard_method: Optional[str] = None  # blkdiscard, blkzeroout or punch_hole
+    discarded_bytes: int = 0
+    discard_seconds: float = 0.0
+    discard_error: Optional[str] = None  # Why discarding failed or fell back
+    kernel_zero_bytes: int = 0  # Zeros written by the kernel without passing through user space
+
+
+@dataclass
+class SmallFileGroupResult:
+    """Outcome of overwriting one group of small files"""
+    wiped: List[str] = field(default_factory=list)
+    failed: int = 0
+    bytes_written: int = 0
+    sync_calls: int = 0
+    cancelled: bool = False
+
+
+def _default_operation_id(kind: str, target: str, start_time: datetime) -> str:
+    """Operation id for a wipe started without one; unique even for same-named targets started together"""
+    return f"{kind}_{os.path.basename(target)}_{int(start_time.timestamp())}_{uuid.uuid4().hex[:8]}"
 
 
 class WipeService:
     """Service for secure data wiping with multiple standards support"""
     
-    def __init__(self, mock_mode: bool = False, generate_certificates: bool = True):
+    def __init__(
+        self,
+        mock_mode: bool = False,
+        generate_certificates: bool = True,
+        executor: Optional[WipeIOExecutor] = None,
+        kernel_zero_fill: bool = True
+    ):
         self.mock_mode = mock_mode
         self.generate_certificates = generate_certificates
+        # Let the kernel write zero passes of file and drive wipes (falls back to user space)
+        self.kernel_zero_fill = kernel_zero_fill
+        # Blocking pass loops run here so the event loop stays responsive
+        self.io_executor = executor or io_executor
         self.active_operations: Dict[str, WipeStatus] = {}
         self.privilege_checker = PrivilegeChecker()
         self._privilege_checked = False
@@ -81,30 +166,39 @@ class WipeService:
         # NIST 800-88 patterns (1 pass with random data)
         self.nist_patterns = [b'\x00']  # Single pass with zeros
         
-        # Gutmann method patterns (35 passes)
-        self.gutmann_patterns = [
+        # Gutmann method patterns (35 passes): 4 random passes, the 27
+        # deterministic MFM/RLL patterns, then 4 more random passes
+        self.gutmann_patterns = [RANDOM_PASS] * 4 + [
             b'\x55', b'\xAA', b'\x92\x49\x24', b'\x49\x24\x92', b'\x24\x92\x49',
             b'\x00', b'\x11', b'\x22', b'\x33', b'\x44', b'\x55', b'\x66', b'\x77',
             b'\x88', b'\x99', b'\xAA', b'\xBB', b'\xCC', b'\xDD', b'\xEE', b'\xFF',
-            b'\x92\x49\x24\x49\x24\x92\x49\x24', b'\x49\x24\x92\x49\x24\x92\x49\x24',
-            b'\x24\x92\x49\x24\x92\x49\x24\x92', b'\x00\x00\x00\x00\x00\x00\x00\x00',
-            b'\x11\x11\x11\x11\x11\x11\x11\x11', b'\x22\x22\x22\x22\x22\x22\x22\x22',
-            b'\x33\x33\x33\x33\x33\x33\x33\x33', b'\x44\x44\x44\x44\x44\x44\x44\x44',
-            b'\x55\x55\x55\x55\x55\x55\x55\x55', b'\x66\x66\x66\x66\x66\x66\x66\x66',
-            b'\x77\x77\x77\x77\x77\x77\x77\x77', b'\x88\x88\x88\x88\x88\x88\x88\x88',
-            b'\x99\x99\x99\x99\x99\x99\x99\x99', b'\xAA\xAA\xAA\xAA\xAA\xAA\xAA\xAA',
-            b'\xBB\xBB\xBB\xBB\xBB\xBB\xBB\xBB', b'\xCC\xCC\xCC\xCC\xCC\xCC\xCC\xCC',
-            b'\xDD\xDD\xDD\xDD\xDD\xDD\xDD\xDD', b'\xEE\xEE\xEE\xEE\xEE\xEE\xEE\xEE',
-            b'\xFF\xFF\xFF\xFF\xFF\xFF\xFF\xFF'
-        ]
+            b'\x92\x49\x24', b'\x49\x24\x92', b'\x24\x92\x49',
+            b'\x6D\xB6\xDB', b'\xB6\xDB\x6D', b'\xDB\x6D\xB6'
+        ] + [RANDOM_PASS] * 4
     
-    async def wipe_file(self, path: str, method: WipeMethod) -> WipeResult:
+    async def wipe_file(
+        self,
+        path: str,
+        method: WipeMethod,
+        verification: VerificationMode = VerificationMode.NONE,
+        verify_sample_percent: float = 1.0,
+        operation_id: Optional[str] = None,
+        extent_aware: bool = False,
+        discard: DiscardStage = DiscardStage.NONE
+    ) -> WipeResult:
         """
         Securely wipe a single file
         
         Args:
             path: Path to the file to wipe
             method: Wipe method to use
+            verification: Read the final pass back before deleting the file
+            verify_sample_percent: Percentage of stripes read in sampled mode
+            operation_id: Id to track progress under (generated if omitted)
+            extent_aware: Overwrite only allocated extents, leaving the holes
+                of sparse files unallocated
+            discard: Punch holes over the file after the final pass, releasing
+                its blocks before it is deleted (BEFORE is treated as AFTER)
             
         Returns:
             WipeResult with operation details
@@ -113,7 +207,8 @@ class WipeService:
         self._validate_privileges_for_operation("file wipe")
         
         start_time = datetime.now()
-        operation_id = f"file_{os.path.basename(path)}_{int(start_time.timestamp())}"
+        operation_id = operation_id or _default_operation_id("file", path, start_time)
+        progress: Optional[WipeProgress] = None
         
         try:
             if not os.path.exists(path):
@@ -131,6 +226,8 @@ class WipeService:
             
             file_size = os.path.getsize(path)
             self.active_operations[operation_id] = WipeStatus.IN_PROGRESS
+            progress = progress_registry.register(operation_id, path, method.value, self._get_total_passes(method))
+            progress.start(file_size)
             
             if self.mock_mode:
                 logger.info(f"Mock mode: Would wipe file {path} using {method.value}")
@@ -146,14 +243,23 @@ class WipeService:
                     mock_mode=True
                 )
             else:
-                result = await self._perform_file_wipe(path, method, file_size)
+                async with self.io_executor.device_slot(device_key_for(path)):
+                    result = await self._perform_file_wipe(
+                        path, method, file_size, verification, verify_sample_percent, progress,
+                        progress.cancel_token, extent_aware, discard
+                    )
             
-            self.active_operations[operation_id] = WipeStatus.COMPLETED
+            final_status = WipeStatus.CANCELLED if result.cancelled else WipeStatus.COMPLETED
+            self.active_operations[operation_id] = final_status
+            if progress is not None:
+                progress.finish(final_status.value)
             return result
             
         except Exception as e:
             logger.error(f"Error wiping file {path}: {e}")
             self.active_operations[operation_id] = WipeStatus.FAILED
+            if progress is not None:
+                progress.finish(WipeStatus.FAILED.value)
             return WipeResult(
                 success=False,
                 method=method,
@@ -168,14 +274,26 @@ class WipeService:
         finally:
             if operation_id in self.active_operations:
                 del self.active_operations[operation_id]
+            progress_registry.remove(operation_id)
     
-    async def wipe_folder(self, path: str, method: WipeMethod) -> WipeResult:
+    async def wipe_folder(
+        self,
+        path: str,
+        method: WipeMethod,
+        concurrency: int = 1,
+        operation_id: Optional[str] = None,
+        small_file_threshold: int = 0
+    ) -> WipeResult:
         """
         Securely wipe all files in a folder and remove the folder
         
         Args:
             path: Path to the folder to wipe
             method: Wipe method to use
+            concurrency: Number of files to wipe in parallel (1 = sequential)
+            operation_id: Id to track progress under (generated if omitted)
+            small_file_threshold: Files of at most this many bytes are overwritten
+                in groups with one sync per group and pass (0 = every file on its own)
             
         Returns:
             WipeResult with operation details
@@ -184,7 +302,8 @@ class WipeService:
         self._validate_privileges_for_operation("folder wipe")
         
         start_time = datetime.now()
-        operation_id = f"folder_{os.path.basename(path)}_{int(start_time.timestamp())}"
+        operation_id = operation_id or _default_operation_id("folder", path, start_time)
+        progress: Optional[WipeProgress] = None
         
         try:
             if not os.path.exists(path):
@@ -214,6 +333,7 @@ class WipeService:
                 )
             
             self.active_operations[operation_id] = WipeStatus.IN_PROGRESS
+            progress = progress_registry.register(operation_id, path, method.value, self._get_total_passes(method))
             
             if self.mock_mode:
                 logger.info(f"Mock mode: Would wipe folder {path} using {method.value}")
@@ -229,14 +349,25 @@ class WipeService:
                     mock_mode=True
                 )
             else:
-                result = await self._perform_folder_wipe(path, method)
+                async with self.io_executor.device_slot(device_key_for(path)):
+                    if concurrency > 1 or small_file_threshold > 0:
+                        result = await self._perform_parallel_folder_wipe(
+                            path, method, concurrency, progress, small_file_threshold
+                        )
+                    else:
+                        result = await self._perform_folder_wipe(path, method, progress)
             
-            self.active_operations[operation_id] = WipeStatus.COMPLETED
+            final_status = WipeStatus.CANCELLED if result.cancelled else WipeStatus.COMPLETED
+            self.active_operations[operation_id] = final_status
+            if progress is not None:
+                progress.finish(final_status.value)
             return result
             
         except Exception as e:
             logger.error(f"Error wiping folder {path}: {e}")
             self.active_operations[operation_id] = WipeStatus.FAILED
+            if progress is not None:
+                progress.finish(WipeStatus.FAILED.value)
             return WipeResult(
                 success=False,
                 method=method,
@@ -251,14 +382,43 @@ class WipeService:
         finally:
             if operation_id in self.active_operations:
                 del self.active_operations[operation_id]
+            progress_registry.remove(operation_id)
     
-    async def wipe_drive(self, device: str, method: WipeMethod) -> WipeResult:
+    async def wipe_drive(
+        self,
+        device: str,
+        method: WipeMethod,
+        direct_io: bool = False,
+        verification: VerificationMode = VerificationMode.NONE,
+        verify_sample_percent: float = 1.0,
+        operation_id: Optional[str] = None,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_interval_bytes: int = DEFAULT_CHECKPOINT_INTERVAL_BYTES,
+        throttle: Optional[TokenBucket] = None,
+        passes: Optional[List[Optional[bytes]]] = None,
+        discard: DiscardStage = DiscardStage.NONE,
+        writer_config: Optional[WriterConfig] = None
+    ) -> WipeResult:
         """
         Securely wipe an entire drive
         
         Args:
             device: Device path (e.g., /dev/sda, \\\\.\\PhysicalDrive0)
             method: Wipe method to use
+            direct_io: Bypass the page cache with O_DIRECT|O_SYNC writes
+            verification: Read the final pass back after wiping
+            verify_sample_percent: Percentage of stripes read in sampled mode
+            operation_id: Id to track progress under (generated if omitted)
+            checkpoint_store: Where to keep resume checkpoints (None disables them);
+                a matching checkpoint already in the store is resumed from
+            checkpoint_interval_bytes: Bytes written between checkpoints
+            throttle: Rate limiter shared with other wipes (e.g. a batch bandwidth cap)
+            passes: Patterns to write instead of the method's own (e.g. the
+                collapsed passes of a WipePlan); the method is still reported
+            discard: Discard the whole device before the first pass or after the
+                final one (BLKDISCARD, falling back to BLKZEROOUT); best-effort
+            writer_config: Writer backend, queue depth and block size (default: one
+                write at a time in chunks sized for the device)
             
         Returns:
             WipeResult with operation details
@@ -267,10 +427,13 @@ class WipeService:
         self._validate_privileges_for_operation("drive wipe")
         
         start_time = datetime.now()
-        operation_id = f"drive_{os.path.basename(device)}_{int(start_time.timestamp())}"
+        operation_id = operation_id or _default_operation_id("drive", device, start_time)
+        progress: Optional[WipeProgress] = None
+        total_passes = len(passes) if passes else self._get_total_passes(method)
         
         try:
             self.active_operations[operation_id] = WipeStatus.IN_PROGRESS
+            progress = progress_registry.register(operation_id, device, method.value, total_passes)
             
             if self.mock_mode:
                 logger.info(f"Mock mode: Would wipe drive {device} using {method.value}")
@@ -280,20 +443,30 @@ class WipeService:
                     method=method,
                     target=device,
                     size_bytes=0,  # Would get actual drive size in real mode
-                    passes_completed=self._get_total_passes(method),
-                    total_passes=self._get_total_passes(method),
+                    passes_completed=total_passes,
+                    total_passes=total_passes,
                     duration_seconds=1.0,
                     mock_mode=True
                 )
             else:
-                result = await self._perform_drive_wipe(device, method)
+                await self._check_not_in_use(device)
+                async with self.io_executor.device_slot(device_key_for(device)):
+                    result = await self._perform_drive_wipe(
+                        device, method, direct_io, verification, verify_sample_percent, progress,
+                        checkpoint_store, checkpoint_interval_bytes, throttle, passes, discard, writer_config
+                    )
             
-            self.active_operations[operation_id] = WipeStatus.COMPLETED
+            final_status = WipeStatus.CANCELLED if result.cancelled else WipeStatus.COMPLETED
+            self.active_operations[operation_id] = final_status
+            if progress is not None:
+                progress.finish(final_status.value)
             return result
             
         except Exception as e:
             logger.error(f"Error wiping drive {device}: {e}")
             self.active_operations[operation_id] = WipeStatus.FAILED
+            if progress is not None:
+                progress.finish(WipeStatus.FAILED.value)
             return WipeResult(
                 success=False,
                 method=method,
@@ -308,12 +481,49 @@ class WipeService:
         finally:
             if operation_id in self.active_operations:
                 del self.active_operations[operation_id]
+            progress_registry.remove(operation_id)
+    
+    async def _perform_file_wipe(
+        self,
+        path: str,
+        method: WipeMethod,
+        file_size: int,
+        verification: VerificationMode = VerificationMode.NONE,
+        verify_sample_percent: float = 1.0,
+        progress: Optional[WipeProgress] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        extent_aware: bool = False,
+        discard: DiscardStage = DiscardStage.NONE
+    ) -> WipeResult:
+        """Perform actual file wiping on the I/O executor"""
+        return await self.io_executor.run_pass(
+            self._wipe_file_sync, path, method, file_size, verification, verify_sample_percent, progress,
+            cancel_token, extent_aware, discard
+        )
     
-    async def _perform_file_wipe(self, path: str, method: WipeMethod, file_size: int) -> WipeResult:
-        """Perform actual file wiping"""
+    def _wipe_file_sync(
+        self,
+        path: str,
+        method: WipeMethod,
+        file_size: int,
+        verification: VerificationMode = VerificationMode.NONE,
+        verify_sample_percent: float = 1.0,
+        progress: Optional[WipeProgress] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        extent_aware: bool = False,
+        discard: DiscardStage = DiscardStage.NONE
+    ) -> WipeResult:
+        """Overwrite and delete a file (blocking, runs on the I/O executor)"""
         start_time = datetime.now()
         total_passes = self._get_total_passes(method)
         patterns = self._get_patterns(method)
+        bytes_written = 0
+        pass_written = 0
+        passes_done = 0
+        sync_calls = 0
+        cancelled = False
+        extent_map = None
+        discard_result = None
         
         try:
             # Ensure file is not read-only on Windows
@@ -321,24 +531,68 @@ class WipeService:
                 os.chmod(path, 0o666)
             except Exception:
                 pass
-            with open(path, 'r+b') as f:
-                for pass_num in range(total_passes):
-                    pattern = patterns[pass_num % len(patterns)]
-                    f.seek(0)
-                    
-                    # Write pattern in chunks
-                    chunk_size = 1024 * 1024  # 1MB chunks
-                    bytes_written = 0
-                    
-                    while bytes_written < file_size:
-                        chunk = pattern * min(chunk_size, file_size - bytes_written)
-                        f.write(chunk)
-                        bytes_written += len(chunk)
-                    
-                    f.flush()
-                    os.fsync(f.fileno())
-                    
-                    logger.info(f"Completed pass {pass_num + 1}/{total_passes} for {path}")
+            fd = os.open(path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+            try:
+                extents = ((0, file_size),)
+                pass_size = file_size
+                if extent_aware:
+                    # Writing the holes would allocate them without destroying anything
+                    extent_map = map_extents(fd, file_size)
+                    extents = extent_map.extents
+                    pass_size = extent_map.allocated_bytes
+                    logger.info(
+                        f"{path}: {pass_size} of {file_size} bytes allocated in "
+                        f"{len(extents)} extents ({extent_map.source})"
+                    )
+                    if progress is not None:
+                        progress.start(pass_size)
+                
+                # Small files don't need a full-size chunk buffer per pattern
+                write_digest = hashlib.sha256() if verification == VerificationMode.FUSED else None
+                with PassWriter(
+                    chunk_size=min(DEFAULT_CHUNK_SIZE, pass_size), kernel_zero_fill=self.kernel_zero_fill
+                ) as writer:
+                    writer.prepare(patterns)
+                    try:
+                        for pass_num in range(total_passes):
+                            pattern = patterns[pass_num % len(patterns)]
+                            pass_digest = write_digest if pass_num == total_passes - 1 else None
+                            if progress is not None:
+                                progress.begin_pass(pass_num)
+                            for extent_offset, extent_length in extents:
+                                pass_written += writer.write_pass(
+                                    fd, pattern, extent_length, offset=extent_offset, pass_index=pass_num,
+                                    digest=pass_digest, progress=progress, cancel_token=cancel_token
+                                )
+                            os.fsync(fd)
+                            sync_calls += 1
+                            bytes_written += pass_written
+                            pass_written = 0
+                            passes_done += 1
+                            
+                            logger.info(f"Completed pass {pass_num + 1}/{total_passes} for {path}")
+                        
+                        verification_result = self._verify_final_pass(
+                            writer, fd, path, patterns, total_passes, pass_size,
+                            verification, verify_sample_percent, cancel_token,
+                            extents=extents if extent_aware else None
+                        )
+                        if discard != DiscardStage.NONE:
+                            discard_result = self._discard(fd, path, 0, file_size, is_block_device=False)
+                    except WipeCancelled as e:
+                        # Make the partial pass durable so the reported byte count is accurate
+                        bytes_written += pass_written + e.bytes_written
+                        os.fsync(fd)
+                        sync_calls += 1
+                        cancelled = True
+            finally:
+                os.close(fd)
+            
+            if cancelled:
+                # Leave the partially overwritten file in place
+                result = self._cancelled_result(path, method, file_size, passes_done, total_passes, bytes_written, start_time)
+                result.sync_calls = sync_calls
+                return result
             
             # Delete the file
             # Final attempt to remove; clear attributes again in case AV changed it
@@ -349,7 +603,7 @@ class WipeService:
             os.remove(path)
             
             duration = (datetime.now() - start_time).total_seconds()
-            return WipeResult(
+            result = WipeResult(
                 success=True,
                 method=method,
                 target=path,
@@ -357,26 +611,49 @@ class WipeService:
                 passes_completed=total_passes,
                 total_passes=total_passes,
                 duration_seconds=duration,
-                mock_mode=False
+                mock_mode=False,
+                bytes_written=bytes_written,
+                allocated_bytes=extent_map.allocated_bytes if extent_map is not None else None,
+                sync_calls=sync_calls,
+                kernel_zero_bytes=writer.kernel_zero_bytes
             )
+            self._apply_verification(result, verification_result, write_digest)
+            self._apply_discard(result, discard_result)
+            return result
             
         except Exception as e:
             raise Exception(f"Failed to wipe file {path}: {e}")
     
-    async def _perform_folder_wipe(self, path: str, method: WipeMethod) -> WipeResult:
+    async def _perform_folder_wipe(
+        self,
+        path: str,
+        method: WipeMethod,
+        progress: Optional[WipeProgress] = None
+    ) -> WipeResult:
         """Perform actual folder wiping"""
         start_time = datetime.now()
         total_passes = self._get_total_passes(method)
         total_size = 0
+        bytes_written = 0
+        files_done = 0
+        sync_calls = 0
+        cancel_token = progress.cancel_token if progress is not None else None
         
         try:
-            # Walk through all files in the folder
-            for root, dirs, files in os.walk(path, topdown=False):
+            # Walk through all files in the folder (the scan itself is blocking I/O)
+            tree = await self.io_executor.run(lambda: list(os.walk(path, topdown=False)))
+            for root, dirs, files in tree:
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
                 for file in files:
+                    if cancel_token is not None and cancel_token.cancelled:
+                        break
                     file_path = os.path.join(root, file)
                     try:
                         file_size = os.path.getsize(file_path)
                         total_size += file_size
+                        if progress is not None:
+                            progress.add_work(file_size * total_passes)
                         
                         # Wipe the file
                         # Ensure file is writable (clear read-only attribute on Windows)
@@ -385,9 +662,17 @@ class WipeService:
                         except Exception:
                             pass
 
-                        file_result = await self._perform_file_wipe(file_path, method, file_size)
-                        if not file_result.success:
+                        file_result = await self._perform_file_wipe(
+                            file_path, method, file_size, cancel_token=cancel_token
+                        )
+                        bytes_written += file_result.bytes_written
+                        sync_calls += file_result.sync_calls
+                        if file_result.success:
+                            files_done += 1
+                        elif not file_result.cancelled:
                             logger.warning(f"Failed to wipe file {file_path}: {file_result.error_message}")
+                        if progress is not None:
+                            progress.advance(file_size * total_passes)
                     
                     except Exception as e:
                         logger.warning(f"Error processing file {file_path}: {e}")
@@ -400,26 +685,19 @@ class WipeService:
                     except OSError:
                         pass  # Directory not empty, skip
             
+            if cancel_token is not None and cancel_token.cancelled:
+                # Files not reached yet are left untouched
+                result = self._cancelled_result(path, method, total_size, 0, total_passes, bytes_written, start_time)
+                result.error_message += f"; {files_done} file(s) wiped"
+                result.files_wiped = files_done
+                result.sync_calls = sync_calls
+                return result
+            
             # Remove the main directory (if empty now)
             try:
                 os.rmdir(path)
             except OSError:
-                # If not empty due to locked/hidden items, try best-effort removal of remaining files
-                for root, dirs, files in os.walk(path, topdown=False):
-                    for file in files:
-                        fp = os.path.join(root, file)
-                        try:
-                            os.chmod(fp, 0o666)
-                            os.remove(fp)
-                        except Exception:
-                            logger.warning(f"Residual file could not be removed: {fp}")
-                    for d in dirs:
-                        dp = os.path.join(root, d)
-                        try:
-                            os.rmdir(dp)
-                        except Exception:
-                            pass
-                os.rmdir(path)
+                await self.io_executor.run(self._remove_residual_tree, path)
             
             duration = (datetime.now() - start_time).total_seconds()
             return WipeResult(
@@ -430,57 +708,657 @@ class WipeService:
                 passes_completed=total_passes,
                 total_passes=total_passes,
                 duration_seconds=duration,
-                mock_mode=False
+                mock_mode=False,
+                bytes_written=bytes_written,
+                files_wiped=files_done,
+                sync_calls=sync_calls
             )
             
         except Exception as e:
             raise Exception(f"Failed to wipe folder {path}: {e}")
     
-    async def _perform_drive_wipe(self, device: str, method: WipeMethod) -> WipeResult:
-        """Perform actual drive wiping"""
+    async def _perform_parallel_folder_wipe(
+        self,
+        path: str,
+        method: WipeMethod,
+        concurrency: int,
+        progress: Optional[WipeProgress] = None,
+        small_file_threshold: int = 0
+    ) -> WipeResult:
+        """
+        Perform folder wiping with a bounded pool of file workers
+        
+        Directory scanning, file overwrite+unlink and directory removal run
+        as a pipeline: the scanner feeds files to the workers while it is still
+        walking the tree, and each directory is removed (bottom-up) as soon as
+        all of its children are gone.
+        
+        With a small-file threshold, files up to that size are handed to the
+        workers in groups instead, since for tiny files the per-file fsync
+        costs far more than the data (see _wipe_small_files_sync).
+        """
         start_time = datetime.now()
         total_passes = self._get_total_passes(method)
-        patterns = self._get_patterns(method)
+        root_path = os.path.abspath(path)
+        group_limit = self._small_file_group_limit(concurrency)
         
-        try:
-            # Open device for raw writing
-            with open(device, 'wb') as f:
-                # Get device size (this is platform-specific)
-                device_size = self._get_device_size(device)
-                
-                for pass_num in range(total_passes):
-                    pattern = patterns[pass_num % len(patterns)]
-                    f.seek(0)
-                    
-                    # Write pattern in chunks
-                    chunk_size = 1024 * 1024  # 1MB chunks
-                    bytes_written = 0
-                    
-                    while bytes_written < device_size:
-                        chunk = pattern * min(chunk_size, device_size - bytes_written)
-                        f.write(chunk)
-                        bytes_written += len(chunk)
-                    
-                    f.flush()
-                    os.fsync(f.fileno())
+        file_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+        pending_children: Dict[str, int] = {}
+        stats = {"size": 0, "failed": 0, "wiped": 0, "bytes_written": 0, "sync_calls": 0}
+        cancel_token = progress.cancel_token if progress is not None else None
+        
+        def is_cancelled() -> bool:
+            return cancel_token is not None and cancel_token.cancelled
+        
+        async def child_done(dir_path: str):
+            # Remove directories bottom-up once their last child is gone
+            while True:
+                pending_children[dir_path] -= 1
+                if pending_children[dir_path] > 0:
+                    return
+                del pending_children[dir_path]
+                try:
+                    await self.io_executor.run(os.rmdir, dir_path)
+                except OSError as e:
+                    logger.warning(f"Directory could not be removed: {dir_path}: {e}")
+                if dir_path == root_path:
+                    return
+                dir_path = os.path.dirname(dir_path)
+        
+        async def scanner():
+            try:
+                stack = [root_path]
+                group: List[Tuple[str, int]] = []
+                group_bytes = 0
+                while stack and not is_cancelled():
+                    dir_path = stack.pop()
+                    files, subdirs = await self.io_executor.run(self._scan_directory, dir_path)
                     
-                    logger.info(f"Completed pass {pass_num + 1}/{total_passes} for {device}")
+                    # Count children before any of them can finish; +1 keeps the
+                    # directory alive until this scan step has queued everything
+                    pending_children[dir_path] = len(files) + len(subdirs) + 1
+                    stack.extend(subdirs)
+                    for file_path, file_size in files:
+                        stats["size"] += file_size
+                        if progress is not None:
+                            progress.add_work(file_size * total_passes)
+                        if file_size > small_file_threshold:
+                            await file_queue.put((file_path, file_size))
+                            continue
+                        # Groups may span directories; each file still counts against its own
+                        group.append((file_path, file_size))
+                        group_bytes += file_size
+                        if len(group) >= group_limit or group_bytes >= SMALL_FILE_GROUP_BYTES:
+                            await file_queue.put(group)
+                            group, group_bytes = [], 0
+                    await child_done(dir_path)
+                if group and not is_cancelled():
+                    await file_queue.put(group)
+            finally:
+                # Always release the workers, even if the scan failed
+                for _ in range(concurrency):
+                    await file_queue.put(None)
+        
+        async def wipe_group(files: List[Tuple[str, int]]):
+            try:
+                group = await self.io_executor.run_pass(self._wipe_small_files_sync, files, method, cancel_token)
+            except Exception as e:
+                stats["failed"] += len(files)
+                logger.warning(f"Error processing a group of {len(files)} small files: {e}")
+            else:
+                stats["bytes_written"] += group.bytes_written
+                stats["sync_calls"] += group.sync_calls
+                if group.cancelled:
+                    return
+                stats["wiped"] += len(group.wiped)
+                stats["failed"] += group.failed
+            for file_path, file_size in files:
+                if progress is not None:
+                    progress.advance(file_size * total_passes)
+                await child_done(os.path.dirname(file_path))
+        
+        async def worker():
+            while True:
+                item = await file_queue.get()
+                if item is None:
+                    return
+                if is_cancelled():
+                    # Keep draining so the scanner can finish; skipped files stay untouched
+                    continue
+                if isinstance(item, list):
+                    await wipe_group(item)
+                    continue
+                file_path, file_size = item
+                try:
+                    file_result = await self._perform_file_wipe(file_path, method, file_size, cancel_token=cancel_token)
+                    stats["bytes_written"] += file_result.bytes_written
+                    stats["sync_calls"] += file_result.sync_calls
+                    if file_result.cancelled:
+                        continue
+                    stats["wiped"] += 1
+                except Exception as e:
+                    stats["failed"] += 1
+                    logger.warning(f"Error processing file {file_path}: {e}")
+                if progress is not None:
+                    progress.advance(file_size * total_passes)
+                await child_done(os.path.dirname(file_path))
+        
+        try:
+            await asyncio.gather(scanner(), *(worker() for _ in range(concurrency)))
+            
+            if is_cancelled():
+                result = self._cancelled_result(
+                    path, method, stats["size"], 0, total_passes, stats["bytes_written"], start_time
+                )
+                result.error_message += f"; {stats['wiped']} file(s) wiped"
+                result.files_wiped = stats["wiped"]
+                result.sync_calls = stats["sync_calls"]
+                return result
+            
+            if os.path.exists(root_path):
+                await self.io_executor.run(self._remove_residual_tree, root_path)
+            
+            if stats["failed"]:
+                logger.warning(f"{stats['failed']} file(s) in {path} could not be wiped")
             
             duration = (datetime.now() - start_time).total_seconds()
             return WipeResult(
                 success=True,
                 method=method,
-                target=device,
-                size_bytes=device_size,
+                target=path,
+                size_bytes=stats["size"],
                 passes_completed=total_passes,
                 total_passes=total_passes,
                 duration_seconds=duration,
-                mock_mode=False
+                mock_mode=False,
+                bytes_written=stats["bytes_written"],
+                files_wiped=stats["wiped"],
+                sync_calls=stats["sync_calls"]
             )
             
+        except Exception as e:
+            raise Exception(f"Failed to wipe folder {path}: {e}")
+    
+    def _wipe_small_files_sync(
+        self,
+        files: List[Tuple[str, int]],
+        method: WipeMethod,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> SmallFileGroupResult:
+        """
+        Overwrite and delete a group of small files (blocking, runs on the I/O executor)
+        
+        Each pass is written to every file in the group before anything is
+        synced, so a pass costs one syncfs per filesystem instead of one fsync
+        per file, and the files are unlinked together once the last pass is
+        durable. A file that can't be opened or written is dropped from the
+        group without affecting the others.
+        """
+        total_passes = self._get_total_passes(method)
+        patterns = self._get_patterns(method)
+        group = SmallFileGroupResult()
+        open_files: List[Tuple[str, int, int, int]] = []  # path, size, fd, st_dev
+        active: List[Tuple[str, int, int, int]] = []  # Files not dropped after an error
+        
+        try:
+            for file_path, file_size in files:
+                try:
+                    fd = os.open(file_path, os.O_RDWR | getattr(os, 'O_BINARY', 0))
+                except OSError as e:
+                    group.failed += 1
+                    logger.warning(f"Error processing file {file_path}: {e}")
+                    continue
+                open_files.append((file_path, file_size, fd, os.fstat(fd).st_dev))
+            active = list(open_files)
+            
+            chunk_size = min(DEFAULT_CHUNK_SIZE, max((entry[1] for entry in active), default=0))
+            with PassWriter(chunk_size=chunk_size) as writer:
+                writer.prepare(patterns)
+                try:
+                    for pass_num in range(total_passes):
+                        pattern = patterns[pass_num % len(patterns)]
+                        for index, entry in enumerate(list(active)):
+                            file_path, file_size, fd, _ = entry
+                            try:
+                                # Random passes: every file gets a keystream of its own
+                                group.bytes_written += writer.write_pass(
+                                    fd, pattern, file_size, pass_index=pass_num * len(files) + index,
+                                    cancel_token=cancel_token
+                                )
+                            except OSError as e:
+                                group.failed += 1
+                                logger.warning(f"Error processing file {file_path}: {e}")
+                                active.remove(entry)
+                        group.sync_calls += self._sync_small_files(active)
+                except WipeCancelled as e:
+                    # Make the partial pass durable; the files are left in place
+                    group.bytes_written += e.bytes_written
+                    group.sync_calls += self._sync_small_files(active)
+                    group.cancelled = True
+                    return group
+        finally:
+            for entry in open_files:
+                os.close(entry[2])
+        
+        for file_path, _, _, _ in active:
+            try:
+                os.remove(file_path)
+                group.wiped.append(file_path)
+            except OSError as e:
+                group.failed += 1
+                logger.warning(f"Wiped file could not be removed: {file_path}: {e}")
+        return group
+    
+    def _sync_small_files(self, open_files: List[Tuple[str, int, int, int]]) -> int:
+        """Make a group's writes durable; returns the number of sync calls made"""
+        by_device: Dict[int, List[int]] = {}
+        for _, _, fd, st_dev in open_files:
+            by_device.setdefault(st_dev, []).append(fd)
+        
+        sync_calls = 0
+        for fds in by_device.values():
+            if sync_filesystem(fds[0]):
+                sync_calls += 1
+                continue
+            # No syncfs: sync the files back to back so the journal can batch the commits
+            for fd in fds:
+                getattr(os, 'fdatasync', os.fsync)(fd)
+                sync_calls += 1
+        return sync_calls
+    
+    def _small_file_group_limit(self, workers: int) -> int:
+        """Files per group, keeping every worker's open descriptors within RLIMIT_NOFILE"""
+        limit = SMALL_FILE_GROUP_FILES
+        if resource is not None:
+            soft_limit = resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+            if soft_limit != resource.RLIM_INFINITY:
+                # Leave half the descriptors for everything else in the process
+                limit = min(limit, soft_limit // 2 // max(1, workers))
+        return max(1, limit)
+    
+    def _scan_directory(self, dir_path: str):
+        """List the files (with sizes) and subdirectories of one directory"""
+        files = []
+        subdirs = []
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.append(entry.path)
+                else:
+                    try:
+                        size = entry.stat().st_size
+                    except OSError:
+                        size = 0
+                    # Ensure file is writable (clear read-only attribute on Windows)
+                    try:
+                        os.chmod(entry.path, 0o666)
+                    except Exception:
+                        pass
+                    files.append((entry.path, size))
+        return files, subdirs
+    
+    def _remove_residual_tree(self, path: str):
+        """Best-effort removal of files left behind by locked/hidden items"""
+        for root, dirs, files in os.walk(path, topdown=False):
+            for file in files:
+                fp = os.path.join(root, file)
+                try:
+                    os.chmod(fp, 0o666)
+                    os.remove(fp)
+                except Exception:
+                    logger.warning(f"Residual file could not be removed: {fp}")
+            for d in dirs:
+                dp = os.path.join(root, d)
+                try:
+                    os.rmdir(dp)
+                except Exception:
+                    pass
+        os.rmdir(path)
+    
+    async def _perform_drive_wipe(
+        self,
+        device: str,
+        method: WipeMethod,
+        direct_io: bool = False,
+        verification: VerificationMode = VerificationMode.NONE,
+        verify_sample_percent: float = 1.0,
+        progress: Optional[WipeProgress] = None,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_interval_bytes: int = DEFAULT_CHECKPOINT_INTERVAL_BYTES,
+        throttle: Optional[TokenBucket] = None,
+        passes: Optional[List[Optional[bytes]]] = None,
+        discard: DiscardStage = DiscardStage.NONE,
+        writer_config: Optional[WriterConfig] = None
+    ) -> WipeResult:
+        """Perform actual drive wiping on the I/O executor"""
+        # Probing can block on the device (ioctls, sysfs), so it runs on the executor too
+        geometry = await self.io_executor.run(device_geometry.get, device)
+        return await self.io_executor.run_pass(
+            self._wipe_drive_sync, device, method, direct_io, geometry,
+            verification, verify_sample_percent, progress, checkpoint_store, checkpoint_interval_bytes, throttle,
+            passes, discard, writer_config
+        )
+    
+    def _wipe_drive_sync(
+        self,
+        device: str,
+        method: WipeMethod,
+        direct_io: bool,
+        geometry: DeviceGeometry,
+        verification: VerificationMode = VerificationMode.NONE,
+        verify_sample_percent: float = 1.0,
+        progress: Optional[WipeProgress] = None,
+        checkpoint_store: Optional[CheckpointStore] = None,
+        checkpoint_interval_bytes: int = DEFAULT_CHECKPOINT_INTERVAL_BYTES,
+        throttle: Optional[TokenBucket] = None,
+        passes: Optional[List[Optional[bytes]]] = None,
+        discard: DiscardStage = DiscardStage.NONE,
+        writer_config: Optional[WriterConfig] = None
+    ) -> WipeResult:
+        """Overwrite a whole drive (blocking, runs on the I/O executor)"""
+        start_time = datetime.now()
+        patterns = list(passes) if passes else self._get_patterns(method)
+        total_passes = len(patterns) if passes else self._get_total_passes(method)
+        # Checkpoints of a planned wipe must not resume a full-method wipe (or vice versa)
+        checkpoint_method = f"{method.value}:planned:{total_passes}" if passes else method.value
+        cancel_token = progress.cancel_token if progress is not None else None
+        bytes_written = 0
+        pass_written = 0
+        passes_done = 0
+        cancelled = False
+        discard_result = None
+        
+        try:
+            device_size = geometry.size_bytes
+            if device_size <= 0:
+                # Never report success for a wipe that wrote nothing
+                raise DeviceGeometryError(f"{device} reports a size of 0 bytes")
+            if progress is not None:
+                progress.start(device_size)
+            
+            # Open device for raw writing (never create or truncate the target).
+            # The buffered descriptor also covers any unaligned tail in direct mode.
+            fd = os.open(device, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+            # Chunks cover whole physical sectors and optimal I/O units
+            direct_fd = None
+            aligned_size = 0
+            sector_size = geometry.logical_sector_size
+            chunk_size = geometry.io_chunk_size(DEFAULT_CHUNK_SIZE)
+            if direct_io:
+                direct_fd = open_direct(device, sector_size)
+                if direct_fd is not None:
+                    aligned_size = device_size - device_size % sector_size
+                    chunk_size = geometry.io_chunk_size(DIRECT_IO_CHUNK_SIZE)
+                    logger.info(f"Using direct I/O for {device} (sector size {sector_size})")
+            if writer_config is not None and writer_config.block_size:
+                chunk_size = geometry.io_chunk_size(writer_config.block_size)
+            if writer_config is not None and writer_config.queued:
+                logger.info(
+                    f"Writing {device} with {writer_config.queue_depth} writes in flight of {chunk_size} bytes"
+                )
+            
+            # Position to start from: (pass, offset within the pass)
+            start_pass, start_offset = 0, 0
+            random_seed = None
+            checkpointer = None
+            if checkpoint_store is not None:
+                checkpoint = checkpoint_store.load()
+                if checkpoint is not None and checkpoint.matches(device, checkpoint_method, device_size):
+                    start_pass, start_offset = checkpoint.pass_index, checkpoint.offset
+                    if verification == VerificationMode.FUSED and (start_pass, start_offset) > (total_passes - 1, 0):
+                        # The write digest can't be restored, so the final pass is rewritten whole
+                        start_pass, start_offset = total_passes - 1, 0
+                    bytes_written = checkpoint.bytes_written
+                    passes_done = start_pass
+                    random_seed = checkpoint.random_seed
+                    logger.info(f"Resuming wipe of {device} at pass {start_pass + 1}/{total_passes}, offset {start_offset}")
+                elif checkpoint is not None:
+                    logger.warning(f"Ignoring checkpoint for {device}: it belongs to a different wipe")
+                
+                random_seed = random_seed or os.urandom(RANDOM_SEED_SIZE)
+                # Segments start at pattern phase 0, so their writes come from aligned pattern buffers
+                segment_alignment = chunk_size
+                for pattern in patterns:
+                    if pattern:
+                        segment_alignment = segment_alignment * len(pattern) // math.gcd(segment_alignment, len(pattern))
+                checkpointer = Checkpointer(
+                    checkpoint_store, device, checkpoint_method, device_size, random_seed,
+                    interval_bytes=checkpoint_interval_bytes, alignment=segment_alignment
+                )
+            
+            if discard == DiscardStage.BEFORE and (start_pass, start_offset) == (0, 0):
+                discard_result = self._discard(fd, device, 0, device_size, geometry.is_block_device)
+            
+            write_digest = hashlib.sha256() if verification == VerificationMode.FUSED else None
+            pass_num, offset = start_pass, start_offset
+            try:
+                buffer_alignment = max(BUFFER_ALIGNMENT, geometry.physical_sector_size)
+                with PassWriter(
+                    chunk_size=chunk_size, alignment=buffer_alignment, random_seed=random_seed,
+                    kernel_zero_fill=self.kernel_zero_fill, writer_config=writer_config
+                ) as writer:
+                    writer.prepare(patterns)
+                    verification_result = None
+                    try:
+                        for pass_num in range(start_pass, total_passes):
+                            pattern = patterns[pass_num % len(patterns)]
+                            pass_digest = write_digest if pass_num == total_passes - 1 else None
+                            offset = start_offset if pass_num == start_pass else 0
+                            pass_written = 0
+                            if progress is not None:
+                                progress.begin_pass(pass_num, offset)
+                            
+                            # Write the pass in segments, checkpointing between them
+                            while offset < device_size:
+                                use_direct = direct_fd is not None and offset < aligned_size
+                                target_fd = direct_fd if use_direct else fd
+                                length = (aligned_size if use_direct else device_size) - offset
+                                if checkpointer is not None:
+                                    length = min(length, checkpointer.interval_bytes)
+                                
+                                try:
+                                    written = writer.write_pass(
+                                        target_fd, pattern, length, offset=offset, pass_index=pass_num,
+                                        digest=pass_digest, progress=progress, cancel_token=cancel_token,
+                                        throttle=throttle
+                                    )
+                                except OSError as e:
+                                    if not use_direct or e.errno != errno.EINVAL:
+                                        raise
+                                    # Some drivers/filesystems only reject O_DIRECT at write time
+                                    logger.warning(f"Direct I/O rejected by {device}, falling back to buffered writes: {e}")
+                                    if checkpointer is not None:
+                                        # A checkpoint may still be syncing through this descriptor
+                                        checkpointer.wait()
+                                    os.close(direct_fd)
+                                    direct_fd = None
+                                    aligned_size = 0
+                                    if pass_digest is not None:
+                                        # The digest already took the rejected chunk; rewrite the whole pass
+                                        write_digest = pass_digest = hashlib.sha256()
+                                        offset = 0
+                                        pass_written = 0  # Rewritten bytes count once
+                                    if progress is not None:
+                                        progress.begin_pass(pass_num, offset)
+                                    continue
+                                
+                                offset += written
+                                pass_written += written
+                                if checkpointer is not None and offset < device_size:
+                                    checkpointer.save(pass_num, offset, bytes_written + pass_written, fd=target_fd)
+                            
+                            os.fsync(fd)
+                            bytes_written += pass_written
+                            pass_written = 0
+                            passes_done += 1
+                            offset = 0
+                            if checkpointer is not None:
+                                checkpointer.save(pass_num + 1, 0, bytes_written)
+                            
+                            logger.info(f"Completed pass {pass_num + 1}/{total_passes} for {device}")
+                        
+                        pass_num, offset = total_passes, 0
+                        if verification != VerificationMode.NONE:
+                            # The write descriptors are write-only; read back through a fresh one
+                            read_fd = os.open(device, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+                            try:
+                                verification_result = self._verify_final_pass(
+                                    writer, read_fd, device, patterns, total_passes, device_size,
+                                    verification, verify_sample_percent, cancel_token
+                                )
+                            finally:
+                                os.close(read_fd)
+                        if discard == DiscardStage.AFTER:
+                            discard_result = self._discard(fd, device, 0, device_size, geometry.is_block_device)
+                    except WipeCancelled as e:
+                        # Make the partial pass durable so the reported byte count is accurate
+                        bytes_written += pass_written + e.bytes_written
+                        os.fsync(fd)
+                        cancelled = True
+                        if checkpointer is not None:
+                            # Resume exactly where the cancelled write stopped
+                            checkpointer.save(pass_num, offset + e.bytes_written, bytes_written)
+            finally:
+                if checkpointer is not None:
+                    checkpointer.close()
+                if direct_fd is not None:
+                    os.close(direct_fd)
+                os.close(fd)
+            
+            if cancelled:
+                result = self._cancelled_result(device, method, device_size, passes_done, total_passes, bytes_written, start_time)
+            else:
+                duration = (datetime.now() - start_time).total_seconds()
+                result = WipeResult(
+                    success=True,
+                    method=method,
+                    target=device,
+                    size_bytes=device_size,
+                    passes_completed=total_passes,
+                    total_passes=total_passes,
+                    duration_seconds=duration,
+                    mock_mode=False,
+                    bytes_written=bytes_written
+                )
+                self._apply_verification(result, verification_result, write_digest)
+                if checkpoint_store is not None:
+                    checkpoint_store.clear()
+            self._apply_discard(result, discard_result)
+            
+            result.kernel_zero_bytes = writer.kernel_zero_bytes
+            result.resumed = (start_pass, start_offset) != (0, 0)
+            if checkpointer is not None:
+                result.checkpoints_written = checkpointer.checkpoints_written
+                result.checkpoint_seconds = checkpointer.checkpoint_seconds
+                logger.info(
+                    f"Wrote {checkpointer.checkpoints_written} checkpoints for {device} "
+                    f"in {checkpointer.checkpoint_seconds:.3f}s ({checkpointer.overhead:.2%} of the wipe)"
+                )
+            return result
+            
         except Exception as e:
             raise Exception(f"Failed to wipe drive {device}: {e}")
     
+    def _verify_final_pass(
+        self,
+        writer: PassWriter,
+        fd: int,
+        target: str,
+        patterns: List[Optional[bytes]],
+        total_passes: int,
+        size: int,
+        verification: VerificationMode,
+        verify_sample_percent: float,
+        cancel_token: Optional[CancellationToken] = None,
+        extents: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> Optional[VerificationResult]:
+        """Read the final pass back, raising if the target doesn't hold it"""
+        if verification == VerificationMode.NONE:
+            return None
+        
+        last_pass = total_passes - 1
+        pattern = patterns[last_pass % len(patterns)]
+        sample_fraction = 1.0
+        if verification in (VerificationMode.SAMPLED, VerificationMode.FUSED):
+            sample_fraction = min(max(verify_sample_percent, 0.0), 100.0) / 100.0
+        
+        verification_result = writer.verify_pass(
+            fd, pattern, size, pass_index=last_pass, sample_fraction=sample_fraction, cancel_token=cancel_token,
+            extents=extents
+        )
+        if not verification_result.matched:
+            raise Exception(f"Verification failed at offset {verification_result.mismatch_offset}")
+        
+        logger.info(
+            f"Verified {verification_result.bytes_verified}/{size} bytes of {target} "
+            f"at {verification_result.bytes_per_second / (1024 * 1024):.1f} MiB/s"
+        )
+        return verification_result
+    
+    def _cancelled_result(
+        self,
+        target: str,
+        method: WipeMethod,
+        size: int,
+        passes_done: int,
+        total_passes: int,
+        bytes_written: int,
+        start_time: datetime
+    ) -> WipeResult:
+        """Partial result for a wipe stopped by its cancellation token"""
+        logger.warning(f"Wipe of {target} cancelled after {passes_done}/{total_passes} passes ({bytes_written} bytes written)")
+        return WipeResult(
+            success=False,
+            method=method,
+            target=target,
+            size_bytes=size,
+            passes_completed=passes_done,
+            total_passes=total_passes,
+            duration_seconds=(datetime.now() - start_time).total_seconds(),
+            error_message=f"Wipe cancelled after {passes_done}/{total_passes} passes ({bytes_written} bytes written)",
+            mock_mode=False,
+            bytes_written=bytes_written,
+            cancelled=True
+        )
+    
+    def _apply_verification(
+        self,
+        result: WipeResult,
+        verification_result: Optional[VerificationResult],
+        write_digest: Optional[Any] = None
+    ):
+        """Copy verification details onto a wipe result"""
+        if verification_result is None:
+            return
+        if write_digest is not None:
+            # Fused mode: the digest covers everything written, the read-back only a sample
+            result.verification_hash = format_fused_hash(write_digest.hexdigest(), verification_result.coverage)
+        else:
+            result.verification_hash = verification_result.digest
+        result.verified_bytes = verification_result.bytes_verified
+        result.verification_bytes_per_second = verification_result.bytes_per_second
+    
+    def _discard(self, fd: int, target: str, offset: int, length: int, is_block_device: bool) -> DiscardResult:
+        """Run the discard stage over a range, logging how it went"""
+        discard_result = discard_range(fd, offset, length, is_block_device)
+        if discard_result.succeeded:
+            logger.info(
+                f"Discarded {discard_result.bytes_discarded} bytes of {target} with "
+                f"{discard_result.method} in {discard_result.seconds:.3f}s"
+            )
+        else:
+            logger.warning(f"Could not discard {target}: {discard_result.error}")
+        return discard_result
+    
+    def _apply_discard(self, result: WipeResult, discard_result: Optional[DiscardResult]):
+        """Copy discard details onto a wipe result"""
+        if discard_result is None:
+            return
+        result.discard_method = discard_result.method
+        result.discarded_bytes = discard_result.bytes_discarded
+        result.discard_seconds = discard_result.seconds
+        result.discard_error = discard_result.error
+    
     def _get_total_passes(self, method: WipeMethod) -> int:
         """Get total number of passes for a wipe method"""
         if method == WipeMethod.DOD_5220_22_M:
@@ -498,7 +1376,12 @@ class WipeService:
         else:
             return 1
     
-    def _get_patterns(self, method: WipeMethod) -> List[bytes]:
+    def pass_patterns(self, method: WipeMethod) -> List[Optional[bytes]]:
+        """Get the pattern written by each pass of a method (RANDOM_PASS for random passes)"""
+        patterns = self._get_patterns(method)
+        return [patterns[i % len(patterns)] for i in range(self._get_total_passes(method))]
+    
+    def _get_patterns(self, method: WipeMethod) -> List[Optional[bytes]]:
         """Get patterns for a wipe method"""
         if method == WipeMethod.DOD_5220_22_M:
             return self.dod_patterns
@@ -509,34 +1392,38 @@ class WipeService:
         elif method == WipeMethod.GUTMANN:
             return self.gutmann_patterns
         elif method == WipeMethod.RANDOM:
-            return [os.urandom(1)]
+            return [RANDOM_PASS]
         elif method == WipeMethod.ZERO:
             return [b'\x00']
         else:
             return [b'\x00']
     
-    def _get_device_size(self, device: str) -> int:
-        """Get device size in bytes"""
-        try:
-            # This is a simplified implementation
-            # In practice, you'd use platform-specific methods
-            if os.path.exists(device):
-                stat = os.stat(device)
-                return stat.st_size
-            return 0
-        except Exception:
-            return 0
-    
     def get_active_operations(self) -> Dict[str, WipeStatus]:
         """Get currently active wipe operations"""
         return self.active_operations.copy()
     
+    def get_progress(self, operation_id: str) -> Optional[ProgressSnapshot]:
+        """Get live progress for a running operation"""
+        return progress_registry.get(operation_id)
+    
+    def list_progress(self) -> List[ProgressSnapshot]:
+        """Get live progress for every running operation"""
+        return progress_registry.snapshots()
+    
     def cancel_operation(self, operation_id: str) -> bool:
-        """Cancel an active wipe operation"""
+        """
+        Cancel an active wipe operation
+        
+        The pass loop stops within one chunk and the wipe returns a partial
+        WipeResult. Works for operations started by any WipeService instance.
+        """
+        cancelled = progress_registry.cancel(operation_id) is not None
         if operation_id in self.active_operations:
             self.active_operations[operation_id] = WipeStatus.CANCELLED
-            return True
-        return False
+            cancelled = True
+        if cancelled:
+            logger.info(f"Cancellation requested for {operation_id}")
+        return cancelled
     
     def set_mock_mode(self, enabled: bool):
         """Enable or disable mock mode"""
@@ -552,6 +1439,14 @@ class WipeService:
         
         return self._has_elevated_privileges
     
+    async def _check_not_in_use(self, device: str) -> None:
+        """Refuse to wipe a device with mounted filesystems, active swap or volumes on it"""
+        if not sys.platform.startswith('linux'):
+            return
+        reasons = await self.io_executor.run(lambda: build_topology().in_use(device))
+        if reasons:
+            raise DeviceInUseError(f"Refusing to wipe {device}: {'; '.join(reasons)}")
+    
     def _validate_privileges_for_operation(self, operation_type: str) -> None:
         """Validate privileges for a specific operation type"""
         if self.mock_mode:
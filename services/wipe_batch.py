@@ -0,0 +1,298 @@
+"""
+Station mode: wiping a rack of drives at once.
+
+A batch wipes every device in it concurrently, each with its own pass loop
+on the I/O executor (one writer per spindle). Devices fail independently:
+an error on one drive ends only that drive's wipe and is reported in its
+own WipeResult. An optional bandwidth cap is shared by every writer in the
+batch through a single TokenBucket, so the batch as a whole stays under it
+however many drives are running.
+
+Batches live in memory; wipes that must survive a restart belong in the
+durable job queue (services/job_scheduler.py) instead.
+"""
+
+import asyncio
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from services.wipe import WipeService, WipeMethod, WipeResult, VerificationMode
+from services.block_devices import build_topology
+from services.wipe_engine import STATION_DRIVES, TokenBucket, device_key_disks, device_key_for, io_executor
+from services.wipe_progress import ProgressSnapshot, progress_registry
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_DEVICES = STATION_DRIVES  # Every drive gets a writer, leaving the reserved ones free
+MAX_FINISHED_BATCHES = 100  # Finished batches kept for status queries
+
+
+class BatchStatus(str, Enum):
+    """Overall status of a batch"""
+    RUNNING = "running"
+    COMPLETED = "completed"  # Every device wiped
+    PARTIAL = "partial"  # Some devices wiped, some failed or were cancelled
+    FAILED = "failed"  # No device wiped
+    CANCELLED = "cancelled"
+
+
+@dataclass
+class BatchDevice:
+    """One device of a batch and its outcome"""
+    device: str
+    operation_id: str
+    result: Optional[WipeResult] = None
+    certificate_status: str = "not_required"
+    download_urls: Optional[Dict[str, str]] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.result is not None
+
+    def progress(self) -> Optional[ProgressSnapshot]:
+        """Live progress while the device is being wiped"""
+        return progress_registry.get(self.operation_id)
+
+    @property
+    def throughput_bytes_per_second(self) -> float:
+        """Current write rate, or the average rate once the wipe has finished"""
+        if self.result is not None:
+            if self.result.duration_seconds > 0:
+                return self.result.bytes_written / self.result.duration_seconds
+            return 0.0
+        snapshot = self.progress()
+        return snapshot.throughput_bytes_per_second if snapshot else 0.0
+
+
+@dataclass
+class WipeBatch:
+    """A set of devices wiped together"""
+    batch_id: str
+    method: WipeMethod
+    devices: List[BatchDevice]
+    bandwidth_limit_bytes_per_second: Optional[int] = None
+    mock_mode: bool = False
+    created_at: datetime = field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
+    cancel_requested: bool = False
+
+    @property
+    def status(self) -> BatchStatus:
+        if not all(device.finished for device in self.devices):
+            return BatchStatus.RUNNING
+        succeeded = sum(1 for device in self.devices if device.result.success)
+        if succeeded == len(self.devices):
+            return BatchStatus.COMPLETED
+        if self.cancel_requested:
+            return BatchStatus.CANCELLED
+        return BatchStatus.PARTIAL if succeeded else BatchStatus.FAILED
+
+    @property
+    def aggregate_throughput_bytes_per_second(self) -> float:
+        """Combined write rate of the batch (average over its lifetime once finished)"""
+        if self.finished_at is not None:
+            elapsed = (self.finished_at - self.created_at).total_seconds()
+            total = sum(device.result.bytes_written for device in self.devices)
+            return total / elapsed if elapsed > 0 else 0.0
+        return sum(device.throughput_bytes_per_second for device in self.devices if not device.finished)
+
+
+DeviceCallback = Callable[[WipeBatch, BatchDevice], Awaitable[None]]
+
+
+class BatchWipeManager:
+    """Starts, tracks and cancels batch wipes"""
+
+    def __init__(self, max_devices: int = MAX_BATCH_DEVICES, max_finished: int = MAX_FINISHED_BATCHES):
+        self.max_devices = max_devices
+        self.max_finished = max_finished
+        self._batches: Dict[str, WipeBatch] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def start(
+        self,
+        devices: List[str],
+        method: WipeMethod,
+        direct_io: bool = False,
+        verification: VerificationMode = VerificationMode.NONE,
+        verify_sample_percent: float = 1.0,
+        bandwidth_limit_bytes_per_second: Optional[int] = None,
+        mock_mode: bool = False,
+        on_device_done: Optional[DeviceCallback] = None
+    ) -> WipeBatch:
+        """
+        Start wiping a set of devices concurrently
+
+        Returns as soon as the wipes are scheduled.
+
+        Args:
+            devices: Device paths, each naming a different physical device
+            method: Wipe method used for every device
+            direct_io: Bypass the page cache with O_DIRECT|O_SYNC writes
+            verification: Read the final pass back after wiping
+            verify_sample_percent: Percentage of stripes read in sampled mode
+            bandwidth_limit_bytes_per_second: Cap on the combined write rate (None for no cap)
+            mock_mode: Simulate the wipes
+            on_device_done: Awaited after each device finishes (e.g. to issue its certificate);
+                errors it raises are logged and don't affect other devices
+
+        Raises:
+            ValueError: Empty or oversized batch, or two paths on the same physical disk
+        """
+        if not devices:
+            raise ValueError("A batch needs at least one device")
+        if len(devices) > self.max_devices:
+            raise ValueError(f"A batch can hold at most {self.max_devices} devices")
+        # Up to max_devices sysfs walks: off the loop, on the probe pool a running batch can't fill
+        keys = await io_executor.run(self._device_keys, devices)
+        seen: Dict[str, str] = {}
+        for device, key in zip(devices, keys):
+            for disk in device_key_disks(key):
+                if disk in seen:
+                    raise ValueError(f"{device} and {seen[disk]} are on the same disk")
+                seen[disk] = device
+
+        batch_id = uuid.uuid4().hex[:12]
+        batch = WipeBatch(
+            batch_id=batch_id,
+            method=method,
+            devices=[
+                BatchDevice(device=device, operation_id=f"batch_{batch_id}_{index}")
+                for index, device in enumerate(devices)
+            ],
+            bandwidth_limit_bytes_per_second=bandwidth_limit_bytes_per_second,
+            mock_mode=mock_mode
+        )
+        throttle = TokenBucket(bandwidth_limit_bytes_per_second) if bandwidth_limit_bytes_per_second else None
+        service = WipeService(mock_mode=mock_mode, generate_certificates=False)
+
+        self._prune()
+        self._batches[batch_id] = batch
+        self._tasks[batch_id] = asyncio.create_task(self._run(
+            batch, service, direct_io, verification, verify_sample_percent, throttle, on_device_done
+        ))
+        logger.info(f"Batch {batch_id}: wiping {len(devices)} devices with {method.value}")
+        return batch
+
+    def get(self, batch_id: str) -> Optional[WipeBatch]:
+        return self._batches.get(batch_id)
+
+    def batches(self) -> List[WipeBatch]:
+        return list(self._batches.values())
+
+    def cancel(self, batch_id: str) -> Optional[WipeBatch]:
+        """Stop every unfinished device of a batch; devices already done keep their results"""
+        batch = self._batches.get(batch_id)
+        if batch is None:
+            return None
+        batch.cancel_requested = True
+        for device in batch.devices:
+            if not device.finished:
+                progress_registry.cancel(device.operation_id)
+        return batch
+
+    async def wait(self, batch_id: str) -> Optional[WipeBatch]:
+        """Wait for a batch to finish"""
+        task = self._tasks.get(batch_id)
+        if task is not None:
+            await asyncio.shield(task)
+        return self._batches.get(batch_id)
+
+    async def stop(self):
+        """Cancel every running batch and wait for the wipes to stop"""
+        for batch_id in list(self._tasks):
+            self.cancel(batch_id)
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    async def _run(
+        self,
+        batch: WipeBatch,
+        service: WipeService,
+        direct_io: bool,
+        verification: VerificationMode,
+        verify_sample_percent: float,
+        throttle: Optional[TokenBucket],
+        on_device_done: Optional[DeviceCallback]
+    ):
+        try:
+            await asyncio.gather(*(
+                self._wipe_device(batch, device, service, direct_io, verification,
+                                  verify_sample_percent, throttle, on_device_done)
+                for device in batch.devices
+            ))
+        finally:
+            batch.finished_at = datetime.now()
+            self._tasks.pop(batch.batch_id, None)
+            logger.info(f"Batch {batch.batch_id} finished: {batch.status.value}")
+
+    async def _wipe_device(
+        self,
+        batch: WipeBatch,
+        device: BatchDevice,
+        service: WipeService,
+        direct_io: bool,
+        verification: VerificationMode,
+        verify_sample_percent: float,
+        throttle: Optional[TokenBucket],
+        on_device_done: Optional[DeviceCallback]
+    ):
+        start_time = datetime.now()
+        if batch.cancel_requested:
+            result = self._failed_result(batch, device, start_time, "Cancelled before the wipe started")
+            result.cancelled = True
+        else:
+            try:
+                result = await service.wipe_drive(
+                    device.device,
+                    batch.method,
+                    direct_io=direct_io,
+                    verification=verification,
+                    verify_sample_percent=verify_sample_percent,
+                    operation_id=device.operation_id,
+                    throttle=throttle
+                )
+            except Exception as e:
+                # wipe_drive reports most errors in its result; this covers the rest (e.g. privileges)
+                logger.error(f"Batch {batch.batch_id}: wiping {device.device} failed: {e}")
+                result = self._failed_result(batch, device, start_time, str(e))
+        device.result = result
+
+        if on_device_done is not None:
+            try:
+                await on_device_done(batch, device)
+            except Exception as e:
+                logger.error(f"Batch {batch.batch_id}: post-wipe step for {device.device} failed: {e}")
+
+    def _failed_result(self, batch: WipeBatch, device: BatchDevice, start_time: datetime, error: str) -> WipeResult:
+        return WipeResult(
+            success=False,
+            method=batch.method,
+            target=device.device,
+            size_bytes=0,
+            passes_completed=0,
+            total_passes=0,
+            duration_seconds=(datetime.now() - start_time).total_seconds(),
+            error_message=error,
+            mock_mode=batch.mock_mode
+        )
+
+    @staticmethod
+    def _device_keys(devices: List[str]) -> List[str]:
+        topology = build_topology()
+        return [device_key_for(device, topology) for device in devices]
+
+    def _prune(self):
+        """Drop the oldest finished batches beyond the retention limit"""
+        finished = [batch for batch in self._batches.values() if batch.finished_at is not None]
+        finished.sort(key=lambda batch: batch.finished_at)
+        for batch in finished[:max(0, len(finished) - self.max_finished + 1)]:
+            del self._batches[batch.batch_id]
+
+
+# Global batch manager used by the wipe router
+batch_manager = BatchWipeManager()
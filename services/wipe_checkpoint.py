@@ -0,0 +1,161 @@
+"""
+Checkpoints for resuming long drive wipes.
+
+A checkpoint records how far a wipe got: the pass, the byte offset within
+it, and the random seed the passes are generated from. Random passes come
+from a seekable AES-CTR keystream, so the seed plus (pass, offset) is the
+whole RNG position. A checkpoint is only saved after the data before its
+offset has been synced, so resuming from it never skips unwritten bytes.
+
+Syncing a large dirty range takes a while, so it runs on a background
+thread while the pass keeps writing; the writer only waits if the previous
+checkpoint is still in flight. Checkpoints are spaced by a byte interval,
+and the Checkpointer warns when the time the writer spends waiting on them
+exceeds its overhead budget, which means the interval should be raised.
+"""
+
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_INTERVAL_BYTES = 1024 * 1024 * 1024  # 1 GiB
+DEFAULT_CHECKPOINT_MAX_OVERHEAD = 0.005  # Fraction of wipe time checkpoints should cost at most
+
+
+@dataclass
+class WipeCheckpoint:
+    """Durable position of a drive wipe"""
+    target: str
+    method: str
+    size_bytes: int
+    pass_index: int
+    offset: int
+    bytes_written: int
+    random_seed: bytes
+    updated_at: datetime
+
+    def matches(self, target: str, method: str, size_bytes: int) -> bool:
+        """Whether this checkpoint belongs to a wipe of the same target and method"""
+        return self.target == target and self.method == method and self.size_bytes == size_bytes
+
+
+class CheckpointStore(ABC):
+    """Persists the checkpoint of one wipe operation"""
+
+    @abstractmethod
+    def load(self) -> Optional[WipeCheckpoint]:
+        """The saved checkpoint, or None if there is none"""
+
+    @abstractmethod
+    def save(self, checkpoint: WipeCheckpoint):
+        """Replace the saved checkpoint"""
+
+    @abstractmethod
+    def clear(self):
+        """Forget the saved checkpoint (the wipe finished)"""
+
+
+class Checkpointer:
+    """Writes a wipe's checkpoints and keeps track of what they cost"""
+
+    def __init__(
+        self,
+        store: CheckpointStore,
+        target: str,
+        method: str,
+        size_bytes: int,
+        random_seed: bytes,
+        interval_bytes: int = DEFAULT_CHECKPOINT_INTERVAL_BYTES,
+        max_overhead: float = DEFAULT_CHECKPOINT_MAX_OVERHEAD,
+        alignment: int = 1
+    ):
+        self.store = store
+        self.target = target
+        self.method = method
+        self.size_bytes = size_bytes
+        self.random_seed = random_seed
+        self.max_overhead = max_overhead
+        # Segment boundaries are multiples of this; callers pass one covering
+        # their direct I/O chunk and pattern period, so segments start aligned
+        self.alignment = max(1, alignment)
+        self.interval_bytes = self._align(max(interval_bytes, self.alignment))
+        self.checkpoints_written = 0
+        self.checkpoint_seconds = 0.0
+        self._started = time.perf_counter()
+        self._warned = False
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wipe-checkpoint")
+        self._pending: Optional[Future] = None
+
+    def save(self, pass_index: int, offset: int, bytes_written: int, fd: Optional[int] = None):
+        """
+        Sync the data before `offset` and record the position, in the background
+
+        Every write before the call has returned, so a sync started now
+        covers them all. Checkpoints are written in order, one at a time.
+
+        Args:
+            pass_index: Pass the wipe is in (0-based)
+            offset: Bytes of that pass already written
+            bytes_written: Total bytes written by the wipe so far
+            fd: Descriptor to sync first (None if the data is already durable);
+                it must stay open until wait() or close()
+        """
+        checkpoint = WipeCheckpoint(
+            target=self.target,
+            method=self.method,
+            size_bytes=self.size_bytes,
+            pass_index=pass_index,
+            offset=offset,
+            bytes_written=bytes_written,
+            random_seed=self.random_seed,
+            updated_at=datetime.utcnow()
+        )
+        start = time.perf_counter()
+        self.wait()
+        self._pending = self._executor.submit(self._write, checkpoint, fd)
+        end = time.perf_counter()
+
+        self.checkpoints_written += 1
+        self.checkpoint_seconds += end - start
+
+        if not self._warned and self.overhead > self.max_overhead and end - self._started > 10.0:
+            self._warned = True
+            logger.warning(
+                f"Checkpoints are taking {self.overhead:.1%} of the wipe time for {self.target}; "
+                f"raise the checkpoint interval above {self.interval_bytes} bytes"
+            )
+
+    def wait(self):
+        """Block until the checkpoint in flight is durable (raises if it failed)"""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self):
+        """Wait for the last checkpoint and stop the background thread"""
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+
+    @property
+    def overhead(self) -> float:
+        """Fraction of the elapsed wipe time the writer spent waiting on checkpoints"""
+        elapsed = time.perf_counter() - self._started
+        return self.checkpoint_seconds / elapsed if elapsed > 0 else 0.0
+
+    def _write(self, checkpoint: WipeCheckpoint, fd: Optional[int]):
+        if fd is not None:
+            # Only the data has to be durable; the size of a device or preallocated target doesn't change
+            getattr(os, 'fdatasync', os.fsync)(fd)
+        self.store.save(checkpoint)
+
+    def _align(self, nbytes: int) -> int:
+        return (nbytes + self.alignment - 1) // self.alignment * self.alignment
@@ -0,0 +1,887 @@
+"""
+Pass-writer engine for secure wipe operations.
+
+Every wipe pass is written from a preallocated, page-aligned buffer that is
+built once per pattern. The hot loop only hands memoryview slices of that
+buffer to the kernel, so no chunk data is allocated while a pass runs.
+Random passes are generated from a seekable AES-CTR keystream into a
+reusable buffer, so they can be regenerated later from the seed. Zero
+passes can be handed to the kernel entirely (BLKZEROOUT, or sendfile from
+/dev/zero), so no data crosses into user space at all.
+
+Writes are submitted by a writer backend: the default issues one write at
+a time from the pass loop; the threaded backend keeps a queue of
+positional writes in flight over disjoint blocks, which fast SSDs and NVMe
+drives need to reach full throughput.
+"""
+
+import asyncio
+import bisect
+import ctypes
+import errno
+import functools
+import hashlib
+import hmac
+import io
+import logging
+import math
+import mmap
+import os
+import random
+import stat
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from services.block_devices import BlockTopology, build_topology
+from services.discard import BLKZEROOUT, RANGE
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1MB chunks
+DIRECT_IO_CHUNK_SIZE = 4 * 1024 * 1024  # Larger chunks amortize O_SYNC latency
+BUFFER_ALIGNMENT = mmap.PAGESIZE
+DEFAULT_SECTOR_SIZE = 512
+# Workers spend nearly all their time blocked in write/fsync, so the pool is
+# sized for a full wipe station (one writer per drive) rather than for CPUs,
+# plus headroom for file and folder wipes running beside a full batch
+STATION_DRIVES = 64
+RESERVED_WRITERS = 16
+DEFAULT_IO_WORKERS = max(STATION_DRIVES + RESERVED_WRITERS, (os.cpu_count() or 1) + 4)
+# Probes, scans and other short blocking calls get their own pool, so they
+# never queue behind pass loops that hold a writer for hours
+DEFAULT_PROBE_WORKERS = 8
+DEFAULT_PER_DEVICE_LIMIT = 1
+DEVICE_KEY_SEPARATOR = "+"  # Joins the disks of a target spanning several
+KERNEL_ZERO_CHUNK_SIZE = 64 * 1024 * 1024  # Per call, so progress and cancellation stay responsive
+DEFAULT_QUEUE_DEPTH = 8
+MAX_QUEUE_DEPTH = 64
+
+# Pattern list entry for a pass of cryptographically random data
+RANDOM_PASS: Optional[bytes] = None
+
+AES_BLOCK_SIZE = 16
+RANDOM_SEED_SIZE = 32  # AES-256 key
+
+
+class WipeCancelled(Exception):
+    """Raised by a pass loop that stopped because its token was cancelled"""
+
+    def __init__(self, bytes_written: int = 0):
+        super().__init__("Wipe cancelled")
+        self.bytes_written = bytes_written
+
+
+class CancellationToken:
+    """Thread-safe cancel flag that pass loops check between chunks"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self, bytes_written: int = 0):
+        if self._event.is_set():
+            raise WipeCancelled(bytes_written)
+
+
+class TokenBucket:
+    """
+    Thread-safe byte-rate limiter shared by several pass loops
+
+    Writers reserve bytes before each chunk; when the bucket runs dry they
+    sleep until their reservation is covered, so the combined write rate of
+    every writer sharing the bucket stays at `rate` bytes per second.
+    """
+
+    def __init__(self, rate: float, burst_seconds: float = 0.25):
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.rate = float(rate)
+        self.capacity = self.rate * burst_seconds
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, nbytes: int):
+        """Reserve `nbytes`, sleeping until the rate allows them"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # Reservations may overdraw the bucket; later callers wait for the debt
+            self._tokens -= nbytes
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+
+
+@dataclass
+class VerificationResult:
+    """Outcome of reading a wiped target back"""
+    matched: bool
+    bytes_verified: int
+    total_bytes: int
+    digest: str  # SHA-256 of the bytes read back, in offset order
+    duration_seconds: float
+    mismatch_offset: Optional[int] = None
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_verified / self.duration_seconds if self.duration_seconds > 0 else 0.0
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the target that was read back"""
+        return self.bytes_verified / self.total_bytes if self.total_bytes else 1.0
+
+
+class WriterBackend(str, Enum):
+    """How a pass writer submits its writes"""
+    SYNC = "sync"  # One write at a time from the pass loop
+    THREADED = "threaded"  # Up to queue_depth positional writes in flight, from a thread pool
+
+
+@dataclass(frozen=True)
+class WriterConfig:
+    """Writer backend of a wipe, with its queue depth and block size"""
+    backend: WriterBackend = WriterBackend.SYNC
+    queue_depth: int = DEFAULT_QUEUE_DEPTH  # Writes in flight (threaded backend)
+    block_size: Optional[int] = None  # Bytes per write; None keeps the wipe's chunk size
+
+    def __post_init__(self):
+        if not 1 <= self.queue_depth <= MAX_QUEUE_DEPTH:
+            raise ValueError(f"Queue depth must be between 1 and {MAX_QUEUE_DEPTH}")
+        if self.block_size is not None and self.block_size <= 0:
+            raise ValueError("Block size must be positive")
+
+    @property
+    def queued(self) -> bool:
+        """Whether writes are queued (positional writes need os.pwrite)"""
+        return self.backend == WriterBackend.THREADED and self.queue_depth > 1 and hasattr(os, 'pwrite')
+
+
+class PatternBuffer:
+    """Page-aligned buffer holding a repeating wipe pattern"""
+
+    def __init__(self, pattern: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE, alignment: int = BUFFER_ALIGNMENT):
+        if not pattern:
+            raise ValueError("Wipe pattern must not be empty")
+
+        self.pattern = pattern
+
+        # The buffer holds a whole number of pattern repetitions, so multi-byte
+        # patterns (e.g. Gutmann's 0x92 0x49 0x24) keep their phase from one
+        # chunk to the next, and a whole number of alignment units.
+        granularity = len(pattern) * alignment // math.gcd(len(pattern), alignment)
+        self.size = max(granularity, chunk_size // granularity * granularity)
+
+        # Anonymous mmap memory is always page aligned. One extra pattern
+        # length lets writes start mid-pattern for unaligned offsets.
+        repetitions = self.size // len(pattern) + 1
+        self._mmap = mmap.mmap(-1, repetitions * len(pattern))
+        self._mmap.write(pattern * repetitions)
+        self.view = memoryview(self._mmap)
+
+    def chunk(self, length: int, phase: int = 0) -> memoryview:
+        """Get a view of `length` bytes (capped at the buffer size) starting `phase` bytes into the pattern"""
+        return self.view[phase:phase + min(length, self.size)]
+
+    def close(self):
+        """Release the underlying memory"""
+        self.view.release()
+        _close_mapping(self._mmap)
+
+
+class RandomStream:
+    """
+    Seekable AES-256-CTR keystream for random wipe passes
+
+    The keystream at any (stream, offset) position can be regenerated from the
+    seed alone, which lets verification and resumed wipes reproduce exactly
+    what was written without storing it. Output goes into one preallocated,
+    page-aligned buffer that is reused for every chunk.
+    """
+
+    def __init__(self, seed: Optional[bytes] = None, chunk_size: int = DEFAULT_CHUNK_SIZE, alignment: int = BUFFER_ALIGNMENT):
+        self.seed = seed or os.urandom(RANDOM_SEED_SIZE)
+        if len(self.seed) != RANDOM_SEED_SIZE:
+            raise ValueError(f"Random seed must be {RANDOM_SEED_SIZE} bytes")
+
+        self._algorithm = algorithms.AES(self.seed)
+        self.size = max(alignment, chunk_size // alignment * alignment)
+
+        # Input is all zeros, so the ciphertext is the raw keystream. The extra
+        # room covers a partial leading block plus what update_into() requires.
+        capacity = self.size + 2 * AES_BLOCK_SIZE
+        self._zeros = mmap.mmap(-1, capacity)
+        self._out = mmap.mmap(-1, capacity + BUFFER_ALIGNMENT)
+        self._zeros_view = memoryview(self._zeros)
+        self._out_view = memoryview(self._out)
+
+    def fill(self, offset: int, length: int, stream_id: int = 0) -> memoryview:
+        """
+        Generate keystream bytes for a position in the stream
+
+        Args:
+            offset: Byte offset within the stream
+            length: Number of bytes (capped at the buffer size)
+            stream_id: Independent stream number (e.g. the pass index)
+
+        Returns:
+            View of the generated bytes; valid until the next call
+        """
+        length = min(length, self.size)
+        block, skip = divmod(offset, AES_BLOCK_SIZE)
+
+        # The 128-bit counter block is (stream_id << 64) + block number
+        counter = ((stream_id << 64) + block) % (1 << 128)
+        encryptor = Cipher(self._algorithm, modes.CTR(counter.to_bytes(AES_BLOCK_SIZE, 'big'))).encryptor()
+        encryptor.update_into(self._zeros_view[:skip + length], self._out_view)
+
+        return self._out_view[skip:skip + length]
+
+    def close(self):
+        """Release the underlying memory"""
+        self._zeros_view.release()
+        self._out_view.release()
+        _close_mapping(self._zeros)
+        _close_mapping(self._out)
+
+
+class PassWriter:
+    """Writes wipe passes from reusable pattern buffers"""
+
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        alignment: int = BUFFER_ALIGNMENT,
+        random_seed: Optional[bytes] = None,
+        kernel_zero_fill: bool = False,
+        writer_config: Optional[WriterConfig] = None
+    ):
+        self.chunk_size = chunk_size
+        self.alignment = alignment
+        self.random_seed = random_seed or os.urandom(RANDOM_SEED_SIZE)
+        self.writer_config = writer_config or WriterConfig()
+        self._write_pool: Optional[ThreadPoolExecutor] = None
+        # One keystream buffer per queue slot, since random chunks are generated in place
+        self._slot_streams: List[RandomStream] = []
+        # Zero passes go to the kernel until it refuses once; the rest is written from user space
+        self.kernel_zero_fill = kernel_zero_fill
+        self.kernel_zero_bytes = 0
+        self.kernel_zero_method: Optional[str] = None
+        self._buffers: Dict[bytes, PatternBuffer] = {}
+        self._random_stream: Optional[RandomStream] = None
+        self._read_buffer: Optional[mmap.mmap] = None
+
+    @property
+    def random_stream(self) -> RandomStream:
+        """Keystream used for RANDOM_PASS entries"""
+        if self._random_stream is None:
+            self._random_stream = RandomStream(self.random_seed, self.chunk_size, self.alignment)
+        return self._random_stream
+
+    def prepare(self, patterns: Iterable[Optional[bytes]]) -> None:
+        """Build the buffers for all patterns up front"""
+        for pattern in patterns:
+            if pattern is RANDOM_PASS:
+                self.random_stream
+            else:
+                self.buffer_for(pattern)
+
+    def buffer_for(self, pattern: bytes) -> PatternBuffer:
+        """Get (or build) the buffer for a pattern"""
+        buffer = self._buffers.get(pattern)
+        if buffer is None:
+            buffer = PatternBuffer(pattern, self.chunk_size, self.alignment)
+            self._buffers[pattern] = buffer
+        return buffer
+
+    def write_pass(
+        self,
+        fd: int,
+        pattern: Optional[bytes],
+        size: int,
+        offset: int = 0,
+        pass_index: int = 0,
+        digest: Optional[Any] = None,
+        progress: Optional[Any] = None,
+        cancel_token: Optional[CancellationToken] = None,
+        throttle: Optional[TokenBucket] = None
+    ) -> int:
+        """
+        Overwrite `size` bytes starting at `offset` with a repeating pattern
+
+        With kernel_zero_fill enabled, zero passes without a digest are
+        written by the kernel (see kernel_zero_fill()); if it can't, the
+        remainder falls back to user-space writes. Those go through the
+        configured writer backend.
+
+        Args:
+            fd: File descriptor opened for writing
+            pattern: Pattern to repeat across the range, or RANDOM_PASS
+            size: Number of bytes to write
+            offset: Byte offset to start writing at
+            pass_index: Selects the keystream for random passes
+            digest: Optional hashlib object fed every byte as it is written
+            progress: Optional WipeProgress advanced after every chunk
+            cancel_token: Checked before every chunk
+            throttle: Optional TokenBucket limiting the write rate
+
+        Returns:
+            Number of bytes written
+
+        Raises:
+            WipeCancelled: The token was cancelled; carries the bytes written so far
+        """
+        bytes_written = 0
+        if self.kernel_zero_fill and digest is None and is_zero_pattern(pattern):
+            bytes_written = self._write_kernel_zeros(fd, size, offset, progress, cancel_token, throttle)
+
+        if self.writer_config.queued and bytes_written < size:
+            try:
+                return bytes_written + self._write_queued(
+                    fd, pattern, size - bytes_written, offset + bytes_written, pass_index,
+                    digest, progress, cancel_token, throttle
+                )
+            except WipeCancelled as e:
+                raise WipeCancelled(bytes_written + e.bytes_written)
+
+        os.lseek(fd, offset + bytes_written, os.SEEK_SET)
+        while bytes_written < size:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled(bytes_written)
+            data = self.expected_chunk(pattern, offset + bytes_written, size - bytes_written, pass_index)
+            if digest is not None:
+                digest.update(data)
+            if throttle is not None:
+                throttle.acquire(len(data))
+            written = write_all(fd, data)
+            bytes_written += written
+            if progress is not None:
+                progress.advance(written)
+
+        return bytes_written
+
+    def _write_queued(
+        self,
+        fd: int,
+        pattern: Optional[bytes],
+        size: int,
+        offset: int,
+        pass_index: int,
+        digest: Optional[Any],
+        progress: Optional[Any],
+        cancel_token: Optional[CancellationToken],
+        throttle: Optional[TokenBucket]
+    ) -> int:
+        """
+        Write a range as queue_depth positional writes in flight at once
+
+        Blocks are generated (and hashed) in order on the calling thread and
+        written by the pool. Block n uses slot n % queue_depth, whose previous
+        write has always completed by then, so slot buffers are never
+        overwritten while a write still reads them.
+        """
+        queue_depth = self.writer_config.queue_depth
+        if self._write_pool is None:
+            self._write_pool = ThreadPoolExecutor(max_workers=queue_depth, thread_name_prefix="wipe-writer")
+        if pattern is RANDOM_PASS and not self._slot_streams:
+            self._slot_streams = [
+                RandomStream(self.random_seed, self.chunk_size, self.alignment) for _ in range(queue_depth)
+            ]
+
+        in_flight: Deque[Tuple[Future, int]] = deque()
+        submitted = 0
+        completed = 0
+        block = 0
+
+        def complete_oldest():
+            nonlocal completed
+            future, length = in_flight.popleft()
+            future.result()
+            completed += length
+            if progress is not None:
+                progress.advance(length)
+
+        try:
+            while submitted < size:
+                if cancel_token is not None and cancel_token.cancelled:
+                    break
+                if len(in_flight) == queue_depth:
+                    complete_oldest()
+                position = offset + submitted
+                if pattern is RANDOM_PASS:
+                    stream = self._slot_streams[block % queue_depth]
+                    data = stream.fill(position, size - submitted, pass_index)
+                else:
+                    data = self.expected_chunk(pattern, position, size - submitted, pass_index)
+                if digest is not None:
+                    digest.update(data)
+                if throttle is not None:
+                    throttle.acquire(len(data))
+                in_flight.append((self._write_pool.submit(pwrite_all, fd, data, position), len(data)))
+                submitted += len(data)
+                block += 1
+            while in_flight:
+                complete_oldest()
+        finally:
+            # A failed write leaves others in flight; they must finish before their buffers are reused
+            for future, _ in in_flight:
+                future.exception()
+
+        if completed < size:
+            raise WipeCancelled(completed)
+        return completed
+
+    def _write_kernel_zeros(
+        self,
+        fd: int,
+        size: int,
+        offset: int,
+        progress: Optional[Any],
+        cancel_token: Optional[CancellationToken],
+        throttle: Optional[TokenBucket]
+    ) -> int:
+        """Zero as much of the range as the kernel will; returns the bytes zeroed"""
+        is_block_device = stat.S_ISBLK(os.fstat(fd).st_mode)
+        # Throttled wipes take tokens per buffer, as user-space writes do
+        step_size = self.chunk_size if throttle is not None else KERNEL_ZERO_CHUNK_SIZE
+        bytes_written = 0
+        while bytes_written < size:
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled(bytes_written)
+            step = min(step_size, size - bytes_written)
+            if throttle is not None:
+                throttle.acquire(step)
+            try:
+                self.kernel_zero_method = kernel_zero_fill(fd, offset + bytes_written, step, is_block_device)
+            except OSError as e:
+                logger.info(f"Kernel zero fill unavailable ({e}); writing zeros from user space")
+                self.kernel_zero_fill = False
+                break
+            bytes_written += step
+            self.kernel_zero_bytes += step
+            if progress is not None:
+                progress.advance(step)
+        return bytes_written
+
+    def expected_chunk(self, pattern: Optional[bytes], offset: int, length: int, pass_index: int = 0) -> memoryview:
+        """Get the bytes a pass wrote at `offset` (at most one buffer's worth)"""
+        if pattern is RANDOM_PASS:
+            return self.random_stream.fill(offset, length, pass_index)
+        # Full chunks hold whole pattern repetitions, so the phase only
+        # depends on where the range started
+        return self.buffer_for(pattern).chunk(length, offset % len(pattern))
+
+    def verify_pass(
+        self,
+        fd: int,
+        pattern: Optional[bytes],
+        size: int,
+        pass_index: int = 0,
+        sample_fraction: float = 1.0,
+        cancel_token: Optional[CancellationToken] = None,
+        extents: Optional[Sequence[Tuple[int, int]]] = None
+    ) -> VerificationResult:
+        """
+        Read a target back and compare it against what a pass wrote
+
+        The target is read in stripes of one buffer each; a SHA-256 of the
+        bytes read is computed in the same pass. With sample_fraction < 1 only
+        that fraction of stripes (randomly placed, always including the first
+        and last) is read.
+
+        Args:
+            fd: File descriptor opened for reading
+            pattern: Pattern of the pass to verify, or RANDOM_PASS
+            size: Number of bytes the pass wrote
+            pass_index: Pass index used when the pass was written
+            sample_fraction: Fraction of stripes to read (0 < f <= 1)
+            cancel_token: Checked before every stripe
+            extents: (offset, length) ranges the pass wrote, if not the
+                whole of [0, size); their lengths must add up to `size`
+
+        Returns:
+            VerificationResult with the digest, coverage and throughput
+        """
+        start = time.perf_counter()
+        drop_page_cache(fd)
+
+        stripe_size = self.random_stream.size if pattern is RANDOM_PASS else self.buffer_for(pattern).size
+        ranges = list(extents) if extents is not None else [(0, size)]
+        # Index of the first stripe of every range, so stripes map back to offsets
+        first_stripes = []
+        stripe_count = 0
+        for _, length in ranges:
+            first_stripes.append(stripe_count)
+            stripe_count += (length + stripe_size - 1) // stripe_size
+        stripes = select_stripes(stripe_count, sample_fraction)
+
+        if self._read_buffer is None or len(self._read_buffer) < stripe_size:
+            if self._read_buffer is not None:
+                self._read_buffer.close()
+            self._read_buffer = mmap.mmap(-1, stripe_size)
+        read_view = memoryview(self._read_buffer)
+
+        digest = hashlib.sha256()
+        bytes_verified = 0
+        reader = io.FileIO(fd, 'rb', closefd=False)
+        try:
+            for stripe in stripes:
+                if cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+                index = bisect.bisect_right(first_stripes, stripe) - 1
+                range_offset, range_length = ranges[index]
+                position = (stripe - first_stripes[index]) * stripe_size
+                offset = range_offset + position
+                length = min(stripe_size, range_length - position)
+                data = read_view[:length]
+                read_exact(reader, data, offset)
+
+                if not hmac.compare_digest(data, self.expected_chunk(pattern, offset, length, pass_index)):
+                    return VerificationResult(
+                        matched=False,
+                        bytes_verified=bytes_verified,
+                        total_bytes=size,
+                        digest=digest.hexdigest(),
+                        duration_seconds=time.perf_counter() - start,
+                        mismatch_offset=offset
+                    )
+
+                digest.update(data)
+                bytes_verified += length
+        finally:
+            reader.close()
+            read_view.release()
+
+        return VerificationResult(
+            matched=True,
+            bytes_verified=bytes_verified,
+            total_bytes=size,
+            digest=digest.hexdigest(),
+            duration_seconds=time.perf_counter() - start
+        )
+
+    def close(self):
+        """Release all pattern buffers"""
+        for buffer in self._buffers.values():
+            buffer.close()
+        self._buffers.clear()
+        if self._random_stream is not None:
+            self._random_stream.close()
+            self._random_stream = None
+        if self._read_buffer is not None:
+            _close_mapping(self._read_buffer)
+            self._read_buffer = None
+        if self._write_pool is not None:
+            self._write_pool.shutdown(wait=True)
+            self._write_pool = None
+        for stream in self._slot_streams:
+            stream.close()
+        self._slot_streams = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class WipeIOExecutor:
+    """
+    Bounded thread pools that run blocking wipe I/O off the event loop
+
+    Pass loops are plain synchronous write/fsync code; running them here keeps
+    the FastAPI event loop free to answer health checks, job status polls and
+    downloads while a wipe is in progress. Pass loops hold a writer thread for
+    the whole wipe, so they run on their own pool (run_pass) and short calls
+    such as probes and directory scans on another (run), which a full batch
+    can't starve. Device slots limit how many wipes may hit the same physical
+    device at once.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_IO_WORKERS,
+        per_device_limit: int = DEFAULT_PER_DEVICE_LIMIT,
+        probe_workers: int = DEFAULT_PROBE_WORKERS
+    ):
+        self.max_workers = max_workers
+        self.per_device_limit = per_device_limit
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="wipe-io")
+        self._probe_executor = ThreadPoolExecutor(max_workers=probe_workers, thread_name_prefix="wipe-probe")
+        self._device_slots: Dict[str, asyncio.Semaphore] = {}
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a short blocking call (probe, scan, unlink) on the probe pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._probe_executor, functools.partial(func, *args, **kwargs))
+
+    async def run_pass(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a pass loop (writes until the wipe is done) on the writer pool and await its result"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    @asynccontextmanager
+    async def device_slot(self, device_key: str):
+        """Hold one of the per-device concurrency slots of every disk `device_key` covers"""
+        loop = asyncio.get_running_loop()
+        if self._slots_loop is not loop:
+            # Semaphores belong to the loop that created them
+            self._device_slots = {}
+            self._slots_loop = loop
+
+        slots = []
+        for disk in sorted(set(device_key_disks(device_key))):  # One order everywhere, so no deadlocks
+            slot = self._device_slots.get(disk)
+            if slot is None:
+                slot = asyncio.Semaphore(self.per_device_limit)
+                self._device_slots[disk] = slot
+            slots.append(slot)
+
+        async with AsyncExitStack() as stack:
+            for slot in slots:
+                await stack.enter_async_context(slot)
+            yield
+
+    def shutdown(self, wait: bool = True):
+        """Stop the worker threads"""
+        self._executor.shutdown(wait=wait)
+        self._probe_executor.shutdown(wait=wait)
+
+
+def device_key_for(path: str, topology: Optional[BlockTopology] = None) -> str:
+    """
+    Get the key used to limit concurrent wipes per device (blocking: reads sysfs)
+
+    Targets are keyed by the physical disks beneath them, so a disk, its
+    partitions, volumes built on it and files on its filesystems all share
+    a key; targets spanning several disks (RAID, spanned volumes) join them
+    with DEVICE_KEY_SEPARATOR. Other devices are keyed by their canonical
+    path, and files on filesystems without a disk (tmpfs) by the device
+    number of the filesystem.
+
+    Args:
+        path: Wipe target
+        topology: Block topology to resolve against (built if omitted; pass
+            one when keying several targets)
+    """
+    disks = (topology or build_topology()).disks_holding(path)
+    if disks:
+        return DEVICE_KEY_SEPARATOR.join(disks)
+    try:
+        st = os.stat(path)
+        if stat.S_ISBLK(st.st_mode) or stat.S_ISCHR(st.st_mode):
+            return os.path.realpath(path)
+        return f"dev:{st.st_dev}"
+    except OSError:
+        return os.path.realpath(path)
+
+
+def device_key_disks(device_key: str) -> List[str]:
+    """The disks (or other keys) a device key covers; two keys conflict when these overlap"""
+    return device_key.split(DEVICE_KEY_SEPARATOR)
+
+
+def open_direct(path: str, sector_size: int) -> Optional[int]:
+    """
+    Open a wipe target for unbuffered writes (O_DIRECT | O_SYNC)
+
+    Writes through the returned descriptor bypass the page cache, so wiping a
+    large disk does not evict everyone else's cached data.
+
+    Args:
+        path: Device or file to open
+        sector_size: Sector size the writes have to be aligned to
+
+    Returns:
+        File descriptor, or None when direct I/O is not possible and the
+        caller should use buffered writes instead
+    """
+    o_direct = getattr(os, 'O_DIRECT', None)
+    if o_direct is None:
+        logger.info("Direct I/O is not supported on this platform")
+        return None
+
+    # Pattern buffers are page aligned, which covers any power-of-two sector
+    # size up to the page size
+    if sector_size <= 0 or sector_size & (sector_size - 1) or sector_size > BUFFER_ALIGNMENT:
+        logger.warning(f"Cannot align buffers to sector size {sector_size} for {path}")
+        return None
+
+    try:
+        return os.open(path, os.O_WRONLY | o_direct | os.O_SYNC)
+    except OSError as e:
+        logger.warning(f"Direct I/O not available for {path}: {e}")
+        return None
+
+
+def format_fused_hash(write_digest: str, coverage: float) -> str:
+    """Combine a write-time digest with the fraction that was read back"""
+    return f"sha256:{write_digest};readback={coverage * 100:.2f}%"
+
+
+def select_stripes(stripe_count: int, sample_fraction: float) -> List[int]:
+    """Pick the stripe indices to verify, in ascending order"""
+    if sample_fraction >= 1.0 or stripe_count <= 2:
+        return list(range(stripe_count))
+
+    sample_size = max(2, math.ceil(stripe_count * sample_fraction))
+    middle = random.SystemRandom().sample(range(1, stripe_count - 1), min(sample_size - 2, stripe_count - 2))
+    return [0] + sorted(middle) + [stripe_count - 1]
+
+
+def _load_syncfs() -> Optional[Callable[[int], int]]:
+    """Look up syncfs(2) in the C library (Linux only)"""
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        syncfs = ctypes.CDLL(None, use_errno=True).syncfs
+    except (OSError, AttributeError):
+        return None
+    syncfs.argtypes = [ctypes.c_int]
+    syncfs.restype = ctypes.c_int
+    return syncfs
+
+
+_syncfs = _load_syncfs()
+
+
+def sync_filesystem(fd: int) -> bool:
+    """
+    Flush all dirty data of the filesystem holding `fd` with one syncfs call
+
+    Returns:
+        False if syncfs isn't available here (the caller has to sync per file)
+    """
+    if _syncfs is None:
+        return False
+    if _syncfs(fd) != 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return True
+
+
+def is_zero_pattern(pattern: Optional[bytes]) -> bool:
+    """Whether a pass pattern writes only zero bytes"""
+    return pattern is not RANDOM_PASS and not pattern.strip(b'\x00')
+
+
+def kernel_zero_fill(fd: int, offset: int, length: int, is_block_device: bool) -> str:
+    """
+    Zero a range without copying any data through user space (blocking)
+
+    Block devices use BLKZEROOUT, which the kernel issues with NOUNMAP: the
+    device has to write the zeros (WRITE ZEROES, or zero pages if it can't)
+    rather than deallocate the range. Regular files are filled by sendfile
+    from /dev/zero. FALLOC_FL_ZERO_RANGE is deliberately not used: it only
+    marks extents unwritten and leaves the old blocks on disk.
+
+    Returns:
+        The method used: blkzeroout or sendfile
+
+    Raises:
+        OSError: The kernel can't zero this target; nothing or part of the
+            range may have been zeroed
+    """
+    if is_block_device:
+        if fcntl is None:
+            raise OSError(errno.EOPNOTSUPP, "BLKZEROOUT is not available on this platform")
+        fcntl.ioctl(fd, BLKZEROOUT, RANGE.pack(offset, length))
+        return "blkzeroout"
+
+    if not hasattr(os, 'sendfile') or not os.path.exists('/dev/zero'):
+        raise OSError(errno.EOPNOTSUPP, "sendfile from /dev/zero is not available on this platform")
+    zero_fd = os.open('/dev/zero', os.O_RDONLY)
+    try:
+        os.lseek(fd, offset, os.SEEK_SET)
+        remaining = length
+        while remaining > 0:
+            sent = os.sendfile(fd, zero_fd, None, remaining)
+            if sent <= 0:
+                raise OSError(errno.EIO, "sendfile made no progress")
+            remaining -= sent
+    finally:
+        os.close(zero_fd)
+    return "sendfile"
+
+
+def drop_page_cache(fd: int):
+    """Ask the kernel to drop cached pages so reads hit the device"""
+    fadvise = getattr(os, 'posix_fadvise', None)
+    if fadvise is None:
+        return
+    try:
+        os.fsync(fd)
+        fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+
+
+def read_exact(reader: io.FileIO, data: memoryview, offset: int):
+    """Fill `data` from `offset`, failing if the target is shorter"""
+    reader.seek(offset)
+    filled = 0
+    while filled < len(data):
+        count = reader.readinto(data[filled:])
+        if not count:
+            raise OSError(f"Unexpected end of target at offset {offset + filled}")
+        filled += count
+
+
+def _close_mapping(mapping: mmap.mmap):
+    """Unmap a buffer, unless a chunk view of it is still referenced"""
+    try:
+        mapping.close()
+    except BufferError:
+        # The traceback of a failed write still holds a chunk; the mapping is
+        # freed along with it, and raising here would mask that error
+        pass
+
+
+def write_all(fd: int, data: memoryview) -> int:
+    """Write a whole chunk, retrying on short writes"""
+    total = len(data)
+    while data:
+        written = os.write(fd, data)
+        if written == 0:
+            raise OSError("Device accepted no data (out of space?)")
+        data = data[written:]
+    return total
+
+
+def pwrite_all(fd: int, data: memoryview, offset: int) -> int:
+    """Write a whole chunk at an offset, retrying on short writes"""
+    total = len(data)
+    while data:
+        written = os.pwrite(fd, data, offset)
+        if written == 0:
+            raise OSError("Device accepted no data (out of space?)")
+        data = data[written:]
+        offset += written
+    return total
+
+
+# Shared I/O executor used by all WipeService instances
+io_executor = WipeIOExecutor()
@@ -0,0 +1,319 @@
+"""
+Wipe planning: turning a method into the passes worth running on a device.
+
+Multi-pass methods (DoD 5220.22-M, Gutmann) were designed for magnetic
+media. On flash, the translation layer remaps every write, so overwriting
+a logical block again lands on different cells: extra passes add wear and
+hours without reaching anything the first pass didn't (NIST SP 800-88
+treats a single overwrite plus verification as the flash equivalent).
+The planner looks at the device's media (rotational, transport, discard
+support) and produces an execution plan:
+
+- overwrite passes, collapsed to one on flash;
+- a final verification pass;
+- a discard step when the device supports it and isn't rotational.
+
+Plans carry byte counts and duration estimates, so they can be shown as a
+dry run before anything is written.
+"""
+
+import logging
+import os
+import stat
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from services.block_devices import read_sysfs, sysfs_transport
+from services.device_geometry import device_geometry
+from services.wipe import WipeService, WipeMethod, VerificationMode, wipe_service
+from services.wipe_engine import RANDOM_PASS, io_executor
+
+logger = logging.getLogger(__name__)
+
+MB = 1000 * 1000
+
+# Conservative sustained (write, read) rates per media class, for estimates only
+MEDIA_THROUGHPUT = {
+    "hdd": (150 * MB, 160 * MB),
+    "ssd": (400 * MB, 500 * MB),
+    "nvme": (1500 * MB, 2500 * MB),
+    "usb": (30 * MB, 80 * MB),
+    "mmc": (20 * MB, 60 * MB),
+    "virtual": (500 * MB, 800 * MB),
+    "unknown": (100 * MB, 150 * MB),
+}
+DISCARD_BYTES_PER_SECOND = 20 * 1000 * MB  # Discards only touch metadata
+DISCARD_MIN_SECONDS = 1.0
+
+
+@dataclass(frozen=True)
+class MediaProfile:
+    """What the planner needs to know about a wipe target"""
+    path: str
+    size_bytes: int
+    is_block_device: bool
+    rotational: Optional[bool]  # None when unknown
+    transport: str  # nvme, sata, usb, mmc, virtio, loop, virtual, scsi or unknown
+    discard_supported: bool
+
+    @property
+    def media_class(self) -> str:
+        if self.transport in ("nvme", "mmc", "usb"):
+            return self.transport
+        if self.transport in ("loop", "virtual"):
+            return "virtual"
+        if self.rotational is True:
+            return "hdd"
+        if self.rotational is False:
+            return "ssd"
+        return "unknown"
+
+    @property
+    def is_flash(self) -> bool:
+        """Solid-state media, where repeated overwrites add wear but no security"""
+        if self.transport in ("nvme", "mmc"):
+            return True
+        # Loop and device-mapper volumes inherit their rotational flag from the
+        # backing device (or default to rotational), so they count only when
+        # the kernel says they aren't; USB bridges often misreport as rotational
+        return self.rotational is False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "size_bytes": self.size_bytes,
+            "is_block_device": self.is_block_device,
+            "rotational": self.rotational,
+            "transport": self.transport,
+            "discard_supported": self.discard_supported,
+            "media_class": self.media_class,
+            "is_flash": self.is_flash,
+        }
+
+
+@dataclass
+class PlanStep:
+    """One stage of a wipe plan"""
+    kind: str  # overwrite, verify or discard
+    description: str
+    bytes: int
+    estimated_seconds: float
+    pattern: Optional[str] = None  # Overwrite steps: zeros, ones, random or hex
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "kind": self.kind,
+            "description": self.description,
+            "pattern": self.pattern,
+            "bytes": self.bytes,
+            "estimated_seconds": round(self.estimated_seconds, 2),
+        }
+
+
+@dataclass
+class WipePlan:
+    """The passes, verification and discard a wipe will run"""
+    method: WipeMethod
+    media: MediaProfile
+    patterns: List[Optional[bytes]]
+    verification: VerificationMode
+    verify_sample_percent: float
+    discard: bool
+    passes_requested: int
+    steps: List[PlanStep] = field(default_factory=list)
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def passes_planned(self) -> int:
+        return len(self.patterns)
+
+    @property
+    def collapsed(self) -> bool:
+        return self.passes_planned < self.passes_requested
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(step.bytes for step in self.steps if step.kind == "overwrite")
+
+    @property
+    def bytes_read(self) -> int:
+        return sum(step.bytes for step in self.steps if step.kind == "verify")
+
+    @property
+    def estimated_seconds(self) -> float:
+        return sum(step.estimated_seconds for step in self.steps)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method.value,
+            "target": self.media.path,
+            "media": self.media.to_dict(),
+            "passes_requested": self.passes_requested,
+            "passes_planned": self.passes_planned,
+            "collapsed": self.collapsed,
+            "verification": self.verification.value,
+            "discard": self.discard,
+            "bytes_written": self.bytes_written,
+            "bytes_read": self.bytes_read,
+            "estimated_seconds": round(self.estimated_seconds, 2),
+            "steps": [step.to_dict() for step in self.steps],
+            "notes": self.notes,
+        }
+
+
+def describe_pattern(pattern: Optional[bytes]) -> str:
+    """Human-readable name of a pass pattern"""
+    if pattern is RANDOM_PASS:
+        return "random"
+    if set(pattern) == {0x00}:
+        return "zeros"
+    if set(pattern) == {0xFF}:
+        return "ones"
+    return "0x" + pattern.hex().upper()
+
+
+class WipePlanner:
+    """Builds wipe plans from a method and the target's media"""
+
+    def __init__(self, service: Optional[WipeService] = None):
+        self.service = service or wipe_service
+
+    def probe(self, path: str) -> MediaProfile:
+        """
+        Describe the media behind a device or file (blocking: stat, ioctls, sysfs)
+
+        Files are described by the block device holding their filesystem.
+
+        Raises:
+            DeviceGeometryError: The target doesn't exist or its size can't be read
+        """
+        geometry = device_geometry.get(path)
+        st = os.stat(path)
+        device_number = st.st_rdev if stat.S_ISBLK(st.st_mode) else st.st_dev
+
+        rotational = None
+        transport = "unknown"
+        discard_supported = False
+        node = None
+        if hasattr(os, 'major'):  # sysfs only exists on Linux
+            node = f"/sys/dev/block/{os.major(device_number)}:{os.minor(device_number)}"
+        if node is not None and os.path.exists(node):
+            # Partitions share the queue of their parent disk
+            queue = os.path.join(node, "queue")
+            if not os.path.isdir(queue):
+                queue = os.path.join(os.path.realpath(node), "..", "queue")
+            flag = read_sysfs(os.path.join(queue, "rotational"))
+            if flag in ("0", "1"):
+                rotational = flag == "1"
+            discard_supported = (read_sysfs(os.path.join(queue, "discard_max_bytes")) or "0") not in ("", "0")
+
+            transport = sysfs_transport(os.path.realpath(node))
+
+        return MediaProfile(
+            path=path,
+            size_bytes=geometry.size_bytes,
+            is_block_device=geometry.is_block_device,
+            rotational=rotational,
+            transport=transport,
+            discard_supported=discard_supported
+        )
+
+    def plan(
+        self,
+        method: WipeMethod,
+        media: MediaProfile,
+        verification: VerificationMode = VerificationMode.FULL,
+        verify_sample_percent: float = 1.0,
+        collapse_on_flash: bool = True,
+        discard: Optional[bool] = None,
+        write_bytes_per_second: Optional[float] = None,
+        read_bytes_per_second: Optional[float] = None
+    ) -> WipePlan:
+        """
+        Build the execution plan for wiping `media` with `method`
+
+        Args:
+            method: Wipe method requested
+            media: Target description (see probe())
+            verification: Verification of the final pass (NONE to skip it)
+            verify_sample_percent: Percentage of stripes read in sampled and fused mode
+            collapse_on_flash: Run a single pass instead of the method's passes on flash
+            discard: Force the discard step on or off (None: when supported on
+                non-rotational media)
+            write_bytes_per_second: Write rate for the estimate (default: by media class)
+            read_bytes_per_second: Read rate for the estimate (default: by media class)
+        """
+        requested = self.service.pass_patterns(method)
+        patterns = list(requested)
+        notes: List[str] = []
+
+        if collapse_on_flash and media.is_flash and len(patterns) > 1:
+            # A random pass leaves nothing predictable behind; otherwise keep the method's final pattern
+            final = RANDOM_PASS if any(p is RANDOM_PASS for p in patterns) else patterns[-1]
+            patterns = [final]
+            notes.append(
+                f"{media.media_class.upper()} media: {len(requested)} passes collapsed to one "
+                f"{describe_pattern(final)} pass. The flash translation layer remaps every write, "
+                f"so further passes add wear and time but reach no additional data (NIST SP 800-88)."
+            )
+        elif len(patterns) > 1 and media.rotational is None and not media.is_flash:
+            notes.append("Media type unknown: running every pass of the method.")
+
+        if discard is None:
+            discard = media.discard_supported and media.rotational is not True
+        elif discard and not media.discard_supported:
+            notes.append("The target doesn't advertise discard support; the discard step may be skipped.")
+
+        default_write, default_read = MEDIA_THROUGHPUT[media.media_class]
+        write_rate = write_bytes_per_second or default_write
+        read_rate = read_bytes_per_second or default_read
+        size = media.size_bytes
+
+        plan = WipePlan(
+            method=method,
+            media=media,
+            patterns=patterns,
+            verification=verification,
+            verify_sample_percent=verify_sample_percent,
+            discard=discard,
+            passes_requested=len(requested),
+            notes=notes
+        )
+        for index, pattern in enumerate(patterns):
+            plan.steps.append(PlanStep(
+                kind="overwrite",
+                description=f"Pass {index + 1}/{len(patterns)}: overwrite with {describe_pattern(pattern)}",
+                pattern=describe_pattern(pattern),
+                bytes=size,
+                estimated_seconds=size / write_rate
+            ))
+
+        if verification != VerificationMode.NONE:
+            fraction = 1.0
+            if verification in (VerificationMode.SAMPLED, VerificationMode.FUSED):
+                fraction = min(max(verify_sample_percent, 0.0), 100.0) / 100.0
+            read_bytes = int(size * fraction)
+            plan.steps.append(PlanStep(
+                kind="verify",
+                description=f"Read back {fraction:.0%} of the final pass ({verification.value})",
+                bytes=read_bytes,
+                estimated_seconds=read_bytes / read_rate
+            ))
+
+        if discard:
+            plan.steps.append(PlanStep(
+                kind="discard",
+                description="Discard (TRIM/UNMAP) the whole device so the controller can erase the blocks",
+                bytes=size,
+                estimated_seconds=max(DISCARD_MIN_SECONDS, size / DISCARD_BYTES_PER_SECOND)
+            ))
+        return plan
+
+    async def plan_target(self, path: str, method: WipeMethod, **options) -> WipePlan:
+        """Probe a target on the I/O executor and plan its wipe (see plan() for the options)"""
+        media = await io_executor.run(self.probe, path)
+        return self.plan(method, media, **options)
+
+
+# Global planner using the shared wipe service's method definitions
+wipe_planner = WipePlanner()
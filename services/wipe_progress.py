@@ -0,0 +1,273 @@
+"""
+Live progress records for running wipe operations.
+
+Each operation has one writer (the pass loop on the I/O executor, or the
+event loop for folder wipes) and any number of readers (API handlers).
+The writer keeps its counters in plain attributes and periodically
+publishes an immutable snapshot with a single attribute assignment, so
+readers never take a lock and never see a half-updated record. Publishing
+is rate-limited, keeping the per-chunk cost to a clock read.
+
+Published snapshots are also pushed to subscribers (e.g. SSE streams).
+Delivery hops onto the subscriber's event loop with call_soon_threadsafe,
+and each subscriber keeps only the latest snapshot per operation, so a
+slow client sees coalesced updates rather than a growing backlog.
+"""
+
+import asyncio
+import math
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.wipe_engine import CancellationToken
+
+PROGRESS_UPDATES_PER_SECOND = 4
+THROUGHPUT_TIME_CONSTANT = 5.0  # Seconds of history the throughput average favours
+
+
+@dataclass(frozen=True)
+class ProgressSnapshot:
+    """Point-in-time view of a wipe operation's progress"""
+    operation_id: str
+    target: str
+    method: str
+    status: str
+    started_at: str
+    updated_at: str
+    bytes_done: int
+    total_bytes: int
+    current_pass: int
+    total_passes: int
+    pass_bytes_done: int
+    pass_size: int
+    throughput_bytes_per_second: float
+    elapsed_seconds: float
+    eta_seconds: Optional[float]
+
+    @property
+    def percentage(self) -> float:
+        if self.total_bytes <= 0:
+            return 100.0 if self.status == "completed" else 0.0
+        return min(100.0, self.bytes_done * 100.0 / self.total_bytes)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for API responses"""
+        data = asdict(self)
+        data["percentage"] = round(self.percentage, 2)
+        return data
+
+
+class WipeProgress:
+    """Progress record for one wipe operation (single writer, many readers)"""
+
+    def __init__(
+        self,
+        operation_id: str,
+        target: str,
+        method: str,
+        total_passes: int,
+        updates_per_second: float = PROGRESS_UPDATES_PER_SECOND,
+        on_publish: Optional[Callable[[ProgressSnapshot], None]] = None
+    ):
+        self.operation_id = operation_id
+        self.target = target
+        self.method = method
+        self.total_passes = total_passes
+        self.started_at = datetime.now()
+        self.cancel_token = CancellationToken()
+        self._min_interval = 1.0 / updates_per_second if updates_per_second > 0 else 0.0
+        self._on_publish = on_publish
+
+        self._status = "in_progress"
+        self._total_bytes = 0
+        self._pass_size = 0
+        self._pass_index = 0
+        self._bytes_done = 0
+        self._throughput = 0.0
+
+        self._start = time.monotonic()
+        self._published_at = self._start
+        self._published_bytes = 0
+        self._snapshot = self._build_snapshot(self._start)
+
+    def start(self, pass_size: int):
+        """Set the number of bytes each pass writes"""
+        self._pass_size = pass_size
+        self._total_bytes = pass_size * self.total_passes
+        self._publish(time.monotonic())
+
+    def add_work(self, nbytes: int):
+        """Grow the total for operations discovered incrementally (folders)"""
+        self._total_bytes += nbytes
+
+    def begin_pass(self, pass_index: int, offset: int = 0):
+        """Mark the start of a pass (0-based), optionally resumed part-way through"""
+        bytes_done = pass_index * self._pass_size + offset
+        if bytes_done != self._bytes_done:
+            # Resumed or restarted: the jump wasn't written now, so keep it out of the throughput
+            self._published_bytes += bytes_done - self._bytes_done
+        self._pass_index = pass_index
+        self._bytes_done = bytes_done
+        self._publish(time.monotonic())
+
+    def advance(self, nbytes: int):
+        """Record bytes written; publishes at most N times per second"""
+        self._bytes_done += nbytes
+        now = time.monotonic()
+        if now - self._published_at >= self._min_interval:
+            self._publish(now)
+
+    def finish(self, status: str):
+        """Publish the final state of the operation"""
+        self._status = status
+        if status == "completed":
+            self._bytes_done = self._total_bytes
+        self._publish(time.monotonic())
+
+    def snapshot(self) -> ProgressSnapshot:
+        """Get the latest published snapshot"""
+        return self._snapshot
+
+    def _publish(self, now: float):
+        interval = now - self._published_at
+        if interval > 0:
+            rate = (self._bytes_done - self._published_bytes) / interval
+            if self._throughput == 0.0:
+                self._throughput = rate
+            else:
+                # Time-weighted EWMA so irregular publish intervals weigh correctly
+                alpha = 1.0 - math.exp(-interval / THROUGHPUT_TIME_CONSTANT)
+                self._throughput += alpha * (rate - self._throughput)
+        self._published_at = now
+        self._published_bytes = self._bytes_done
+        # A single reference assignment: readers see the old or the new snapshot
+        self._snapshot = self._build_snapshot(now)
+        if self._on_publish is not None:
+            self._on_publish(self._snapshot)
+
+    def _build_snapshot(self, now: float) -> ProgressSnapshot:
+        remaining = max(0, self._total_bytes - self._bytes_done)
+        eta = None
+        if self._status == "in_progress" and self._throughput > 0 and self._total_bytes > 0:
+            eta = remaining / self._throughput
+        elif self._status != "in_progress":
+            eta = 0.0
+        return ProgressSnapshot(
+            operation_id=self.operation_id,
+            target=self.target,
+            method=self.method,
+            status=self._status,
+            started_at=self.started_at.isoformat(),
+            updated_at=datetime.now().isoformat(),
+            bytes_done=self._bytes_done,
+            total_bytes=self._total_bytes,
+            current_pass=min(self._pass_index + 1, self.total_passes),
+            total_passes=self.total_passes,
+            pass_bytes_done=self._bytes_done - self._pass_index * self._pass_size,
+            pass_size=self._pass_size,
+            throughput_bytes_per_second=self._throughput,
+            elapsed_seconds=now - self._start,
+            eta_seconds=eta
+        )
+
+
+class ProgressSubscription:
+    """Coalesced stream of progress snapshots for one event loop"""
+
+    def __init__(self, registry: "ProgressRegistry", operation_id: Optional[str], loop: asyncio.AbstractEventLoop):
+        self.operation_id = operation_id
+        self._registry = registry
+        self._loop = loop
+        self._pending: Dict[str, ProgressSnapshot] = {}
+        self._ready = asyncio.Event()
+
+    def matches(self, snapshot: ProgressSnapshot) -> bool:
+        return self.operation_id is None or snapshot.operation_id == self.operation_id
+
+    def notify(self, snapshot: ProgressSnapshot):
+        """Queue a snapshot for delivery (callable from any thread)"""
+        self._loop.call_soon_threadsafe(self._deliver, snapshot)
+
+    def _deliver(self, snapshot: ProgressSnapshot):
+        # Newer snapshots replace undelivered ones for the same operation
+        self._pending[snapshot.operation_id] = snapshot
+        self._ready.set()
+
+    async def next_batch(self, timeout: Optional[float] = None) -> List[ProgressSnapshot]:
+        """Wait for updates; returns an empty list if the timeout expires"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        batch, self._pending = self._pending, {}
+        return list(batch.values())
+
+    def close(self):
+        self._registry.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ProgressRegistry:
+    """Process-wide map of operation id to progress record"""
+
+    def __init__(self):
+        self._records: Dict[str, WipeProgress] = {}
+        # Replaced rather than mutated so publishers can iterate without a lock
+        self._subscriptions: Tuple[ProgressSubscription, ...] = ()
+
+    def register(self, operation_id: str, target: str, method: str, total_passes: int) -> WipeProgress:
+        """Create and register a progress record"""
+        progress = WipeProgress(operation_id, target, method, total_passes, on_publish=self._notify)
+        self._records[operation_id] = progress
+        return progress
+
+    def subscribe(self, operation_id: Optional[str] = None) -> ProgressSubscription:
+        """Subscribe the running event loop to one operation, or all of them"""
+        subscription = ProgressSubscription(self, operation_id, asyncio.get_running_loop())
+        self._subscriptions = self._subscriptions + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription: ProgressSubscription):
+        self._subscriptions = tuple(s for s in self._subscriptions if s is not subscription)
+
+    def _notify(self, snapshot: ProgressSnapshot):
+        for subscription in self._subscriptions:
+            if subscription.matches(snapshot):
+                try:
+                    subscription.notify(snapshot)
+                except RuntimeError:
+                    # The subscriber's event loop is gone
+                    self.unsubscribe(subscription)
+
+    def cancel(self, operation_id: str) -> Optional[ProgressSnapshot]:
+        """Signal a running operation to stop; returns its latest snapshot"""
+        progress = self._records.get(operation_id)
+        if progress is None:
+            return None
+        progress.cancel_token.cancel()
+        return progress.snapshot()
+
+    def remove(self, operation_id: str):
+        """Forget a finished operation"""
+        self._records.pop(operation_id, None)
+
+    def get(self, operation_id: str) -> Optional[ProgressSnapshot]:
+        """Get the latest snapshot for an operation"""
+        progress = self._records.get(operation_id)
+        return progress.snapshot() if progress else None
+
+    def snapshots(self) -> List[ProgressSnapshot]:
+        """Get the latest snapshots of all registered operations"""
+        return [progress.snapshot() for progress in list(self._records.values())]
+
+
+# Global progress registry shared by every WipeService instance
+progress_registry = ProgressRegistry()
@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Test script for the durable job queue and scheduler.
+Each test runs against a throwaway SQLite database.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+import models  # noqa: F401  (registers every table on Base.metadata)
+from models.wipe_log import WipeLog, WipeMethod, VerificationStatus
+from models.wipe_job import WipeJob, JobState
+from services.job_scheduler import JobScheduler
+from services.wipe import WipeResult, WipeMethod as FileWipeMethod
+
+
+def _make_session_factory():
+    """Create an empty database in a temporary file"""
+    fd, path = tempfile.mkstemp(prefix="jobs_test_", suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine), path
+
+
+def _enqueue(session_factory, device_key: str, priority: int = 0, **fields) -> int:
+    """Queue a job and return its id"""
+    db = session_factory()
+    try:
+        wipe_log = WipeLog(user_id=1, wipe_method=WipeMethod.OVERWRITE)
+        db.add(wipe_log)
+        db.flush()
+        db.add(WipeJob(
+            id=wipe_log.id,
+            target_path=f"{device_key}/target",
+            wipe_method=WipeMethod.OVERWRITE.value,
+            device_key=device_key,
+            priority=priority,
+            **fields
+        ))
+        db.commit()
+        return wipe_log.id
+    finally:
+        db.close()
+
+
+def _job(session_factory, job_id: int) -> WipeJob:
+    db = session_factory()
+    try:
+        return db.query(WipeJob).filter(WipeJob.id == job_id).first()
+    finally:
+        db.close()
+
+
+def _result(success: bool = True) -> WipeResult:
+    return WipeResult(
+        success=success,
+        method=FileWipeMethod.SINGLE_PASS,
+        target="target",
+        size_bytes=4096,
+        passes_completed=1,
+        total_passes=1,
+        duration_seconds=0.01,
+        bytes_written=4096
+    )
+
+
+async def _wait_for(predicate, timeout: float = 5.0) -> bool:
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        if predicate():
+            return True
+        await asyncio.sleep(0.02)
+    return predicate()
+
+
+async def test_priority_and_device_exclusivity():
+    """Higher priority runs first and a device never runs two jobs at once"""
+    print("🧪 Testing Priority and Device Exclusivity")
+    print("=" * 50)
+
+    session_factory, path = _make_session_factory()
+    low = _enqueue(session_factory, "disk-a", priority=0)
+    high = _enqueue(session_factory, "disk-a", priority=10)
+    other = _enqueue(session_factory, "disk-b", priority=5)
+
+    order = []
+    active = {}
+    overlap = []
+
+    async def runner(job):
+        if active.get(job.device_key):
+            overlap.append(job.job_id)
+        active[job.device_key] = True
+        order.append(job.job_id)
+        await asyncio.sleep(0.1)
+        active[job.device_key] = False
+        return _result()
+
+    scheduler = JobScheduler(max_concurrent_jobs=4, poll_interval=0.05, session_factory=session_factory)
+    try:
+        await scheduler.start(runner)
+        done = await _wait_for(lambda: all(
+            _job(session_factory, job_id).state == JobState.COMPLETED for job_id in (low, high, other)
+        ))
+        await scheduler.stop()
+
+        print(f"   Run order: {order}")
+        if not done:
+            print("❌ Not every job completed")
+            return False
+        if order[0] != high or order.index(high) > order.index(low):
+            print("❌ Jobs did not run in priority order")
+            return False
+        if overlap:
+            print(f"❌ Jobs {overlap} shared a device with a running job")
+            return False
+        print("✅ Priority order and per-device exclusivity hold")
+        return True
+    finally:
+        os.remove(path)
+
+
+async def test_concurrency_limit():
+    """No more than max_concurrent_jobs run at once"""
+    print("🧪 Testing Concurrency Limit")
+    print("=" * 50)
+
+    session_factory, path = _make_session_factory()
+    job_ids = [_enqueue(session_factory, f"disk-{i}") for i in range(6)]
+    running = 0
+    peak = 0
+
+    async def runner(job):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.1)
+        running -= 1
+        return _result()
+
+    scheduler = JobScheduler(max_concurrent_jobs=2, poll_interval=0.05, session_factory=session_factory)
+    try:
+        await scheduler.start(runner)
+        done = await _wait_for(lambda: all(
+            _job(session_factory, job_id).state == JobState.COMPLETED for job_id in job_ids
+        ))
+        await scheduler.stop()
+
+        print(f"   Peak concurrency: {peak}")
+        if not done or peak != 2:
+            print("❌ Concurrency limit not respected")
+            return False
+        print("✅ Concurrency limit respected")
+        return True
+    finally:
+        os.remove(path)
+
+
+async def test_orphan_reclaim():
+    """Jobs left running by a dead worker are requeued or failed on start"""
+    print("🧪 Testing Orphan Reclaim")
+    print("=" * 50)
+
+    session_factory, path = _make_session_factory()
+    stale = datetime.utcnow() - timedelta(minutes=5)
+    orphan = _enqueue(session_factory, "disk-a", state=JobState.RUNNING, claimed_by="dead-worker",
+                      heartbeat_at=stale, attempts=1)
+    exhausted = _enqueue(session_factory, "disk-b", state=JobState.RUNNING, claimed_by="dead-worker",
+                         heartbeat_at=stale, attempts=3)
+
+    async def runner(job):
+        return _result()
+
+    scheduler = JobScheduler(poll_interval=0.05, max_attempts=3, session_factory=session_factory)
+    try:
+        await scheduler.start(runner)
+        done = await _wait_for(lambda: _job(session_factory, orphan).state == JobState.COMPLETED)
+        await scheduler.stop()
+
+        orphan_job = _job(session_factory, orphan)
+        exhausted_job = _job(session_factory, exhausted)
+        print(f"   Orphan: {orphan_job.state.value} after {orphan_job.attempts} attempts")
+        print(f"   Exhausted: {exhausted_job.state.value}")
+        if not done or orphan_job.attempts != 2:
+            print("❌ Orphaned job was not rerun")
+            return False
+        if exhausted_job.state != JobState.FAILED:
+            print("❌ Job over the attempt limit was not failed")
+            return False
+        print("✅ Orphaned jobs reclaimed")
+        return True
+    finally:
+        os.remove(path)
+
+
+async def test_queued_cancel_and_shutdown_requeue():
+    """Queued jobs cancel at once; jobs interrupted by shutdown go back to the queue"""
+    print("🧪 Testing Queued Cancel and Shutdown Requeue")
+    print("=" * 50)
+
+    session_factory, path = _make_session_factory()
+    scheduler = JobScheduler(poll_interval=0.05, session_factory=session_factory)
+    try:
+        queued = _enqueue(session_factory, "disk-a")
+        state = scheduler.request_cancel(queued)
+        print(f"   Queued job after cancel: {state.value}")
+        if state != JobState.CANCELLED:
+            print("❌ Queued job was not cancelled")
+            return False
+
+        started = asyncio.Event()
+
+        async def runner(job):
+            # Stands in for a wipe that stops when its token is cancelled
+            started.set()
+            await asyncio.sleep(0.1)
+            result = _result(success=False)
+            result.cancelled = True
+            return result
+
+        interrupted = _enqueue(session_factory, "disk-b")
+        await scheduler.start(runner)
+        await asyncio.wait_for(started.wait(), 5.0)
+        await scheduler.stop()
+
+        job = _job(session_factory, interrupted)
+        print(f"   Job interrupted by shutdown: {job.state.value}")
+        if job.state != JobState.QUEUED or job.claimed_by is not None:
+            print("❌ Interrupted job was not requeued")
+            return False
+
+        # A user cancel of a running job closes its wipe log too
+        started.clear()
+        running = _enqueue(session_factory, "disk-c")
+        await scheduler.start(runner)
+        await asyncio.wait_for(started.wait(), 5.0)
+        scheduler.request_cancel(running)
+        done = await _wait_for(lambda: _job(session_factory, running).state == JobState.CANCELLED)
+        await scheduler.stop()
+        db = session_factory()
+        try:
+            wipe_log = db.query(WipeLog).filter(WipeLog.id == running).first()
+            print(f"   Log of cancelled running job: {wipe_log.verification_status.value}")
+            if not done or wipe_log.verification_status != VerificationStatus.FAILED or wipe_log.end_time is None:
+                print("❌ Cancelled running job left its wipe log pending")
+                return False
+        finally:
+            db.close()
+        print("✅ Cancel and shutdown handling work")
+        return True
+    finally:
+        os.remove(path)
+
+
+async def test_shared_disk_exclusivity():
+    """A job on an array never runs alongside a job on one of its member disks"""
+    print("🧪 Testing Shared Disk Exclusivity")
+    print("=" * 50)
+
+    session_factory, path = _make_session_factory()
+    array = _enqueue(session_factory, "/dev/sdx+/dev/sdy", priority=10)
+    member = _enqueue(session_factory, "/dev/sdy", priority=5)
+    unrelated = _enqueue(session_factory, "/dev/sdyy", priority=0)
+
+    active = set()
+    overlap = []
+
+    async def runner(job):
+        disks = set(job.device_key.split("+"))
+        if active & disks:
+            overlap.append(job.job_id)
+        active.update(disks)
+        await asyncio.sleep(0.1)
+        active.difference_update(disks)
+        return _result()
+
+    scheduler = JobScheduler(max_concurrent_jobs=4, poll_interval=0.05, session_factory=session_factory)
+    try:
+        await scheduler.start(runner)
+        done = await _wait_for(lambda: all(
+            _job(session_factory, job_id).state == JobState.COMPLETED for job_id in (array, member, unrelated)
+        ))
+        await scheduler.stop()
+
+        if not done:
+            print("❌ Not every job completed")
+            return False
+        if overlap:
+            print(f"❌ Jobs {overlap} ran on a disk already in use")
+            return False
+        # The member waits for the array; the unrelated disk doesn't
+        if _job(session_factory, unrelated).started_at >= _job(session_factory, member).started_at:
+            print("❌ A job on an unrelated disk waited")
+            return False
+        print("✅ Jobs sharing a disk never overlap")
+        return True
+    finally:
+        os.remove(path)
+
+
+async def test_job_event_stream():
+    """A job's event stream opens with its current progress"""
+    print("🧪 Testing Job Event Stream")
+    print("=" * 50)
+
+    from routers.jobs import stream_job_events
+    from services.job_scheduler import job_operation_id
+    from services.wipe_progress import progress_registry
+
+    class ConnectedRequest:
+        async def is_disconnected(self):
+            return False
+
+    session_factory, path = _make_session_factory()
+    job_id = _enqueue(session_factory, "disk-a", state=JobState.RUNNING)
+    operation_id = job_operation_id(job_id)
+    progress_registry.register(operation_id, "disk-a/target", "overwrite", 1)
+    db = session_factory()
+    stream = None
+    try:
+        response = await stream_job_events(job_id, ConnectedRequest(), db)
+        stream = response.body_iterator
+        first = await asyncio.wait_for(stream.__anext__(), 5.0)
+        print(f"   First event: {first.splitlines()[0]}")
+        if not first.startswith("event: progress") or f'"job_id": {job_id}' not in first:
+            print("❌ Stream did not open with the job's progress")
+            return False
+        print("✅ Job event stream delivers progress")
+        return True
+    finally:
+        if stream is not None:
+            await stream.aclose()
+        progress_registry.remove(operation_id)
+        db.close()
+        os.remove(path)
+
+
+async def main():
+    """Run all job scheduler tests"""
+    print("🚀 Job Scheduler Test Suite")
+    print("=" * 60)
+    print(f"Test started at: {datetime.now().isoformat()}")
+    print()
+
+    tests = [
+        ("Priority and Device Exclusivity", test_priority_and_device_exclusivity),
+        ("Concurrency Limit", test_concurrency_limit),
+        ("Orphan Reclaim", test_orphan_reclaim),
+        ("Queued Cancel and Shutdown Requeue", test_queued_cancel_and_shutdown_requeue),
+        ("Shared Disk Exclusivity", test_shared_disk_exclusivity),
+        ("Job Event Stream", test_job_event_stream)
+    ]
+
+    passed = 0
+    total = len(tests)
+
+    for test_name, test_func in tests:
+        print(f"🧪 Running {test_name} test...")
+        try:
+            success = await test_func()
+            if success:
+                passed += 1
+                print(f"✅ {test_name} test passed")
+            else:
+                print(f"❌ {test_name} test failed")
+        except Exception as e:
+            print(f"❌ {test_name} test failed with exception: {e}")
+            import traceback
+            traceback.print_exc()
+        print()
+
+    print("=" * 60)
+    print(f"📊 Test Results: {passed}/{total} tests passed")
+
+    if passed != total:
+        print("❌ Some tests failed. Please check the errors above.")
+        sys.exit(1)
+    print("🎉 All job scheduler tests passed!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
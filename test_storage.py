@@ -5,11 +5,20 @@ This script tests the storage detection functionality on the current system.
 """
 
 import asyncio
+import os
+import shutil
+import struct
+import subprocess
 import sys
 import json
+import tempfile
+import time
 from datetime import datetime
 
-from services.storage_service import StorageDetectionService
+from services.storage_service import StorageDetectionService, ProbeBackend
+from services.block_devices import build_topology, scan_block_devices, read_proc_partitions
+from services.hpa_probe import HPAProbeScheduler
+from services.device_inventory import DeviceInventoryCache, inventory_fingerprint
 
 
 async def test_storage_detection():
@@ -149,6 +158,539 @@ async def test_error_handling():
         return False
 
 
+async def test_inventory_cache():
+    """Test the shared inventory cache: single flight, TTL and change-driven invalidation"""
+    print("\n🗄️  Testing inventory cache...")
+    
+    class SlowDetectionService(StorageDetectionService):
+        async def get_all_storage_devices(self):
+            await asyncio.sleep(0.2)
+            return await super().get_all_storage_devices()
+    
+    try:
+        layout = {'generation': 0}
+        cache = DeviceInventoryCache(
+            SlowDetectionService(),
+            ttl_seconds=60,
+            fingerprint=lambda: f"layout-{layout['generation']}"
+        )
+        
+        # Concurrent callers share one scan
+        snapshots = await asyncio.gather(*[cache.get() for _ in range(5)])
+        if cache.scans != 1 or cache.joined != 4 or any(s is not snapshots[0] for s in snapshots):
+            print(f"❌ Concurrent lookups ran {cache.scans} scan(s), {cache.joined} joined")
+            return False
+        print(f"✅ 5 concurrent lookups shared one scan ({snapshots[0].scan_seconds:.2f}s)")
+        
+        # Within the TTL and with an unchanged layout, the snapshot is reused
+        cached = await cache.get()
+        if cached is not snapshots[0] or cache.scans != 1 or cache.hits != 1:
+            print("❌ Fresh snapshot was not reused")
+            return False
+        if cached.age_seconds < 0 or cached.age_seconds > 60:
+            print(f"❌ Unexpected snapshot age: {cached.age_seconds}")
+            return False
+        print(f"✅ Cache hit, snapshot age {cached.age_seconds:.3f}s")
+        
+        # A device layout change expires the snapshot before its TTL
+        layout['generation'] += 1
+        changed = await cache.get()
+        if changed is cached or cache.scans != 2:
+            print("❌ Layout change did not trigger a rescan")
+            return False
+        
+        # max_age, refresh and invalidate() all force a rescan
+        await asyncio.sleep(0.01)
+        await cache.get(max_age=0)
+        await cache.get(refresh=True)
+        cache.invalidate()
+        if cache.peek() is not None:
+            print("❌ Invalidated snapshot still cached")
+            return False
+        await cache.get()
+        if cache.scans != 5:
+            print(f"❌ Expected 5 scans, got {cache.scans}")
+            return False
+        print("✅ Layout change, max_age, refresh and invalidate() rescan")
+        
+        # A caller cancelled mid-scan doesn't cancel the scan others wait on
+        cache.invalidate()
+        waiter = asyncio.ensure_future(cache.get())
+        other = asyncio.ensure_future(cache.get())
+        await asyncio.sleep(0.05)
+        waiter.cancel()
+        snapshot = await other
+        if snapshot is None or cache.peek() is not snapshot:
+            print("❌ Cancelling one caller broke the shared scan")
+            return False
+        print("✅ Cancelled caller left the shared scan running")
+        
+        # With no layout change, the real fingerprint is stable
+        if inventory_fingerprint() != inventory_fingerprint():
+            print("❌ Device layout fingerprint is not stable")
+            return False
+        print(f"✅ Device layout fingerprint: {inventory_fingerprint()}")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Inventory cache test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def _write_mbr(image_path: str, partitions):
+    """Write an MBR partition table of (start sector, sector count) entries"""
+    table = bytearray(512)
+    for index, (start, count) in enumerate(partitions):
+        # Status, CHS start, type (Linux), CHS end, LBA start, sector count
+        table[446 + 16 * index:462 + 16 * index] = struct.pack('<B3sB3sII', 0, b'\0' * 3, 0x83, b'\0' * 3, start, count)
+    table[510:512] = b'\x55\xaa'
+    with open(image_path, 'r+b') as f:
+        f.write(table)
+
+
+async def test_native_probe():
+    """Test the subprocess-free sysfs/procfs backend against lsblk and a partitioned loop device"""
+    print("\n🧬 Testing native sysfs probe...")
+    
+    if not os.path.isdir('/sys/block'):
+        print("⚠️  No sysfs here, skipping")
+        return True
+    
+    image_path = None
+    loop_device = None
+    try:
+        native_service = StorageDetectionService(lsblk_enrichment=False)
+        start = time.perf_counter()
+        native = await native_service.get_all_storage_devices()
+        native_seconds = time.perf_counter() - start
+        print(f"✅ Native probe found {len(native)} device(s) in {native_seconds * 1000:.1f} ms")
+        
+        # Every disk the kernel lists, at the size lsblk would report
+        proc_partitions = read_proc_partitions()
+        by_path = {device.device: device for device in native}
+        for block in scan_block_devices():
+            if block.name not in proc_partitions or by_path.get(block.path) is None:
+                print(f"❌ {block.path} missing from /proc/partitions or the inventory")
+                return False
+            if by_path[block.path].size != proc_partitions[block.name][2]:
+                print(f"❌ {block.path}: size {by_path[block.path].size} != {proc_partitions[block.name][2]}")
+                return False
+        if shutil.which('lsblk'):
+            output = subprocess.run(['lsblk', '-b', '-d', '-n', '-o', 'NAME,SIZE'], capture_output=True, text=True)
+            for line in output.stdout.splitlines():
+                name, size = line.split()
+                if int(size) > 0 and not name.startswith(('ram', 'zram')):
+                    if f"/dev/{name}" not in by_path or by_path[f"/dev/{name}"].size != int(size):
+                        print(f"❌ lsblk disk /dev/{name} ({size} bytes) not matched by the native probe")
+                        return False
+            print("✅ Native disks and sizes match lsblk")
+        
+        # Mounted filesystems keep their usage figures
+        for device in native:
+            for partition in device.partitions:
+                if partition.mountpoint and partition.used + partition.free > partition.size:
+                    print(f"❌ {partition.device}: used + free exceeds size")
+                    return False
+        
+        # Partition parsing, on a sysfs tree laid out like the kernel's
+        with tempfile.TemporaryDirectory() as sys_block:
+            def write(path, value):
+                os.makedirs(os.path.dirname(os.path.join(sys_block, path)), exist_ok=True)
+                with open(os.path.join(sys_block, path), 'w') as f:
+                    f.write(f"{value}\n")
+            write("sdz/size", 62914560)
+            write("sdz/removable", 1)
+            write("sdz/queue/rotational", 0)
+            write("sdz/queue/physical_block_size", 4096)
+            write("sdz/device/model", "Test SSD       ")
+            write("sdz/device/serial", "SN123")
+            for number, sectors in [(2, 40960), (1, 2048)]:
+                write(f"sdz/sdz{number}/partition", number)
+                write(f"sdz/sdz{number}/size", sectors)
+            write("zram0/size", 8192)
+            blocks = scan_block_devices(sys_block=sys_block)
+            if [b.name for b in blocks] != ["sdz"]:
+                print(f"❌ Expected only sdz, got {[b.name for b in blocks]}")
+                return False
+            block = blocks[0]
+            found = [(p.path, p.size_bytes) for p in block.partitions]
+            if (block.size_bytes != 62914560 * 512 or block.model != "Test SSD" or block.serial != "SN123"
+                    or block.rotational is not False or not block.removable or block.physical_sector_size != 4096
+                    or found != [("/dev/sdz1", 2048 * 512), ("/dev/sdz2", 40960 * 512)]):
+                print(f"❌ Unexpected sysfs description: {block}")
+                return False
+        print("✅ Disk attributes and partitions parsed from a sysfs tree")
+        
+        if not shutil.which('losetup') or os.geteuid() != 0:
+            print("⚠️  Loop devices unavailable, skipping loop device test")
+            return True
+        
+        fd, image_path = tempfile.mkstemp(suffix=".img")
+        os.ftruncate(fd, 16 * 1024 * 1024)
+        os.close(fd)
+        _write_mbr(image_path, [(2048, 8192), (10240, 20480)])
+        try:
+            output = subprocess.run(['losetup', '-f', '-P', '--show', image_path],
+                                    capture_output=True, text=True, timeout=10, check=True)
+            loop_device = output.stdout.strip()
+        except (subprocess.SubprocessError, OSError) as e:
+            print(f"⚠️  Could not attach a loop device ({e}), skipping loop device test")
+            return True
+        
+        devices = await native_service.get_all_storage_devices()
+        device = next((d for d in devices if d.device == loop_device), None)
+        if device is None:
+            print(f"❌ {loop_device} not detected")
+            return False
+        if device.size != 16 * 1024 * 1024 or device.device_type != 'Virtual':
+            print(f"❌ {loop_device}: size {device.size}, type {device.device_type}")
+            return False
+        if not device.partitions and os.path.basename(loop_device) + "p1" not in read_proc_partitions():
+            print(f"✅ {loop_device} detected (this kernel doesn't read MBR partition tables)")
+            return True
+        expected = [(f"{loop_device}p1", 8192 * 512), (f"{loop_device}p2", 20480 * 512)]
+        found = [(p.device, p.size) for p in device.partitions]
+        if found != expected:
+            print(f"❌ Partitions {found}, expected {expected}")
+            return False
+        if any(p.mountpoint for p in device.partitions):
+            print("❌ Unmounted partitions reported as mounted")
+            return False
+        print(f"✅ {loop_device}: {len(found)} unmounted partitions with sizes from /proc/partitions")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Native probe test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if loop_device:
+            subprocess.run(['losetup', '-d', loop_device], capture_output=True)
+        if image_path:
+            os.unlink(image_path)
+
+
+FAKE_HDPARM = """#!{python}
+import sys, time
+flag, device = sys.argv[1], sys.argv[2]
+with open({log!r}, 'a') as log:
+    log.write(device + "\\n")
+if "slow" in device:
+    time.sleep(30)
+if "denied" in device:
+    print("SG_IO: bad/missing sense data, sb[]:  70 00 05 00")
+elif flag == "-N":
+    visible = 1000 if "hpa" in device else 2000
+    print(" max sectors   = %d/2000, HPA is %s" % (visible, "enabled" if visible < 2000 else "disabled"))
+elif "dco" in device:
+    print("DCO Revision: 0x0001\\nThe following features can be selectively disabled via DCO:\\n\\tReal max sectors: 4000")
+else:
+    print("The device does not support DCO")
+"""
+
+
+async def test_hpa_probe_scheduler():
+    """Test concurrent, timeout-bounded HPA/DCO probing with per-serial caching"""
+    print("\n⏱️  Testing HPA/DCO probe scheduler...")
+    
+    with tempfile.TemporaryDirectory() as workdir:
+        log_path = os.path.join(workdir, "calls.log")
+        hdparm = os.path.join(workdir, "hdparm")
+        with open(hdparm, 'w') as f:
+            f.write(FAKE_HDPARM.format(python=sys.executable, log=log_path))
+        os.chmod(hdparm, 0o755)
+        
+        def calls():
+            if not os.path.exists(log_path):
+                return []
+            with open(log_path) as f:
+                return f.read().split()
+        
+        try:
+            scheduler = HPAProbeScheduler(concurrency=4, timeout_seconds=1.0, hdparm=hdparm)
+            devices = {
+                "/dev/fake-hpa": "SERIAL-HPA",
+                "/dev/fake-dco": "SERIAL-DCO",
+                "/dev/fake-clean": None,
+                "/dev/fake-slow-1": "SERIAL-SLOW",
+                "/dev/fake-slow-2": None,
+            }
+            start = time.perf_counter()
+            results = await scheduler.probe_all(devices)
+            elapsed = time.perf_counter() - start
+            
+            hpa, dco, clean = results["/dev/fake-hpa"], results["/dev/fake-dco"], results["/dev/fake-clean"]
+            if not (hpa.hpa_present and not hpa.dco_present and hpa.raw_capacity == 2000 * 512):
+                print(f"❌ HPA not detected: {hpa}")
+                return False
+            if not (dco.dco_present and not dco.hpa_present and dco.raw_capacity == 4000 * 512):
+                print(f"❌ DCO not detected: {dco}")
+                return False
+            if clean.hpa_present or clean.dco_present or clean.stale:
+                print(f"❌ Clean drive misreported: {clean}")
+                return False
+            slow = [results["/dev/fake-slow-1"], results["/dev/fake-slow-2"]]
+            if not all(r.stale and r.error for r in slow):
+                print(f"❌ Timed-out probes not marked stale: {slow}")
+                return False
+            # Two hung drives time out side by side instead of one after the other
+            if elapsed > 1.9:
+                print(f"❌ Probes didn't overlap: {elapsed:.2f}s")
+                return False
+            print(f"✅ HPA, DCO and clean drives probed; 2 hung drives marked stale after {elapsed:.2f}s")
+            
+            # Cached by serial: only the devices without a fresh result are probed again
+            before = len(calls())
+            scheduler.timeout_seconds = 0.3
+            again = await scheduler.probe_all(devices)
+            probed = calls()[before:]
+            if sorted(set(probed)) != ["/dev/fake-clean", "/dev/fake-slow-1", "/dev/fake-slow-2"]:
+                print(f"❌ Expected only uncached or stale devices to be probed again, got {sorted(set(probed))}")
+                return False
+            if again["/dev/fake-hpa"] != hpa:
+                print("❌ Cached HPA result changed")
+                return False
+            print("✅ Fresh results cached per serial; stale and serial-less devices probed again")
+            
+            # A timeout keeps the last known values, marked stale
+            scheduler.invalidate("SERIAL-HPA")
+            known = await scheduler.probe("/dev/fake-hpa", "SERIAL-HPA")
+            stale = await scheduler.probe("/dev/fake-slow-hpa", "SERIAL-HPA")
+            if not (stale.stale and stale.hpa_present == known.hpa_present and stale.raw_capacity == known.raw_capacity):
+                print(f"❌ Timed-out probe lost the last known values: {stale}")
+                return False
+            print("✅ Timed-out probe kept the last known HPA state, marked stale")
+            
+            # A failed hdparm run isn't trusted: marked stale and probed again next time
+            denied = {"/dev/fake-denied": "SERIAL-DENIED"}
+            first = (await scheduler.probe_all(denied))["/dev/fake-denied"]
+            before = len(calls())
+            await scheduler.probe_all(denied)
+            if not (first.stale and first.error) or len(calls()) == before:
+                print(f"❌ Failed probe cached as a fresh result: {first}")
+                return False
+            
+            # hdparm that can't be started fails each device, not the batch
+            broken = os.path.join(workdir, "hdparm-broken")
+            with open(broken, 'w') as f:
+                f.write("#!/nonexistent/interpreter\n")
+            os.chmod(broken, 0o755)
+            broken_results = await HPAProbeScheduler(hdparm=broken).probe_all(devices)
+            if set(broken_results) != set(devices) or not all(r.stale and r.error for r in broken_results.values()):
+                print(f"❌ Unstartable hdparm not reported per device: {broken_results}")
+                return False
+            print("✅ Failed and unstartable hdparm runs reported per device and probed again")
+            return True
+            
+        except Exception as e:
+            print(f"❌ HPA probe scheduler test failed: {e}")
+            import traceback
+            traceback.print_exc()
+            return False
+
+
+async def test_single_device_refresh():
+    """Test probing one device and merging it into the inventory without a rescan"""
+    print("\n🎯 Testing single-device refresh...")
+    
+    loop_device = None
+    image_path = None
+    link_dir = tempfile.mkdtemp()
+    try:
+        cache = DeviceInventoryCache(StorageDetectionService(lsblk_enrichment=False), ttl_seconds=60)
+        snapshot = await cache.get()
+        if not snapshot.devices:
+            print("⚠️  No devices detected, skipping")
+            return True
+        
+        # Path, relative path, bare name, symlink, partition and serial all find the device in O(1)
+        device = snapshot.devices[0]
+        name = os.path.basename(device.device)
+        link = os.path.join(link_dir, "disk")
+        os.symlink(device.device, link)
+        keys = [device.device, device.device.lstrip('/'), name, link] + [p.device for p in device.partitions]
+        missing = [key for key in keys if snapshot.find(key) is not device]
+        if missing:
+            print(f"❌ Lookups failed for {missing}")
+            return False
+        if device.serial and snapshot.find_by_serial(device.serial) is not device:
+            print(f"❌ Serial lookup failed for {device.serial}")
+            return False
+        if snapshot.find("/dev/definitely-not-a-disk") is not None:
+            print("❌ Unknown path matched a device")
+            return False
+        print(f"✅ {device.device} found by path, name, symlink, partition and serial")
+        
+        # Re-probing a device replaces it in place, without rescanning the others
+        start = time.perf_counter()
+        fresh = await cache.refresh_device(name)
+        probe_seconds = time.perf_counter() - start
+        if fresh is None or fresh.device != device.device or fresh.size != device.size:
+            print(f"❌ probe_device returned {fresh}")
+            return False
+        if cache.scans != 1 or snapshot.find(device.device) is not fresh or len(snapshot.devices) != len(set(d.device for d in snapshot.devices)):
+            print("❌ Refreshed device not merged in place")
+            return False
+        if snapshot.device_age_seconds(fresh) > snapshot.age_seconds:
+            print("❌ Refreshed device reports the snapshot's age")
+            return False
+        print(f"✅ {device.device} re-probed in {probe_seconds * 1000:.1f} ms and merged, no rescan")
+        
+        # A failed probe of a present device keeps its cached entry
+        def failing_probe(*args, **kwargs):
+            raise OSError("simulated probe failure")
+        cache.service._device_from_block = failing_probe
+        try:
+            await cache.refresh_device(name)
+            print("❌ Failed probe reported as success")
+            return False
+        except OSError:
+            pass
+        finally:
+            del cache.service._device_from_block
+        if snapshot.find(device.device) is not fresh:
+            print("❌ Failed probe dropped the device from the inventory")
+            return False
+        print(f"✅ Failed probe of {device.device} kept its cached entry")
+        
+        if not shutil.which('losetup') or os.geteuid() != 0:
+            print("⚠️  Loop devices unavailable, skipping hotplug test")
+            return True
+        
+        # A device that appeared after the scan is added; one that went away is dropped
+        fd, image_path = tempfile.mkstemp(suffix=".img")
+        os.ftruncate(fd, 8 * 1024 * 1024)
+        os.close(fd)
+        output = subprocess.run(['losetup', '-f', '--show', image_path], capture_output=True, text=True, timeout=10)
+        loop_device = output.stdout.strip()
+        if not loop_device:
+            print("⚠️  Could not attach a loop device, skipping hotplug test")
+            return True
+        added = await cache.refresh_device(loop_device)
+        if added is None or snapshot.find(loop_device) is not added or added.size != 8 * 1024 * 1024:
+            print(f"❌ New device {loop_device} not merged: {added}")
+            return False
+        subprocess.run(['losetup', '-d', loop_device], capture_output=True)
+        detached, loop_device = loop_device, None
+        await asyncio.sleep(0.1)
+        gone = await cache.refresh_device(detached)
+        if gone is not None or snapshot.find(detached) is not None:
+            print(f"❌ Detached {detached} still in the inventory")
+            return False
+        if snapshot.find(device.device) is not fresh or cache.scans != 1:
+            print("❌ Removing a device disturbed the others")
+            return False
+        print(f"✅ {detached} added on attach and dropped on detach, still one scan")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Single-device refresh test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        if loop_device:
+            subprocess.run(['losetup', '-d', loop_device], capture_output=True)
+        if image_path:
+            os.unlink(image_path)
+        shutil.rmtree(link_dir, ignore_errors=True)
+
+
+async def test_block_topology():
+    """Test resolving partitions, LVM and RAID volumes to their physical disks"""
+    print("\n🧬 Testing block topology...")
+    
+    try:
+        # Synthetic sysfs: sdz1/sdz2 on sdz, an LVM volume on sdz2, a RAID1 across sdx and sdy
+        with tempfile.TemporaryDirectory() as root:
+            layout = {
+                "sdz": ("8:0", None, [], []),
+                "sdz/sdz1": ("8:1", None, [], []),
+                "sdz/sdz2": ("8:2", None, [], ["dm-9"]),
+                "dm-9": ("253:9", "vg0-data", ["sdz2"], []),
+                "sdx": ("8:16", None, [], ["md0"]),
+                "sdy": ("8:32", None, [], ["md0"]),
+                "md0": ("9:0", None, ["sdx", "sdy"], []),
+            }
+            class_block = os.path.join(root, "class", "block")
+            os.makedirs(class_block)
+            for path, (dev, dm_name, slaves, holders) in layout.items():
+                node = os.path.join(root, "devices", path)
+                files = {"dev": dev}
+                if "/" in path:
+                    files["partition"] = path[-1]
+                if dm_name:
+                    files["dm/name"] = dm_name
+                for name, content in files.items():
+                    os.makedirs(os.path.dirname(os.path.join(node, name)), exist_ok=True)
+                    with open(os.path.join(node, name), 'w') as f:
+                        f.write(content + "\n")
+                for kind, names in (("slaves", slaves), ("holders", holders)):
+                    os.makedirs(os.path.join(node, kind))
+                    for name in names:
+                        os.symlink(os.path.join(class_block, name), os.path.join(node, kind, name))
+                os.symlink(node, os.path.join(class_block, os.path.basename(path)))
+            
+            topology = build_topology(class_block)
+            expected_disks = {
+                "sdz1": ["/dev/sdz"],
+                "dm-9": ["/dev/sdz"],
+                "md0": ["/dev/sdx", "/dev/sdy"],
+                "sdx": ["/dev/sdx"],
+                "nonexistent": [],
+            }
+            for name, expected in expected_disks.items():
+                if topology.physical_disks(name) != expected:
+                    print(f"❌ {name} resolved to {topology.physical_disks(name)}, expected {expected}")
+                    return False
+            if topology.stacked_on("sdz") != ["sdz", "sdz1", "sdz2", "dm-9"]:
+                print(f"❌ Nodes on sdz: {topology.stacked_on('sdz')}")
+                return False
+            if topology.nodes["dm-9"].path != "/dev/mapper/vg0-data":
+                print(f"❌ dm-9 path is {topology.nodes['dm-9'].path}")
+                return False
+            print("✅ Partitions, LVM and RAID volumes resolve to their physical disks")
+            
+            # Mounts and swap anywhere in the stack block the disk; an open volume does too
+            cases = [
+                ("sdz", {"dm-9": ["/data"]}, [], ["/dev/mapper/vg0-data is mounted on /data"]),
+                ("sdz", {}, ["sdz1"], ["/dev/sdz1 is in use as swap"]),
+                ("sdz", {}, [], ["/dev/mapper/vg0-data is built on it"]),
+                ("sdz1", {"dm-9": ["/data"]}, [], []),
+                ("sdx", {"md0": ["/srv"]}, [], ["/dev/md0 is mounted on /srv"]),
+            ]
+            for name, mounts, swaps, expected in cases:
+                reasons = topology.in_use(name, mounts, swaps)
+                if reasons != expected:
+                    print(f"❌ in_use({name}) with {mounts}/{swaps} gave {reasons}, expected {expected}")
+                    return False
+            print("✅ Mounted, swap and stacked devices reported as in use")
+        
+        # The real disk holding / is in use
+        topology = build_topology()
+        root_mounts = [
+            name for name, mountpoints in topology.read_mounts().items() if "/" in mountpoints
+        ]
+        if root_mounts:
+            disk = topology.physical_disks(root_mounts[0])[0]
+            if not any("mounted on /" in reason for reason in topology.in_use(disk)):
+                print(f"❌ {disk} holds / but isn't reported in use")
+                return False
+            print(f"✅ {disk} holds / and is reported in use")
+        else:
+            print("⚠️  / isn't on a block device, skipping live check")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Block topology test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
 async def main():
     """Run all storage detection tests"""
     print("🚀 Storage Detection Service Test Suite")
@@ -159,7 +701,12 @@ async def main():
     tests = [
         ("Storage Detection", test_storage_detection),
         ("Specific Device", test_specific_device),
-        ("Error Handling", test_error_handling)
+        ("Error Handling", test_error_handling),
+        ("Inventory Cache", test_inventory_cache),
+        ("Native Probe", test_native_probe),
+        ("HPA Probe Scheduler", test_hpa_probe_scheduler),
+        ("Single-Device Refresh", test_single_device_refresh),
+        ("Block Topology", test_block_topology)
     ]
     
     passed = 0